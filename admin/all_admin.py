@@ -1,6 +1,7 @@
 from sqladmin import ModelView
 
-from db.models import User, UserProfile, DailyActivityTracker, ExerciseSet, Workout, Exercise, MealPlan, Meal
+from db.models import User, UserProfile, DailyActivityTracker, ExerciseSet, Workout, Exercise, MealPlan, Meal, \
+    MealAlternative, ExerciseProgression, CanonicalMeal, InventoryItem
 
 
 class UserAdmin(ModelView, model=User):
@@ -45,6 +46,18 @@ class ExerciseAdmin(ModelView, model=Exercise):
     ]
 
 
+class ExerciseProgressionAdmin(ModelView, model=ExerciseProgression):
+    column_list = [
+        ExerciseProgression.id,
+        ExerciseProgression.user_id,
+        ExerciseProgression.exercise_id,
+        ExerciseProgression.best_weight,
+        ExerciseProgression.best_reps,
+        ExerciseProgression.best_estimated_1rm,
+        ExerciseProgression.rolling_estimated_1rm,
+        ExerciseProgression.last_session_date
+    ]
+
 
 class DailyActivityTrackerAdmin(ModelView, model=DailyActivityTracker):
     column_list = [DailyActivityTracker.id,
@@ -74,14 +87,50 @@ class MealAdmin(ModelView, model=Meal):
         Meal.id,
         Meal.meal_plan_id,
         Meal.meal_type,
-        Meal.meal_name,
-        Meal.description,
-        Meal.calories,
-        Meal.protein_g,
-        Meal.carbs_g,
-        Meal.fiber_g,
-        Meal.fat_g
+        Meal.canonical_meal_id,
+        Meal.canonical_meal,
+        Meal.portion_multiplier,
+        Meal.alternative_rank,
+        Meal.user_rating,
+        Meal.is_favorite
+    ]
+
+
+class CanonicalMealAdmin(ModelView, model=CanonicalMeal):
+    column_list = [
+        CanonicalMeal.id,
+        CanonicalMeal.meal_name,
+        CanonicalMeal.description,
+        CanonicalMeal.calories,
+        CanonicalMeal.protein_g,
+        CanonicalMeal.carbs_g,
+        CanonicalMeal.fiber_g,
+        CanonicalMeal.fat_g,
+        CanonicalMeal.content_hash
+    ]
+
 
+class MealAlternativeAdmin(ModelView, model=MealAlternative):
+    column_list = [
+        MealAlternative.id,
+        MealAlternative.meal_plan_id,
+        MealAlternative.meal_type,
+        MealAlternative.rank,
+        MealAlternative.source,
+        MealAlternative.canonical_meal_id,
+        MealAlternative.canonical_meal,
+        MealAlternative.portion_multiplier
+    ]
+
+
+class InventoryItemAdmin(ModelView, model=InventoryItem):
+    column_list = [
+        InventoryItem.id,
+        InventoryItem.user_id,
+        InventoryItem.name,
+        InventoryItem.quantity,
+        InventoryItem.unit,
+        InventoryItem.expiry_date
     ]
 
 
@@ -92,5 +141,9 @@ admin_views = [UserAdmin,
                ExerciseSetAdmin,
                WorkoutAdmin,
                ExerciseAdmin,
+               ExerciseProgressionAdmin,
                MealPlanAdmin,
-               MealAdmin]
\ No newline at end of file
+               MealAdmin,
+               CanonicalMealAdmin,
+               MealAlternativeAdmin,
+               InventoryItemAdmin]
\ No newline at end of file
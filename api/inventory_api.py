@@ -0,0 +1,113 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, status, Query
+from sqlalchemy.orm import Session
+from starlette.responses import JSONResponse
+
+from db.db_conn import get_db
+from db.schemas import inventory_schema
+from services.inventory_service import InventoryService
+from utils import app_logger, resp_msgs
+from utils.dependencies import get_current_user
+
+router = APIRouter(prefix="/inventory", tags=["Inventory"])
+
+
+def _result_response(result: dict, success_status: int = status.HTTP_200_OK) -> JSONResponse:
+    if result.get("status") == "success":
+        return JSONResponse(content=result, status_code=success_status)
+    elif result.get("status") == "not_found":
+        return JSONResponse(content=result, status_code=status.HTTP_404_NOT_FOUND)
+    else:
+        return JSONResponse(content=result, status_code=status.HTTP_400_BAD_REQUEST)
+
+
+@router.post("/",
+            status_code=status.HTTP_201_CREATED,
+            name="create-inventory-item")
+async def create_inventory_item(item_data: inventory_schema.InventoryItemCreateSchema,
+                                current_user=Depends(get_current_user),
+                                db: Session = Depends(get_db)):
+    """Add a food to the user's inventory"""
+    try:
+        result = InventoryService.create_item(current_user.id, item_data, db)
+        return _result_response(result, status.HTTP_201_CREATED)
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in create_inventory_item: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.get("/",
+           status_code=status.HTTP_200_OK,
+           name="get-inventory")
+async def get_inventory(expiring_within_days: Optional[int] = Query(default=None, ge=0, description="Only items expiring within this many days"),
+                        current_user=Depends(get_current_user),
+                        db: Session = Depends(get_db)):
+    """The user's inventory, soonest expiry first"""
+    try:
+        result = InventoryService.list_items(current_user.id, db, expiring_within_days)
+        return _result_response(result)
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in get_inventory: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.get("/suggestions",
+           status_code=status.HTTP_200_OK,
+           name="get-inventory-recipe-suggestions")
+async def get_recipe_suggestions(limit: int = Query(default=10, ge=1, le=50, description="Recipes to return"),
+                                 max_missing: Optional[int] = Query(default=None, ge=0, description="Leave out recipes missing more foods than this"),
+                                 current_user=Depends(get_current_user),
+                                 db: Session = Depends(get_db)):
+    """Cook with what I have: catalogue recipes ranked by inventory coverage, using up expiring items first"""
+    try:
+        result = InventoryService.suggest_recipes(current_user.id, db, limit=limit, max_missing=max_missing)
+        return _result_response(result)
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in get_recipe_suggestions: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.put("/{item_id}",
+           status_code=status.HTTP_200_OK,
+           name="update-inventory-item")
+async def update_inventory_item(item_id: int,
+                                item_data: inventory_schema.InventoryItemUpdateSchema,
+                                current_user=Depends(get_current_user),
+                                db: Session = Depends(get_db)):
+    """Change an item's name, quantity, unit or expiry date"""
+    try:
+        result = InventoryService.update_item(current_user.id, item_id, item_data, db)
+        return _result_response(result)
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in update_inventory_item: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.delete("/{item_id}",
+              status_code=status.HTTP_200_OK,
+              name="delete-inventory-item")
+async def delete_inventory_item(item_id: int,
+                                current_user=Depends(get_current_user),
+                                db: Session = Depends(get_db)):
+    """Remove an item from the user's inventory"""
+    try:
+        result = InventoryService.delete_item(current_user.id, item_id, db)
+        return _result_response(result)
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in delete_inventory_item: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
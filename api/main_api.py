@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 from api import (auth_api, user_api, 
-                 workout_api, recipe_api, tracker_api, meal_plan_api)
+                 workout_api, recipe_api, tracker_api, meal_plan_api, inventory_api)
 api_router = APIRouter()
 
 
@@ -10,3 +10,4 @@ api_router.include_router(workout_api.router)
 api_router.include_router(recipe_api.router)
 api_router.include_router(tracker_api.router)
 api_router.include_router(meal_plan_api.router)
+api_router.include_router(inventory_api.router)
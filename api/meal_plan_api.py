@@ -1,22 +1,59 @@
+import json
 from datetime import date
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
 from db.db_conn import get_db
 from db.schemas import meal_plan_schema
+from services.generation_queue_service import GenerationQueueService
+from services.grocery_list_service import GroceryListService
+from services.llm_resilience import LLMResilience
+from utils.rate_limiter import rate_limiter
 from services.meal_planning_service import MealPlanningService
+from services.meal_plan_adaptation_service import MealPlanAdaptationService
 from utils import app_logger, resp_msgs
-from utils.dependencies import get_current_user
+from utils.dependencies import get_current_user, get_current_admin_user
 
 router = APIRouter(prefix="/meal-plans", tags=["Meal Planning"])
 
 
+def _queue_generation(request: Request, user_id: int, target_date: date, custom_config: dict,
+                      regenerate_if_exists: bool) -> JSONResponse:
+    """Enqueue the generation and answer 202 with where to follow the job"""
+    result = GenerationQueueService.enqueue(
+        user_id=user_id,
+        target_date=target_date,
+        custom_config=custom_config,
+        regenerate_if_exists=regenerate_if_exists
+    )
+    if result.get("status") != "success":
+        return JSONResponse(
+            content=result,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    job_id = result["job_id"]
+    return JSONResponse(
+        content={
+            "status": "accepted",
+            "message": f"Meal plan generation for {target_date} queued",
+            "job_id": job_id,
+            "job_status": result["job_status"],
+            "status_url": str(request.url_for("get-generation-job", job_id=job_id)),
+            "events_url": str(request.url_for("get-generation-job-events", job_id=job_id))
+        },
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"Location": str(request.url_for("get-generation-job", job_id=job_id))}
+    )
+
+
 @router.post("/generate",
             status_code=status.HTTP_201_CREATED,
             name="generate-meal-plan")
 async def generate_meal_plan(request_data: meal_plan_schema.MealPlanGenerationRequestSchema,
+                           request: Request,
                            current_user=Depends(get_current_user),
                            db: Session = Depends(get_db)):
     """Generate a complete meal plan for a specific date"""
@@ -34,6 +71,13 @@ async def generate_meal_plan(request_data: meal_plan_schema.MealPlanGenerationRe
         # Add custom preferences if provided
         if request_data.custom_preferences:
             custom_config.update(request_data.custom_preferences)
+
+        if request_data.fallback_deadline_seconds:
+            custom_config["fallback_deadline_seconds"] = request_data.fallback_deadline_seconds
+
+        if request_data.async_mode:
+            return _queue_generation(request, current_user.id, request_data.target_date, custom_config,
+                                     request_data.regenerate_if_exists)
         
         result = await meal_planning_service.generate_meal_plan(
             user_id=current_user.id,
@@ -67,6 +111,79 @@ async def generate_meal_plan(request_data: meal_plan_schema.MealPlanGenerationRe
         )
 
 
+@router.post("/generate-range",
+            status_code=status.HTTP_201_CREATED,
+            name="generate-meal-plan-range")
+async def generate_meal_plan_range(request_data: meal_plan_schema.MealPlanRangeGenerationRequestSchema,
+                                   current_user=Depends(get_current_user),
+                                   db: Session = Depends(get_db)):
+    """Generate the meal plans of a span of days, e.g. a week, with one grocery list for all of them"""
+    try:
+        meal_planning_service = MealPlanningService()
+        
+        custom_config = {
+            "custom_calorie_target": request_data.custom_calorie_target,
+            "llm_provider": "ollama",
+            "model_name": "qwen2:7b",
+            "temperature": 0.7
+        }
+        if request_data.custom_preferences:
+            custom_config.update(request_data.custom_preferences)
+        
+        result = await meal_planning_service.generate_meal_plan_range(
+            user_id=current_user.id,
+            start_date=request_data.start_date,
+            end_date=request_data.end_date,
+            custom_config=custom_config,
+            regenerate_if_exists=request_data.regenerate_if_exists,
+            db=db
+        )
+        
+        if result.get("status") == "success":
+            return JSONResponse(
+                content=result,
+                status_code=status.HTTP_201_CREATED if result["generated"] else status.HTTP_200_OK
+            )
+        else:
+            return JSONResponse(
+                content=result,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+            
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in generate_meal_plan_range: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.get("/grocery-list",
+           status_code=status.HTTP_200_OK,
+           name="get-grocery-list")
+async def get_grocery_list(start_date: date = Query(..., alias="from", description="First day, YYYY-MM-DD"),
+                           end_date: date = Query(..., alias="to", description="Last day, YYYY-MM-DD"),
+                           current_user=Depends(get_current_user),
+                           db: Session = Depends(get_db)):
+    """One grocery list for every meal planned from one day to another, amounts merged per food"""
+    try:
+        result = GroceryListService().for_range(current_user.id, start_date, end_date, db)
+        
+        if result.get("status") == "success":
+            return JSONResponse(content=result, status_code=status.HTTP_200_OK)
+        elif result.get("status") == "not_found":
+            return JSONResponse(content=result, status_code=status.HTTP_404_NOT_FOUND)
+        else:
+            return JSONResponse(content=result, status_code=status.HTTP_400_BAD_REQUEST)
+            
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in get_grocery_list: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
 @router.get("/",
            status_code=status.HTTP_200_OK,
            name="get-meal-plan",
@@ -162,11 +279,14 @@ async def get_meal_plan_summary(target_date: date = Query(..., description="Date
 @router.post("/quick-generate",
             status_code=status.HTTP_201_CREATED,
             name="quick-generate-meal-plan")
-async def quick_generate_meal_plan(target_date: date = Query(default=None, description="Date in YYYY-MM-DD format (optional, defaults to today)"),
+async def quick_generate_meal_plan(request: Request,
+                                  target_date: date = Query(default=None, description="Date in YYYY-MM-DD format (optional, defaults to today)"),
                                   custom_calories: Optional[float] = Query(default=None, description="Custom calorie target"),
                                   llm_provider: str = Query(default="ollama", description="LLM provider: openai, anthropic, ollama"),
                                   llm_model: str = Query(default="llama3:instruct", description="Model name (e.g., llama3:instruct, qwen2:7b, mistral:7b)"),
                                   regenerate: bool = Query(default=False, description="Regenerate if meal plan exists"),
+                                  async_mode: bool = Query(default=False, description="Queue the generation and return 202 with a job id"),
+                                  fallback_deadline_seconds: Optional[float] = Query(default=None, gt=0, description="Serve the previous plan rescaled to today's targets if the LLM takes longer"),
                                   current_user=Depends(get_current_user),
                                   db: Session = Depends(get_db)):
     """Quick meal plan generation with query parameters"""
@@ -182,8 +302,12 @@ async def quick_generate_meal_plan(target_date: date = Query(default=None, descr
             "custom_calorie_target": custom_calories,
             "llm_provider": llm_provider,
             "model_name": llm_model if llm_provider == "ollama" else "gpt-4" if llm_provider == "openai" else "claude-3-sonnet-20240229",
-            "temperature": 0.7
+            "temperature": 0.7,
+            "fallback_deadline_seconds": fallback_deadline_seconds
         }
+
+        if async_mode:
+            return _queue_generation(request, current_user.id, target_date, custom_config, regenerate)
         
         result = await meal_planning_service.generate_meal_plan(
             user_id=current_user.id,
@@ -217,6 +341,169 @@ async def quick_generate_meal_plan(target_date: date = Query(default=None, descr
         )
 
 
+@router.post("/adapt",
+            status_code=status.HTTP_200_OK,
+            name="adapt-meal-plan")
+async def adapt_meal_plan(request_data: meal_plan_schema.MealPlanAdaptationRequestSchema,
+                          current_user=Depends(get_current_user),
+                          db: Session = Depends(get_db)):
+    """Rescale the day's portions to the current targets, regenerating only if scaling cannot meet them"""
+    try:
+        adaptation_service = MealPlanAdaptationService()
+
+        custom_config = {
+            "custom_calorie_target": request_data.custom_calorie_target,
+            "llm_provider": "ollama",
+            "model_name": "qwen2:7b",
+            "temperature": 0.7
+        }
+        if request_data.custom_preferences:
+            custom_config.update(request_data.custom_preferences)
+
+        result = await adaptation_service.adapt_meal_plan(
+            user_id=current_user.id,
+            target_date=request_data.target_date,
+            custom_config=custom_config,
+            allow_llm_fallback=request_data.allow_llm_fallback,
+            db=db
+        )
+
+        if result.get("status") == "success":
+            return JSONResponse(
+                content=result,
+                status_code=status.HTTP_201_CREATED if not result.get("adapted") else status.HTTP_200_OK
+            )
+        elif result.get("status") == "not_found":
+            return JSONResponse(
+                content=result,
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        else:
+            return JSONResponse(
+                content=result,
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in adapt_meal_plan: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.post("/{target_date}/meals/{meal_type}/regenerate",
+            status_code=status.HTTP_200_OK,
+            name="regenerate-meal-slot")
+async def regenerate_meal_slot(target_date: date,
+                               meal_type: str,
+                               request_data: Optional[meal_plan_schema.MealSlotRegenerateRequestSchema] = None,
+                               current_user=Depends(get_current_user),
+                               db: Session = Depends(get_db)):
+    """Regenerate one meal of the day within the macros the other meals leave"""
+    try:
+        meal_planning_service = MealPlanningService()
+        request_data = request_data or meal_plan_schema.MealSlotRegenerateRequestSchema()
+
+        custom_config = {
+            "llm_provider": "ollama",
+            "model_name": "qwen2:7b",
+            "temperature": 0.7
+        }
+        if request_data.custom_preferences:
+            custom_config.update(request_data.custom_preferences)
+
+        result = await meal_planning_service.regenerate_meal_slot(
+            user_id=current_user.id,
+            target_date=target_date,
+            meal_type=meal_type,
+            custom_config=custom_config,
+            instructions=request_data.instructions,
+            db=db
+        )
+        return _slot_result_response(result)
+
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in regenerate_meal_slot: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.post("/{target_date}/meals/{meal_type}/swap",
+            status_code=status.HTTP_200_OK,
+            name="swap-meal")
+async def swap_meal(target_date: date,
+                    meal_type: str,
+                    request_data: Optional[meal_plan_schema.MealSwapRequestSchema] = None,
+                    current_user=Depends(get_current_user),
+                    db: Session = Depends(get_db)):
+    """Replace one meal of the day with the given one, or without a body with the slot's next alternative"""
+    try:
+        meal_planning_service = MealPlanningService()
+
+        result = await meal_planning_service.swap_meal(
+            user_id=current_user.id,
+            target_date=target_date,
+            meal_type=meal_type,
+            meal_info=request_data.model_dump() if request_data else None,
+            db=db
+        )
+        return _slot_result_response(result)
+
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in swap_meal: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.get("/{target_date}/meals/{meal_type}/alternatives",
+            status_code=status.HTTP_200_OK,
+            name="get-meal-alternatives")
+async def get_meal_alternatives(target_date: date,
+                                meal_type: str,
+                                current_user=Depends(get_current_user),
+                                db: Session = Depends(get_db)):
+    """The ranked alternatives stored for one meal of the day, in the order swaps go through them"""
+    try:
+        meal_planning_service = MealPlanningService()
+
+        result = await meal_planning_service.get_meal_alternatives(
+            user_id=current_user.id,
+            target_date=target_date,
+            meal_type=meal_type,
+            db=db
+        )
+        return _slot_result_response(result)
+
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in get_meal_alternatives: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+def _slot_result_response(result: dict) -> JSONResponse:
+    if result.get("status") == "success":
+        return JSONResponse(
+            content=result,
+            status_code=status.HTTP_200_OK
+        )
+    elif result.get("status") == "not_found":
+        return JSONResponse(
+            content=result,
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    return JSONResponse(
+        content=result,
+        status_code=status.HTTP_400_BAD_REQUEST
+    )
+
+
 @router.get("/today",
            status_code=status.HTTP_200_OK,
            name="get-today-meal-plan",
@@ -343,3 +630,151 @@ async def demo_generate_meal_plan_with_activity(target_date: date = Query(..., d
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
         )
+
+
+# Admin endpoint for the generation queue, depth and lag drive worker scaling
+@router.get("/admin/queue-metrics",
+           status_code=status.HTTP_200_OK,
+           name="generation-queue-metrics")
+async def get_generation_queue_metrics(admin_user=Depends(get_current_admin_user)):
+    """Depth, pending jobs, retries, dead letters and lag of the generation queue"""
+    try:
+        result = GenerationQueueService.get_metrics()
+        if result.get("status") == "success":
+            return JSONResponse(
+                content=result,
+                status_code=status.HTTP_200_OK
+            )
+        return JSONResponse(
+            content=result,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in get_generation_queue_metrics: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.post("/admin/generate-batch",
+            status_code=status.HTTP_200_OK,
+            name="generate-meal-plans-batch")
+async def generate_meal_plans_batch(request_data: meal_plan_schema.MealPlanBatchGenerationRequestSchema,
+                                    admin_user=Depends(get_current_admin_user),
+                                    db: Session = Depends(get_db)):
+    """Overnight generation for many users, several users per LLM call"""
+    try:
+        meal_planning_service = MealPlanningService()
+
+        custom_config = {
+            "llm_provider": "ollama",
+            "model_name": "qwen2:7b",
+            "temperature": 0.7
+        }
+        if request_data.custom_preferences:
+            custom_config.update(request_data.custom_preferences)
+
+        result = await meal_planning_service.generate_meal_plans_batch(
+            user_ids=request_data.user_ids,
+            target_date=request_data.target_date,
+            custom_config=custom_config,
+            regenerate_if_exists=request_data.regenerate_if_exists,
+            batch_size=request_data.batch_size,
+            db=db
+        )
+
+        if result.get("status") == "success":
+            return JSONResponse(
+                content=result,
+                status_code=status.HTTP_200_OK
+            )
+        return JSONResponse(
+            content=result,
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in generate_meal_plans_batch: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.get("/admin/llm-health",
+           status_code=status.HTTP_200_OK,
+           name="llm-provider-health")
+async def get_llm_provider_health(admin_user=Depends(get_current_admin_user)):
+    """Breaker state, concurrency limit and rate limiter waits per provider, for this process"""
+    try:
+        return JSONResponse(
+            content={"status": "success", "data": LLMResilience.snapshot(), "rate_limits": rate_limiter.snapshot()},
+            status_code=status.HTTP_200_OK
+        )
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in get_llm_provider_health: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.get("/jobs/{job_id}",
+           status_code=status.HTTP_200_OK,
+           name="get-generation-job")
+async def get_generation_job(job_id: str,
+                             current_user=Depends(get_current_user)):
+    """Status of a queued meal plan generation"""
+    try:
+        job = GenerationQueueService.get_job(job_id)
+        if not job or job["user_id"] != current_user.id:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"status": "error", "message": "Generation job not found"}
+            )
+
+        return JSONResponse(
+            content={"status": "success", "data": job},
+            status_code=status.HTTP_200_OK
+        )
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in get_generation_job: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
+@router.get("/jobs/{job_id}/events",
+           status_code=status.HTTP_200_OK,
+           name="get-generation-job-events")
+async def get_generation_job_events(job_id: str,
+                                    current_user=Depends(get_current_user)):
+    """Server-sent events for a queued generation, the stream ends once the job finishes"""
+    try:
+        job = GenerationQueueService.get_job(job_id)
+        if not job or job["user_id"] != current_user.id:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"status": "error", "message": "Generation job not found"}
+            )
+
+        async def event_stream():
+            async for event, data in GenerationQueueService.job_events(job_id):
+                if event == "keepalive":
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in get_generation_job_events: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
@@ -2,6 +2,7 @@ import json
 
 from fastapi import APIRouter, Depends, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import JSONResponse
 
 from db.db_conn import get_db
@@ -198,11 +199,18 @@ async def connect_fitness_app(fitness_app_conn: user_schema.FitnessAppConnection
                               db: Session = Depends(get_db)):
     try:
         service = FitnessConnectionService()
-        result = service.connect_user_to_provider(
+        # The provider calls block on HTTP and on the rate limiter, keep them off the event loop
+        result = await run_in_threadpool(
+            service.connect_user_to_provider,
             user_id=current_user.id,
             provider_type=fitness_app_conn.provider,
             authorization_code=auth_code
         )
+        if result.get("status") == "rate_limited":
+            return JSONResponse(
+                content=result,
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS
+            )
         return JSONResponse(
             content=result,
             status_code=status.HTTP_200_OK
@@ -6,6 +6,7 @@ from starlette.responses import JSONResponse
 
 from db.db_conn import get_db
 from db.schemas import workout_schema
+from services.progression_service import ProgressionService
 from services.workout_service import WorkoutService
 from utils import app_logger, resp_msgs
 from utils.dependencies import get_current_user
@@ -75,6 +76,33 @@ async def create_exercise_set(exercise_id: int,
         )
 
 
+@router.post("/sets/bulk",
+            status_code=status.HTTP_201_CREATED,
+            name="bulk-create-exercise-sets")
+async def bulk_create_exercise_sets(request_data: workout_schema.BulkExerciseSetRequestSchema,
+                                    current_user=Depends(get_current_user),
+                                    db: Session = Depends(get_db)):
+    """Sync a batch of exercise sets logged offline, idempotent on client_set_id"""
+    try:
+        result = WorkoutService.bulk_create_exercise_sets(current_user.id, request_data.sets, db)
+        if result:
+            return JSONResponse(
+                content=result,
+                status_code=status.HTTP_201_CREATED if result["created"] else status.HTTP_200_OK
+            )
+        else:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"status": "error", "message": "Failed to sync exercise sets"}
+            )
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in bulk_create_exercise_sets: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
 @router.get("/daily",
            status_code=status.HTTP_200_OK, 
            name="get-daily-workout")
@@ -102,6 +130,24 @@ async def get_daily_workout(workout_date: date = Query(default=None, description
         )
 
 
+@router.get("/progression",
+           status_code=status.HTTP_200_OK,
+           name="get-exercise-progression",
+           response_model=List[workout_schema.ExerciseProgressionResponseSchema])
+async def get_exercise_progression(current_user=Depends(get_current_user),
+                                   db: Session = Depends(get_db)):
+    """Get the user's personal records and estimated 1RM trend per exercise"""
+    try:
+        progressions = ProgressionService.get_user_progressions(current_user.id, db)
+        return list(progressions.values())
+    except Exception as e:
+        app_logger.exceptionlogs(f"Error in get_exercise_progression: {e}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"status": "error", "message": resp_msgs.STATUS_500_MSG}
+        )
+
+
 @router.post("/generate-smart-ppl-workout",
             status_code=status.HTTP_201_CREATED,
             name="generate-smart-ppl-workout")
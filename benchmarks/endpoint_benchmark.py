@@ -0,0 +1,482 @@
+"""
+In-process latency benchmark for every router mounted in api/main_api.py.
+
+    python -m benchmarks.endpoint_benchmark --users 50 --days 14 --requests 100
+    python -m benchmarks.endpoint_benchmark --compare benchmarks/baselines/<sha>.json
+
+The app in main.py is driven through httpx's ASGI transport against a freshly seeded SQLite
+database, so no server, network or LLM is involved. LLM generation is served by the
+deterministic FakeLLMProvider registered in LLMService. For each scenario the report holds
+p50/p95/p99 latency, mean latency, SQL queries and DB time per request, the worst repeated
+statement count (likely N+1) and the status codes seen. A scenario that answered anything but
+2xx (or a status it lists as expected) is flagged FAILED and the run exits non-zero, since its
+latencies time an error path rather than the endpoint.
+Results are written as JSON baselines that `--compare` diffs against a later run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+BASELINE_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "baselines")
+API_PREFIX = "/api/v1"
+# Foods every synthetic user has at home, for the inventory listing and recipe suggestions
+PANTRY_FOODS = ["chicken breast", "rice", "broccoli", "eggs", "olive oil", "oats", "banana", "greek yogurt"]
+
+
+@dataclass
+class Scenario:
+    name: str
+    router: str
+    method: str
+    # Builds the request kwargs (url, params, json) for the n-th iteration
+    build: Callable[["BenchmarkContext", int], dict]
+    authenticated: bool = True
+    # Non-2xx statuses the scenario may legitimately answer, e.g. 404 for a day without a plan
+    expected_statuses: Tuple[int, ...] = ()
+
+
+@dataclass
+class BenchmarkContext:
+    user_ids: List[int]
+    tokens: Dict[int, str]
+    workout_ids: List[int]
+    exercise_ids: List[int]
+    days: int
+    today: date = field(default_factory=date.today)
+    # Inventory item ids per user, the pantry first and then the items the delete scenario removes
+    inventory_ids: Dict[int, List[int]] = field(default_factory=dict)
+
+    def user_for(self, iteration: int) -> int:
+        return self.user_ids[iteration % len(self.user_ids)]
+
+    def day_for(self, iteration: int) -> date:
+        return self.today - timedelta(days=iteration % self.days)
+
+
+def _prepare_environment(db_dir: str, db_name: str):
+    """The app reads its configuration at import time, so this runs before importing main"""
+    os.environ["DB_PATH"] = db_dir.rstrip("/") + "/"
+    os.environ["DB_NAME"] = db_name
+    # A fresh signing key per run: the tokens minted for the synthetic users are never valid
+    # against a deployment, nor against a later run
+    os.environ["SECRET_KEY"] = secrets.token_urlsafe(48)
+    os.environ.setdefault("HASH_SECRET", "benchmark-hash-secret")
+    os.environ.setdefault("OTP_TTL", "180")
+    # Query counts and DB time are read from the headers added by utils/db_instrumentation
+    os.environ["DB_QUERY_INSTRUMENTATION"] = "1"
+
+
+def build_scenarios() -> List[Scenario]:
+    def workout_id(ctx, i):
+        return ctx.workout_ids[i % len(ctx.workout_ids)]
+
+    def exercise_id(ctx, i):
+        return ctx.exercise_ids[i % len(ctx.exercise_ids)]
+
+    def inventory_id(ctx, i):
+        return ctx.inventory_ids[ctx.user_for(i)][0]
+
+    def deletable_inventory_id(ctx, i):
+        # Each iteration of a user removes a different item, from the end of their list
+        ids = ctx.inventory_ids[ctx.user_for(i)]
+        return ids[len(ids) - 1 - i // len(ctx.user_ids)]
+
+    def slot_url(ctx, i, action):
+        return f"/meal-plans/{ctx.day_for(i).isoformat()}/meals/lunch/{action}"
+
+    return [
+        # auth
+        Scenario("auth.request_otp", "auth", "POST",
+                 lambda ctx, i: {"url": "/auth/request-otp", "json": {"phone_number": f"90000{i:05d}"}},
+                 authenticated=False),
+        # users
+        Scenario("users.me", "users", "GET", lambda ctx, i: {"url": "/users/me"}),
+        Scenario("users.daily_meals", "users", "GET", lambda ctx, i: {"url": "/users/me/get-daily-meals"}),
+        Scenario("users.update_profile", "users", "PUT",
+                 lambda ctx, i: {"url": "/users/me/profile", "json": {"max_prep_time_minutes": 30 + i % 30}}),
+        # workouts
+        Scenario("workouts.list", "workouts", "GET", lambda ctx, i: {"url": "/workouts/"}),
+        Scenario("workouts.exercises", "workouts", "GET",
+                 lambda ctx, i: {"url": f"/workouts/{workout_id(ctx, i)}/exercises"}),
+        Scenario("workouts.daily", "workouts", "GET",
+                 lambda ctx, i: {"url": "/workouts/daily", "params": {"workout_date": ctx.day_for(i).isoformat()}}),
+        Scenario("workouts.progression", "workouts", "GET", lambda ctx, i: {"url": "/workouts/progression"}),
+        Scenario("workouts.create_set", "workouts", "POST",
+                 lambda ctx, i: {"url": f"/workouts/exercises/{exercise_id(ctx, i)}/set",
+                                 "json": {"weight": 20 + i % 10, "reps": 8 + i % 4, "time": 0}}),
+        Scenario("workouts.bulk_sets", "workouts", "POST",
+                 lambda ctx, i: {"url": "/workouts/sets/bulk", "json": {"sets": [
+                     {"client_set_id": f"bench-{i}-{n}", "exercise_id": exercise_id(ctx, i + n),
+                      "weight": 30 + n, "reps": 10, "time": 0}
+                     for n in range(20)
+                 ]}}),
+        Scenario("workouts.generate_ppl", "workouts", "POST",
+                 lambda ctx, i: {"url": "/workouts/generate-smart-ppl-workout",
+                                 "params": {"target_date": (ctx.today + timedelta(days=1 + i % 7)).isoformat()}}),
+        # recipe
+        Scenario("recipe.get", "recipe", "GET", lambda ctx, i: {"url": f"/recipe/{1 + i % 10}"},
+                 authenticated=False),
+        # tracker
+        Scenario("tracker.daily_activity", "tracker", "GET",
+                 lambda ctx, i: {"url": "/tracker/daily-activity",
+                                 "params": {"tracker_date": ctx.day_for(i).isoformat()}},
+                 expected_statuses=(404,)),
+        Scenario("tracker.calculate", "tracker", "POST",
+                 lambda ctx, i: {"url": "/tracker/calculate-activity-data",
+                                 "params": {"target_date": ctx.day_for(i).isoformat()}}),
+        # meal plans
+        Scenario("meal_plans.get", "meal-plans", "GET",
+                 lambda ctx, i: {"url": "/meal-plans/", "params": {"target_date": ctx.day_for(i).isoformat()}},
+                 expected_statuses=(404,)),
+        Scenario("meal_plans.summary", "meal-plans", "GET",
+                 lambda ctx, i: {"url": "/meal-plans/summary",
+                                 "params": {"target_date": ctx.day_for(i).isoformat()}},
+                 expected_statuses=(404,)),
+        Scenario("meal_plans.today", "meal-plans", "GET", lambda ctx, i: {"url": "/meal-plans/today"},
+                 expected_statuses=(404,)),
+        Scenario("meal_plans.generate", "meal-plans", "POST",
+                 lambda ctx, i: {"url": "/meal-plans/generate",
+                                 "json": {"target_date": ctx.day_for(i).isoformat(), "regenerate_if_exists": True}}),
+        Scenario("meal_plans.quick_generate", "meal-plans", "POST",
+                 lambda ctx, i: {"url": "/meal-plans/quick-generate",
+                                 "params": {"target_date": ctx.day_for(i).isoformat(), "regenerate": "true"}}),
+        Scenario("meal_plans.generate_range", "meal-plans", "POST",
+                 lambda ctx, i: {"url": "/meal-plans/generate-range",
+                                 "json": {"start_date": (ctx.today + timedelta(days=1)).isoformat(),
+                                          "end_date": (ctx.today + timedelta(days=7)).isoformat(),
+                                          "regenerate_if_exists": True}}),
+        Scenario("meal_plans.grocery_list", "meal-plans", "GET",
+                 lambda ctx, i: {"url": "/meal-plans/grocery-list",
+                                 "params": {"from": ctx.day_for(min(ctx.days, 7) - 1).isoformat(),
+                                            "to": ctx.today.isoformat()}},
+                 expected_statuses=(404,)),
+        Scenario("meal_plans.alternatives", "meal-plans", "GET",
+                 lambda ctx, i: {"url": slot_url(ctx, i, "alternatives")},
+                 expected_statuses=(404,)),
+        Scenario("meal_plans.swap", "meal-plans", "POST",
+                 lambda ctx, i: {"url": slot_url(ctx, i, "swap"),
+                                 "json": {"meal_name": f"Benchmark bowl {i % 5}", "calories": 550 + i % 50,
+                                          "protein_g": 35, "carbs_g": 60, "fat_g": 15}},
+                 expected_statuses=(404,)),
+        Scenario("meal_plans.regenerate_slot", "meal-plans", "POST",
+                 lambda ctx, i: {"url": slot_url(ctx, i, "regenerate"), "json": {"instructions": "something lighter"}},
+                 expected_statuses=(404,)),
+        Scenario("meal_plans.adapt", "meal-plans", "POST",
+                 lambda ctx, i: {"url": "/meal-plans/adapt", "json": {"target_date": ctx.day_for(i).isoformat()}},
+                 expected_statuses=(404,)),
+        # Jobs only exist with the Redis queue, without it this times the lookup and its 404
+        Scenario("meal_plans.job_status", "meal-plans", "GET",
+                 lambda ctx, i: {"url": f"/meal-plans/jobs/benchmark-{i}"},
+                 expected_statuses=(404,)),
+        # inventory
+        Scenario("inventory.create", "inventory", "POST",
+                 lambda ctx, i: {"url": "/inventory/",
+                                 "json": {"name": PANTRY_FOODS[i % len(PANTRY_FOODS)], "quantity": 1 + i % 5,
+                                          "expiry_date": (ctx.today + timedelta(days=i % 10)).isoformat()}}),
+        Scenario("inventory.list", "inventory", "GET", lambda ctx, i: {"url": "/inventory/"}),
+        Scenario("inventory.expiring", "inventory", "GET",
+                 lambda ctx, i: {"url": "/inventory/", "params": {"expiring_within_days": 3}}),
+        Scenario("inventory.suggestions", "inventory", "GET",
+                 lambda ctx, i: {"url": "/inventory/suggestions", "params": {"limit": 10}}),
+        Scenario("inventory.update", "inventory", "PUT",
+                 lambda ctx, i: {"url": f"/inventory/{inventory_id(ctx, i)}", "json": {"quantity": 1 + i % 7}}),
+        Scenario("inventory.delete", "inventory", "DELETE",
+                 lambda ctx, i: {"url": f"/inventory/{deletable_inventory_id(ctx, i)}"}),
+    ]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies_ms: List[float], queries: List[int], db_times_ms: List[float], repeated: List[int],
+              status_codes: Dict[int, int], expected_statuses: Tuple[int, ...] = ()) -> dict:
+    ordered = sorted(latencies_ms)
+    return {
+        "requests": len(latencies_ms),
+        "p50_ms": round(percentile(ordered, 50), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+        "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "max_ms": round(ordered[-1], 3) if ordered else 0.0,
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else 0.0,
+        "max_queries": max(queries) if queries else 0,
+        "db_ms_per_request": round(sum(db_times_ms) / len(db_times_ms), 3) if db_times_ms else 0.0,
+        "max_repeated_statements": max(repeated) if repeated else 0,
+        "status_codes": {str(code): count for code, count in sorted(status_codes.items())},
+        "non_2xx": sum(count for code, count in status_codes.items() if not 200 <= code < 300),
+        "unexpected_statuses": sum(
+            count for code, count in status_codes.items()
+            if not 200 <= code < 300 and code not in expected_statuses
+        ),
+    }
+
+
+def seed_inventory(user_ids: List[int], deletable: int, today: date, db) -> Dict[int, List[int]]:
+    """The pantry of every user, followed by `deletable` items for the delete scenario to remove"""
+    from db.models.inventory import InventoryItem
+    from services.ingredient_nutrition_service import IngredientNutritionService
+
+    ingredient_ids = {}
+    for name in PANTRY_FOODS:
+        resolved = IngredientNutritionService.resolve(name, db)
+        ingredient_ids[name] = IngredientNutritionService.ingredient_id(resolved, db) if resolved else None
+
+    items = {user_id: [] for user_id in user_ids}
+    for user_id in user_ids:
+        for n in range(len(PANTRY_FOODS) + deletable):
+            name = PANTRY_FOODS[n % len(PANTRY_FOODS)]
+            items[user_id].append(InventoryItem(
+                user_id=user_id, ingredient_id=ingredient_ids[name], name=name, quantity=1 + n % 4,
+                unit="piece", expiry_date=today + timedelta(days=n % 10)
+            ))
+        db.add_all(items[user_id])
+    db.commit()
+    return {user_id: [item.id for item in user_items] for user_id, user_items in items.items()}
+
+
+def seed(engine, users: int, days: int, seed_value: int, deletable_items: int = 0) -> BenchmarkContext:
+    from populate_synthetic_data import seed_database
+    from db.db_conn import SessionLocal
+    from db.models import User
+    from services.workout_catalogue_service import WorkoutCatalogueService
+    from utils.app_helper import create_auth_token
+
+    # History up to today, the scenarios ask for today's plan and recent days
+    today = date.today()
+    seed_database(engine, users=users, days=days, seed=seed_value, verbose=False,
+                  start_date=today - timedelta(days=days - 1))
+
+    db = SessionLocal()
+    try:
+        seeded_users = db.query(User).filter(
+            User.phone_number.like(f"synthetic-{seed_value}-%")
+        ).order_by(User.id).all()
+        WorkoutCatalogueService.invalidate()
+        workouts = WorkoutCatalogueService.get_default_workouts(db)
+        exercise_ids = [
+            exercise.id
+            for workout in workouts
+            for exercise in WorkoutCatalogueService.get_exercises_for_workout(workout.id, db)
+        ]
+        return BenchmarkContext(
+            user_ids=[user.id for user in seeded_users],
+            tokens={user.id: create_auth_token(user) for user in seeded_users},
+            workout_ids=[workout.id for workout in workouts],
+            exercise_ids=exercise_ids,
+            days=days,
+            today=today,
+            inventory_ids=seed_inventory([user.id for user in seeded_users], deletable_items, today, db)
+        )
+    finally:
+        db.close()
+
+
+async def run_scenario(client, scenario: Scenario, ctx: BenchmarkContext, requests: int, warmup: int,
+                       concurrency: int) -> dict:
+    from utils import db_instrumentation
+
+    latencies_ms: List[float] = []
+    queries: List[int] = []
+    db_times_ms: List[float] = []
+    repeated: List[int] = []
+    status_codes: Dict[int, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(iteration: int, record: bool):
+        kwargs = scenario.build(ctx, iteration)
+        url = API_PREFIX + kwargs.pop("url")
+        headers = {}
+        if scenario.authenticated:
+            headers["Authorization"] = f"Bearer {ctx.tokens[ctx.user_for(iteration)]}"
+
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(scenario.method, url, headers=headers, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if record:
+            latencies_ms.append(elapsed_ms)
+            queries.append(int(response.headers.get(db_instrumentation.QUERY_COUNT_HEADER, 0)))
+            db_times_ms.append(float(response.headers.get(db_instrumentation.QUERY_TIME_HEADER, 0)))
+            repeated.append(int(response.headers.get(db_instrumentation.REPEATED_STATEMENTS_HEADER, 0)))
+            status_codes[response.status_code] = status_codes.get(response.status_code, 0) + 1
+
+    for iteration in range(warmup):
+        await one(iteration, record=False)
+    await asyncio.gather(*(one(warmup + iteration, record=True) for iteration in range(requests)))
+
+    result = summarize(latencies_ms, queries, db_times_ms, repeated, status_codes, scenario.expected_statuses)
+    result["router"] = scenario.router
+    result["method"] = scenario.method
+    return result
+
+
+async def run_benchmark(app, scenarios: List[Scenario], ctx: BenchmarkContext, requests: int, warmup: int,
+                        concurrency: int, verbose: bool = True) -> Dict[str, dict]:
+    import httpx
+
+    # Unhandled exceptions become 500s in the report instead of aborting the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for scenario in scenarios:
+            results[scenario.name] = await run_scenario(client, scenario, ctx, requests, warmup, concurrency)
+            if verbose:
+                print(format_row(scenario.name, results[scenario.name]))
+    return results
+
+
+def format_row(name: str, result: dict) -> str:
+    codes = ",".join(f"{code}x{count}" for code, count in result["status_codes"].items())
+    failed = "  FAILED" if result["unexpected_statuses"] else ""
+    return (f"{name:<28} p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  "
+            f"p99 {result['p99_ms']:>9.2f}ms  queries/req {result['queries_per_request']:>7.2f}  "
+            f"db {result['db_ms_per_request']:>7.2f}ms  repeated {result['max_repeated_statements']}  "
+            f"non-2xx {result['non_2xx']}  [{codes}]{failed}")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return datetime.utcnow().strftime("%Y%m%d%H%M%S")
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Regressions of the current run: p95 slower by more than `threshold` or more queries per request"""
+    regressions = []
+    print(f"\nComparison against {baseline['meta'].get('revision')} (threshold {threshold:.0%})")
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if not previous:
+            print(f"{name:<28} new scenario")
+            continue
+
+        p95_change = (result["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] if previous["p95_ms"] else 0.0
+        query_change = result["queries_per_request"] - previous["queries_per_request"]
+        flags = []
+        if result.get("unexpected_statuses"):
+            flags.append("FAILED")
+        if p95_change > threshold:
+            flags.append("SLOWER")
+        if query_change > 0:
+            flags.append("MORE QUERIES")
+        previous_repeated = previous.get("max_repeated_statements")
+        if previous_repeated is not None and result["max_repeated_statements"] > previous_repeated:
+            flags.append("NEW N+1")
+        print(f"{name:<28} p95 {previous['p95_ms']:>9.2f} -> {result['p95_ms']:>9.2f}ms ({p95_change:+.1%})  "
+              f"queries/req {previous['queries_per_request']:>7.2f} -> {result['queries_per_request']:>7.2f}  "
+              f"{' '.join(flags)}")
+        if flags:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every API router in-process")
+    parser.add_argument("--users", type=int, default=50, help="Synthetic users to seed")
+    parser.add_argument("--days", type=int, default=14, help="Days of history per user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight per scenario")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency of the fake LLM")
+    parser.add_argument("--scenarios", nargs="*", help="Only run scenarios whose name starts with one of these")
+    parser.add_argument("--db-dir", help="Directory of the benchmark database (default: a temp dir)")
+    parser.add_argument("--output", help="Baseline file to write (default: benchmarks/baselines/<revision>.json)")
+    parser.add_argument("--compare", help="Baseline file to compare the run against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative p95 increase")
+    args = parser.parse_args(argv)
+
+    db_dir = args.db_dir or tempfile.mkdtemp(prefix="meal_plan_benchmark_")
+    db_name = f"benchmark_{args.seed}_{args.users}_{args.days}.db"
+    if os.path.exists(os.path.join(db_dir, db_name)):
+        os.remove(os.path.join(db_dir, db_name))
+    _prepare_environment(db_dir, db_name)
+
+    import main as app_module
+    from benchmarks.fake_llm_provider import FakeLLMProvider
+    from db.db_conn import engine
+    from services.llm_service import LLMService
+
+    fake_provider = FakeLLMProvider(latency_ms=args.llm_latency_ms)
+    for provider in ("ollama", "openai", "anthropic"):
+        LLMService.register_provider(provider, fake_provider)
+
+    print(f"Seeding {args.users} users x {args.days} days into {os.path.join(db_dir, db_name)}")
+    # Enough items per user for every delete the run makes, warmup included
+    ctx = seed(engine, args.users, args.days, args.seed,
+               deletable_items=-(-(args.requests + args.warmup) // max(1, args.users)))
+
+    scenarios = build_scenarios()
+    if args.scenarios:
+        scenarios = [scenario for scenario in scenarios if scenario.name.startswith(tuple(args.scenarios))]
+
+    results = asyncio.run(run_benchmark(app_module.app, scenarios, ctx, args.requests, args.warmup,
+                                        args.concurrency))
+
+    revision = git_revision()
+    report = {
+        "meta": {
+            "revision": revision,
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "days": args.days,
+            "seed": args.seed,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_calls": fake_provider.calls,
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(BASELINE_DIR, f"{revision}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nBaseline written to {output}")
+
+    exit_code = 0
+    failed = [name for name, result in results.items() if result["unexpected_statuses"]]
+    if failed:
+        print(f"\n{len(failed)} scenario(s) answered unexpected statuses, their timings are not a valid "
+              f"baseline: {', '.join(failed)}")
+        exit_code = 1
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} scenario(s) regressed: {', '.join(regressions)}")
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Deterministic stand-in for the LLM providers, so generation can be benchmarked offline.
+The same prompt always produces the same meal plan, sized to the prompt's calorie target.
+"""
+
+import asyncio
+import hashlib
+import re
+from typing import Dict, Any
+
+
+MEAL_SHARES = {
+    "breakfast": 0.25,
+    "lunch": 0.30,
+    "dinner": 0.30,
+    "snack_1": 0.075,
+    "snack_2": 0.075,
+}
+
+MEAL_NAMES = {
+    "breakfast": ["Oats with Banana", "Veggie Omelette", "Greek Yogurt Parfait", "Masala Poha"],
+    "lunch": ["Grilled Chicken Bowl", "Paneer Tikka Wrap", "Lentil Dal with Rice", "Tuna Salad"],
+    "dinner": ["Salmon with Quinoa", "Tofu Stir Fry", "Chicken Curry", "Rajma Chawal"],
+    "snack_1": ["Apple with Peanut Butter", "Roasted Chana", "Protein Shake"],
+    "snack_2": ["Mixed Nuts", "Cottage Cheese Bowl", "Hummus and Carrots"],
+}
+
+CALORIE_TARGET_PATTERN = re.compile(r"Target Calories:\s*([\d.]+)")
+BATCH_USER_PATTERN = re.compile(r'^### User "(\w+)"$', re.MULTILINE)
+SLOT_PATTERN = re.compile(r"^MEAL SLOT: (\w+)$", re.MULTILINE)
+CALORIE_BUDGET_PATTERN = re.compile(r"Calorie Budget:\s*([\d.]+)")
+ALTERNATIVES_PATTERN = re.compile(r"a list of (\d+) other meals")
+
+
+class FakeLLMProvider:
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    async def __call__(self, prompt: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls += 1
+        latency_ms = config.get("fake_latency_ms", self.latency_ms)
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        if BATCH_USER_PATTERN.search(prompt):
+            return self.build_batch_meal_plans(prompt)
+        if SLOT_PATTERN.search(prompt):
+            return self.build_slot_meal(prompt)
+        return self.build_meal_plan(prompt)
+
+    @classmethod
+    def build_slot_meal(cls, prompt: str) -> Dict[str, Any]:
+        """The single meal asked for by a slot prompt, sized to its calorie budget"""
+        meal_type = SLOT_PATTERN.search(prompt).group(1)
+        match = CALORIE_BUDGET_PATTERN.search(prompt)
+        calories = round(float(match.group(1))) if match else 400
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        return cls.build_meal(meal_type, calories, digest[0])
+
+    @classmethod
+    def build_batch_meal_plans(cls, prompt: str) -> Dict[str, Any]:
+        """One plan per `### User "<key>"` section of a batch prompt"""
+        matches = list(BATCH_USER_PATTERN.finditer(prompt))
+        plans = {}
+        for index, match in enumerate(matches):
+            end = matches[index + 1].start() if index + 1 < len(matches) else len(prompt)
+            plans[match.group(1)] = cls.build_meal_plan(prompt[match.start():end])
+        return plans
+
+    @staticmethod
+    def build_meal(meal_type: str, calories: float, seed: int) -> Dict[str, Any]:
+        names = MEAL_NAMES.get(meal_type, MEAL_NAMES["lunch"])
+        return {
+            "meal_name": names[seed % len(names)],
+            "description": f"Deterministic {meal_type.replace('_', ' ')}",
+            "calories": calories,
+            "protein_g": round(calories * 0.25 / 4, 1),
+            "carbs_g": round(calories * 0.45 / 4, 1),
+            "fat_g": round(calories * 0.30 / 9, 1),
+            "fiber_g": round(calories / 1000 * 14, 1),
+            "sodium_mg": 300,
+            "sugar_g": 5,
+            "prep_time_minutes": 10,
+            "cooking_time_minutes": 15,
+            "difficulty_level": 2,
+            "cuisine_type": "Indian",
+            "ingredients": ["100 g rice", "150 g chicken breast", "1 tbsp olive oil"],
+            "instructions": ["Prepare the ingredients", "Cook and serve"],
+            "is_vegetarian": False,
+            "is_vegan": False,
+            "is_gluten_free": True,
+            "is_dairy_free": True
+        }
+
+    @staticmethod
+    def build_meal_plan(prompt: str) -> Dict[str, Any]:
+        match = CALORIE_TARGET_PATTERN.search(prompt)
+        target_calories = float(match.group(1)) if match else 2000.0
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+
+        plan = {}
+        for index, (meal_type, share) in enumerate(MEAL_SHARES.items()):
+            plan[meal_type] = FakeLLMProvider.build_meal(meal_type, round(target_calories * share), digest[index])
+
+        plan["daily_summary"] = {
+            "total_calories": sum(meal["calories"] for meal in plan.values()),
+            "total_protein_g": round(sum(meal["protein_g"] for meal in plan.values()), 1),
+            "total_carbs_g": round(sum(meal["carbs_g"] for meal in plan.values()), 1),
+            "total_fat_g": round(sum(meal["fat_g"] for meal in plan.values()), 1),
+            "total_fiber_g": round(sum(meal["fiber_g"] for meal in plan.values()), 1),
+            "meets_targets": True,
+            "variety_score": 7,
+            "prep_time_total": 125
+        }
+
+        match = ALTERNATIVES_PATTERN.search(prompt)
+        if match:
+            plan["alternatives"] = {
+                meal_type: [
+                    FakeLLMProvider.build_meal(meal_type, plan[meal_type]["calories"], digest[index] + offset)
+                    for offset in range(1, int(match.group(1)) + 1)
+                ]
+                for index, meal_type in enumerate(MEAL_SHARES)
+            }
+        return plan
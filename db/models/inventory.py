@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Date
+from sqlalchemy import func
+from sqlalchemy.orm import relationship
+
+from db.models import Base
+
+
+class InventoryItem(Base):
+    __tablename__ = "inventory_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Set when the name resolves to a known ingredient
+    ingredient_id = Column(Integer, ForeignKey("ingredients.id"), nullable=True)
+    name = Column(String(100), nullable=False)
+
+    quantity = Column(Float, nullable=False, default=0.0)
+    unit = Column(String(20), nullable=False, default="piece")
+    expiry_date = Column(Date, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    user = relationship("User", back_populates="inventory_items")
+    ingredient = relationship("Ingredient")
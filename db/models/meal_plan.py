@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Text, Date, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Text, Date, UniqueConstraint, Index
 from sqlalchemy import func
 from sqlalchemy.orm import relationship
 
@@ -42,47 +42,53 @@ class MealPlan(Base):
     # Relationships
     user = relationship("User", back_populates="meal_plans")
     meals = relationship("Meal", back_populates="meal_plan", cascade="all, delete-orphan")
+    alternatives = relationship("MealAlternative", back_populates="meal_plan", cascade="all, delete-orphan")
+    history = relationship("MealHistory", back_populates="meal_plan", cascade="all, delete-orphan")
 
     __table_args__ = (
         UniqueConstraint('user_id', 'date', name='unique_user_meal_plan_date'),
     )
 
 
-class Meal(Base):
-    __tablename__ = "meals"
+class CanonicalMeal(Base):
+    """
+    One dish of the meal library, shared by every plan it is served in. Nutrients are for the
+    portion as generated; `content_hash` identifies the dish by its content, so the same
+    generated meal is stored once however many users get it.
+    """
+    __tablename__ = "canonical_meals"
 
     id = Column(Integer, primary_key=True, index=True)
-    meal_plan_id = Column(Integer, ForeignKey("meal_plans.id"), nullable=False)
-    
+    content_hash = Column(String(64), nullable=False, unique=True, index=True)
+
     # Meal details
-    meal_type = Column(String(50), nullable=False)  # breakfast, lunch, dinner, snack_1, snack_2
     meal_name = Column(String(200), nullable=False)
     description = Column(Text)
-    
+
     # Nutritional information
     calories = Column(Float, nullable=False)
     protein_g = Column(Float, default=0.0)
     carbs_g = Column(Float, default=0.0)
     fat_g = Column(Float, default=0.0)
     fiber_g = Column(Float, default=0.0)
-    
+
     # Additional nutritional info
     sodium_mg = Column(Float, default=0.0)
     sugar_g = Column(Float, default=0.0)
     calcium_mg = Column(Float, default=0.0)
     iron_mg = Column(Float, default=0.0)
     vitamin_c_mg = Column(Float, default=0.0)
-    
+
     # Meal metadata
     prep_time_minutes = Column(Integer, default=0)
     cooking_time_minutes = Column(Integer, default=0)
     difficulty_level = Column(Integer, default=1)  # 1-5 scale
     cuisine_type = Column(String(50))
-    
+
     # Ingredients and instructions (JSON stored as text)
     ingredients = Column(Text)  # JSON array of ingredients
     instructions = Column(Text)  # JSON array of cooking steps
-    
+
     # Dietary flags
     is_vegetarian = Column(Boolean, default=False)
     is_vegan = Column(Boolean, default=False)
@@ -90,6 +96,41 @@ class Meal(Base):
     is_dairy_free = Column(Boolean, default=False)
     is_low_carb = Column(Boolean, default=False)
     is_high_protein = Column(Boolean, default=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    meals = relationship("Meal", back_populates="canonical_meal")
+
+
+def _canonical_field(name):
+    """Read-only attribute of the meal's library dish"""
+    return property(lambda meal: getattr(meal.canonical_meal, name) if meal.canonical_meal else None)
+
+
+def _scaled_nutrient(name):
+    """Nutrient of the library dish at the meal's portion"""
+    def value(meal):
+        if not meal.canonical_meal:
+            return None
+        base = getattr(meal.canonical_meal, name) or 0.0
+        return round(base * (meal.portion_multiplier or 1.0), 1)
+    return property(value)
+
+
+class Meal(Base):
+    """A plan's slot: which library dish, at what portion, and what the user made of it"""
+    __tablename__ = "meals"
+
+    id = Column(Integer, primary_key=True, index=True)
+    meal_plan_id = Column(Integer, ForeignKey("meal_plans.id"), nullable=False)
+    canonical_meal_id = Column(Integer, ForeignKey("canonical_meals.id"), nullable=False, index=True)
+    
+    meal_type = Column(String(50), nullable=False)  # breakfast, lunch, dinner, snack_1, snack_2
+
+    # Portion relative to the dish as generated, the nutrients below are scaled by it
+    portion_multiplier = Column(Float, default=1.0)
+    # Rank among the slot's stored alternatives, 0 for the generated meal, None for one put in by hand
+    alternative_rank = Column(Integer)
     
     # User interaction
     user_rating = Column(Integer)  # 1-5 stars
@@ -102,3 +143,86 @@ class Meal(Base):
 
     # Relationships
     meal_plan = relationship("MealPlan", back_populates="meals")
+    # Loaded with the meal, a meal is never read without its dish
+    canonical_meal = relationship("CanonicalMeal", back_populates="meals", lazy="joined")
+
+    # Meal details
+    meal_name = _canonical_field("meal_name")
+    description = _canonical_field("description")
+
+    # Nutritional information
+    calories = _scaled_nutrient("calories")
+    protein_g = _scaled_nutrient("protein_g")
+    carbs_g = _scaled_nutrient("carbs_g")
+    fat_g = _scaled_nutrient("fat_g")
+    fiber_g = _scaled_nutrient("fiber_g")
+    sodium_mg = _scaled_nutrient("sodium_mg")
+    sugar_g = _scaled_nutrient("sugar_g")
+    calcium_mg = _scaled_nutrient("calcium_mg")
+    iron_mg = _scaled_nutrient("iron_mg")
+    vitamin_c_mg = _scaled_nutrient("vitamin_c_mg")
+
+    # Meal metadata
+    prep_time_minutes = _canonical_field("prep_time_minutes")
+    cooking_time_minutes = _canonical_field("cooking_time_minutes")
+    difficulty_level = _canonical_field("difficulty_level")
+    cuisine_type = _canonical_field("cuisine_type")
+    ingredients = _canonical_field("ingredients")
+    instructions = _canonical_field("instructions")
+
+    # Dietary flags
+    is_vegetarian = _canonical_field("is_vegetarian")
+    is_vegan = _canonical_field("is_vegan")
+    is_gluten_free = _canonical_field("is_gluten_free")
+    is_dairy_free = _canonical_field("is_dairy_free")
+    is_low_carb = _canonical_field("is_low_carb")
+    is_high_protein = _canonical_field("is_high_protein")
+
+
+class MealAlternative(Base):
+    """A stored alternative for a plan's slot: which library dish, at what portion"""
+    __tablename__ = "meal_alternatives"
+
+    id = Column(Integer, primary_key=True, index=True)
+    meal_plan_id = Column(Integer, ForeignKey("meal_plans.id"), nullable=False)
+    canonical_meal_id = Column(Integer, ForeignKey("canonical_meals.id"), nullable=False, index=True)
+    meal_type = Column(String(50), nullable=False)
+    rank = Column(Integer, nullable=False)  # 0 is the meal the plan was generated with, best alternative first
+    source = Column(String(20))  # generated, llm, history, recipe
+
+    # Portion relative to the library dish, scaled to the slot's calories
+    portion_multiplier = Column(Float, default=1.0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    meal_plan = relationship("MealPlan", back_populates="alternatives")
+    canonical_meal = relationship("CanonicalMeal", lazy="joined")
+
+    meal_name = _canonical_field("meal_name")
+    calories = _scaled_nutrient("calories")
+
+    __table_args__ = (
+        UniqueConstraint('meal_plan_id', 'meal_type', 'rank', name='unique_meal_alternative_rank'),
+    )
+
+
+class MealHistory(Base):
+    """Fingerprint of every meal in a user's plans, for variety checks by index lookup"""
+    __tablename__ = "meal_history"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    meal_plan_id = Column(Integer, ForeignKey("meal_plans.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    meal_type = Column(String(50), nullable=False)
+    fingerprint = Column(String(32), nullable=False)  # hash of the normalized meal name
+    meal_name = Column(String(200))
+
+    # Relationships
+    meal_plan = relationship("MealPlan", back_populates="history")
+
+    __table_args__ = (
+        Index('ix_meal_history_user_fingerprint_date', 'user_id', 'fingerprint', 'date'),
+        Index('ix_meal_history_user_date', 'user_id', 'date'),
+    )
@@ -42,6 +42,11 @@ class User(Base):
         back_populates="user",
         cascade="all, delete-orphan"
     )
+    inventory_items = relationship(
+        "InventoryItem",
+        back_populates="user",
+        cascade="all, delete-orphan"
+    )
 
     exercise_set = relationship("ExerciseSet", back_populates="user")
 
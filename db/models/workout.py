@@ -1,7 +1,7 @@
 from sqlalchemy.orm import relationship
 
 from db.models import Base
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, UniqueConstraint, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Enum, UniqueConstraint, Float
 from sqlalchemy import select, func
 from utils.enums import WorkoutType
 
@@ -42,6 +42,47 @@ class ExerciseSet(Base):
     weight = Column(Float, default=0)
     reps = Column(Integer, default=0)
     time = Column(Float, default=0)
+    # Client generated id used to make offline sync idempotent
+    client_set_id = Column(String(64), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="exercise_set")
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'client_set_id', name='unique_user_client_set'),
+    )
+
+
+class ExerciseProgression(Base):
+    """Running per-user, per-exercise progression summary, updated on every set insert"""
+    __tablename__ = "exercise_progressions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    exercise_id = Column(Integer, ForeignKey("exercises.id"), nullable=False)
+
+    # Personal records
+    best_weight = Column(Float, default=0.0)
+    best_reps = Column(Integer, default=0)
+    best_estimated_1rm = Column(Float, default=0.0)
+    best_set_at = Column(DateTime(timezone=True))
+    max_reps = Column(Integer, default=0)
+    max_time = Column(Float, default=0.0)
+
+    # Estimated 1RM (Epley) of the latest set and its rolling trend
+    last_estimated_1rm = Column(Float, default=0.0)
+    rolling_estimated_1rm = Column(Float, default=0.0)  # exponential moving average
+    estimated_1rm_trend = Column(Float, default=0.0)  # moving average of the change per set
+
+    # Volume (weight * reps)
+    last_session_date = Column(Date)
+    last_session_volume = Column(Float, default=0.0)
+    total_volume = Column(Float, default=0.0)
+    total_sets = Column(Integer, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'exercise_id', name='unique_user_exercise_progression'),
+    )
@@ -0,0 +1,17 @@
+from datetime import date
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class InventoryItemCreateSchema(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100, description="Food as the user calls it, e.g. chicken breast")
+    quantity: float = Field(..., ge=0)
+    unit: Optional[str] = Field(default="piece", max_length=20, description="g, ml, piece, cup, ...")
+    expiry_date: Optional[date] = None
+
+
+class InventoryItemUpdateSchema(BaseModel):
+    name: Optional[str] = Field(default=None, min_length=1, max_length=100)
+    quantity: Optional[float] = Field(default=None, ge=0)
+    unit: Optional[str] = Field(default=None, max_length=20)
+    expiry_date: Optional[date] = None
@@ -38,6 +38,8 @@ class MealResponseSchema(BaseModel):
     fiber_g: float
     sodium_mg: float
     sugar_g: float
+    portion_multiplier: Optional[float] = 1.0
+    alternative_rank: Optional[int] = None
     prep_time_minutes: int
     cooking_time_minutes: int
     difficulty_level: int
@@ -60,6 +62,58 @@ class MealPlanGenerationRequestSchema(BaseModel):
     custom_calorie_target: Optional[float] = None
     custom_preferences: Optional[dict] = None
     regenerate_if_exists: Optional[bool] = False
+    async_mode: Optional[bool] = Field(default=False, description="Queue the generation and return 202 with a job id")
+    fallback_deadline_seconds: Optional[float] = Field(default=None, gt=0, description="Serve the previous plan rescaled to today's targets if the LLM takes longer")
+
+
+class MealPlanRangeGenerationRequestSchema(BaseModel):
+    start_date: date
+    end_date: date
+    custom_calorie_target: Optional[float] = None
+    custom_preferences: Optional[dict] = None
+    regenerate_if_exists: Optional[bool] = False
+
+
+class MealPlanAdaptationRequestSchema(BaseModel):
+    target_date: date
+    custom_calorie_target: Optional[float] = None
+    custom_preferences: Optional[dict] = None
+    allow_llm_fallback: Optional[bool] = Field(default=True, description="Regenerate with the LLM when portion scaling cannot meet the new targets")
+
+
+class MealPlanBatchGenerationRequestSchema(BaseModel):
+    target_date: date
+    user_ids: Optional[List[int]] = Field(default=None, description="Users to generate for, all active users when omitted")
+    batch_size: Optional[int] = Field(default=None, ge=1, le=20, description="Users packed into one LLM call")
+    regenerate_if_exists: Optional[bool] = False
+    custom_preferences: Optional[dict] = None
+
+
+class MealSlotRegenerateRequestSchema(BaseModel):
+    instructions: Optional[str] = Field(default=None, max_length=300, description="What the user wants instead, e.g. something lighter")
+    custom_preferences: Optional[dict] = None
+
+
+class MealSwapRequestSchema(BaseModel):
+    meal_name: str
+    description: Optional[str] = None
+    calories: float
+    protein_g: Optional[float] = 0.0
+    carbs_g: Optional[float] = 0.0
+    fat_g: Optional[float] = 0.0
+    fiber_g: Optional[float] = 0.0
+    sodium_mg: Optional[float] = 0.0
+    sugar_g: Optional[float] = 0.0
+    prep_time_minutes: Optional[int] = 0
+    cooking_time_minutes: Optional[int] = 0
+    difficulty_level: Optional[int] = 1
+    cuisine_type: Optional[str] = None
+    ingredients: Optional[List[str]] = []
+    instructions: Optional[List[str]] = []
+    is_vegetarian: Optional[bool] = False
+    is_vegan: Optional[bool] = False
+    is_gluten_free: Optional[bool] = False
+    is_dairy_free: Optional[bool] = False
 
 
 class MealPlanResponseSchema(BaseModel):
@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, datetime
 from typing import Optional, List
 from pydantic import BaseModel
 
@@ -54,8 +54,8 @@ class DailyActivityTrackerResponseSchema(BaseModel):
     net_calorie_balance: float
     workout_types_done: Optional[str] = None
     notes: Optional[str] = None
-    created_at: str
-    updated_at: str
+    created_at: datetime
+    updated_at: datetime
 
     class Config:
         from_attributes = True
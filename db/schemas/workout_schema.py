@@ -1,7 +1,7 @@
-from datetime import date
+from datetime import date, datetime
 from typing import Optional, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class WorkoutResponseSchema(BaseModel):
@@ -34,6 +34,19 @@ class ExerciseSetRequestSchema(BaseModel):
     time: float
 
 
+class BulkExerciseSetItemSchema(BaseModel):
+    client_set_id: str = Field(..., min_length=1, max_length=64)
+    exercise_id: int
+    weight: float = 0.0
+    reps: int = 0
+    time: float = 0.0
+    performed_at: Optional[datetime] = None
+
+
+class BulkExerciseSetRequestSchema(BaseModel):
+    sets: List[BulkExerciseSetItemSchema] = Field(..., min_length=1, max_length=500)
+
+
 class ExerciseSetResponseSchema(BaseModel):
     id: int
     exercise_id: int
@@ -45,6 +58,26 @@ class ExerciseSetResponseSchema(BaseModel):
         from_attributes = True
 
 
+class ExerciseProgressionResponseSchema(BaseModel):
+    exercise_id: int
+    best_weight: float
+    best_reps: int
+    best_estimated_1rm: float
+    best_set_at: Optional[datetime] = None
+    max_reps: int
+    max_time: float
+    last_estimated_1rm: float
+    rolling_estimated_1rm: float
+    estimated_1rm_trend: float
+    last_session_date: Optional[date] = None
+    last_session_volume: float
+    total_volume: float
+    total_sets: int
+
+    class Config:
+        from_attributes = True
+
+
 class WorkoutDataSchema(BaseModel):
     date: date
     steps: Optional[int] = None
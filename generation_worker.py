@@ -0,0 +1,76 @@
+"""
+Meal plan generation workers.
+
+    python generation_worker.py --workers 4
+
+Each process joins the generation consumer group as its own consumer, so more capacity is
+just more processes, on this host or any other host pointing at the same Redis.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_consumer(consumer: str):
+    from dotenv import load_dotenv
+    load_dotenv('.env')
+
+    from services.generation_queue_service import GenerationQueueService
+
+    stopping = {"value": False}
+
+    def request_stop(signum, frame):
+        # Finish the job in hand, its ack keeps it from being handed out again
+        stopping["value"] = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    print(f"Generation worker {consumer} started")
+    asyncio.run(GenerationQueueService.run_worker(consumer, should_stop=lambda: stopping["value"]))
+    print(f"Generation worker {consumer} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run meal plan generation workers")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("GENERATION_WORKERS", 2)),
+                        help="Number of worker processes")
+    parser.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}",
+                        help="Consumer name prefix, unique per host")
+    args = parser.parse_args()
+
+    # Fresh interpreters, so no process inherits a Redis or DB connection
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_consumer, args=(f"{args.name}-{index}",), name=f"generation-worker-{index}")
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward_stop(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, forward_stop)
+    signal.signal(signal.SIGINT, forward_stop)
+
+    exit_code = 0
+    for process in processes:
+        process.join()
+        exit_code = exit_code or process.exitcode or 0
+    return exit_code
+
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
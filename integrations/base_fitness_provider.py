@@ -1,17 +1,36 @@
+import os
 from abc import ABC, abstractmethod
 from typing import Dict, Any
 from datetime import date, datetime
 
+from utils.rate_limiter import RateLimit, rate_limiter
+
 
 ## factory pattern to get the instance of different kind of integration class
 ## we can have many integration
 
 
 class BaseFitnessProvider(ABC):
+    # Shared across workers per provider and client id, subclasses set their own name / quota
+    provider_name = "fitness"
+    RATE_LIMIT = RateLimit("rpm", float(os.getenv("FITNESS_RATE_LIMIT_RPM", 50)))
+    RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("FITNESS_RATE_LIMIT_MAX_WAIT_SECONDS", 60))
+
     def __init__(self, credentials: Dict[str, str]):
         self.credentials = credentials
         self.client = None
 
+    def _throttle(self):
+        """
+        Block until the provider's API quota allows another call, call before every API request.
+        This sleeps the calling thread, so async code must call the providers through a threadpool.
+        """
+        rate_limiter.acquire_sync(
+            rate_limiter.build_key(self.provider_name, self.credentials.get("client_id"), self.RATE_LIMIT),
+            self.RATE_LIMIT,
+            max_wait_seconds=self.RATE_LIMIT_MAX_WAIT_SECONDS
+        )
+
     @abstractmethod
     def authenticate(self, authorization_code: str) -> Dict[str, Any]:
         """Exchange authorization code for access token"""
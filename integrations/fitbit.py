@@ -6,12 +6,15 @@ from integrations.base_fitness_provider import BaseFitnessProvider
 class FitbitProvider(BaseFitnessProvider):
     """Fitbit API implementation"""
 
+    provider_name = "fitbit"
+
     def __init__(self, credentials: Dict[str, str]):
         super().__init__(credentials)
         # Initialize Fitbit client
 
     def authenticate(self, authorization_code: str) -> Dict[str, Any]:
         """Exchange authorization code for Fitbit access token"""
+        self._throttle()
         # Implementation would use Fitbit OAuth2 flow
         return {
             "access_token": "mock_fitbit_access_token",
@@ -22,6 +25,7 @@ class FitbitProvider(BaseFitnessProvider):
 
     def refresh_token(self, refresh_token: str) -> Dict[str, Any]:
         """Refresh Fitbit access token"""
+        self._throttle()
         return {
             "access_token": "new_fitbit_access_token",
             "expires_in": 28800
@@ -29,6 +33,7 @@ class FitbitProvider(BaseFitnessProvider):
 
     def get_daily_data(self, access_token: str, target_date: date) -> Dict[str, Any]:
         """Get daily data from Fitbit"""
+        self._throttle()
         # Implementation would call Fitbit Web API
         return {
             "steps": 9200,
@@ -43,6 +48,7 @@ class FitbitProvider(BaseFitnessProvider):
 
     def test_connection(self, access_token: str) -> bool:
         """Test Fitbit connection"""
+        self._throttle()
         try:
             # Make test API call to Fitbit
             return True
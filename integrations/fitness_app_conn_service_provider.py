@@ -4,6 +4,7 @@ from integrations.base_fitness_provider import BaseFitnessProvider
 from integrations.fitbit import FitbitProvider
 from integrations.google_fit import GoogleFitProvider
 from utils.enums import FitnessProvider
+from utils.rate_limiter import RateLimitExceeded
 from datetime import date, datetime
 
 
@@ -64,6 +65,7 @@ class FitnessConnectionService:
     """High-level service for managing fitness connections"""
 
     def connect_user_to_provider(self, user_id: int, provider_type: str, authorization_code: str) -> Dict[str, Any]:
+        """Blocking (provider HTTP calls and rate-limit waits), run it in a threadpool from async code"""
         try:
             # Create provider using factory
             provider = FitnessAppConnectionFactory.create_provider(FitnessProvider(provider_type))
@@ -77,10 +79,15 @@ class FitnessConnectionService:
             return {
                 "status": "success",
                 "provider": provider_type,
-                "connected_at": datetime.utcnow(),
+                "connected_at": datetime.utcnow().isoformat(),
                 "message": f"Successfully connected to {provider_type}"
             }
 
+        except RateLimitExceeded as e:
+            return {
+                "status": "rate_limited",
+                "message": f"{provider_type} is busy, try again shortly: {e}"
+            }
         except ValueError as e:
             return {
                 "status": "error",
@@ -6,11 +6,14 @@ from integrations.base_fitness_provider import BaseFitnessProvider
 class GoogleFitProvider(BaseFitnessProvider):
     """Google Fit API implementation"""
 
+    provider_name = "google_fit"
+
     def __init__(self, credentials: Dict[str, str]):
         super().__init__(credentials)
         # Initialize Google Fit client with credentials
 
     def authenticate(self, authorization_code: str) -> Dict[str, Any]:
+        self._throttle()
         return {
             "access_token": "mock_google_access_token",
             "refresh_token": "mock_google_refresh_token",
@@ -19,12 +22,14 @@ class GoogleFitProvider(BaseFitnessProvider):
         }
 
     def refresh_token(self, refresh_token: str) -> Dict[str, Any]:
+        self._throttle()
         return {
             "access_token": "new_google_access_token",
             "expires_in": 3600
         }
 
     def get_daily_data(self, access_token: str, target_date: date) -> Dict[str, Any]:
+        self._throttle()
         return {
             "steps": 8500,
             "calories_burned": 250,
@@ -34,6 +39,7 @@ class GoogleFitProvider(BaseFitnessProvider):
         }
 
     def test_connection(self, access_token: str) -> bool:
+        self._throttle()
         try:
             return True
         except Exception as e:
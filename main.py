@@ -11,9 +11,13 @@ load_dotenv('.env')
 from fastapi import FastAPI
 
 from api import main_api
+from utils import db_instrumentation
 
 app = FastAPI()
 
+if db_instrumentation.is_enabled():
+    db_instrumentation.install(engine)
+    app.add_middleware(db_instrumentation.QueryInstrumentationMiddleware)
 
 
 app.include_router(main_api.api_router, prefix="/api/v1")
@@ -0,0 +1,175 @@
+"""
+Move the dishes of an existing `meals` table into the meal library.
+
+Meals used to carry their full content; now they point at a `canonical_meals` row. This adds
+`meals.canonical_meal_id` and any other `meals` columns the table predates, fills it by hashing
+every existing meal into the library (at portion 1, so portions of the same dish share a row),
+then drops the copied columns. Stored meal alternatives get the same treatment: their JSON copy
+of the dish becomes a `canonical_meal_id` and a portion. It also adds the offline sync key
+`exercise_sets.client_set_id` and its unique index to tables that predate it. Safe to run again.
+
+    python migrate_meal_library.py
+"""
+
+import json
+import os
+import sys
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db.db_conn import engine
+from db.models import Base
+from services.meal_library_service import MealLibraryService
+
+LEGACY_COLUMNS = [
+    "meal_name", "description", "calories", "protein_g", "carbs_g", "fat_g", "fiber_g", "sodium_mg", "sugar_g",
+    "calcium_mg", "iron_mg", "vitamin_c_mg", "prep_time_minutes", "cooking_time_minutes", "difficulty_level",
+    "cuisine_type", "ingredients", "instructions", "is_vegetarian", "is_vegan", "is_gluten_free", "is_dairy_free",
+    "is_low_carb", "is_high_protein",
+]
+# Columns added to `meals` since the first schema, with the type to add them as
+ADDED_COLUMNS = {
+    "portion_multiplier": "FLOAT DEFAULT 1.0",
+    "alternative_rank": "INTEGER",
+}
+# Columns of `meal_alternatives` that held the copied dish
+LEGACY_ALTERNATIVE_COLUMNS = ["meal_name", "calories", "meal_data"]
+BATCH_SIZE = 1000
+
+
+def migrate_meals():
+    columns = {column["name"] for column in inspect(engine).get_columns("meals")}
+    legacy_columns = [column for column in LEGACY_COLUMNS if column in columns]
+    missing_columns = [column for column in ADDED_COLUMNS if column not in columns]
+    if "canonical_meal_id" in columns and not legacy_columns and not missing_columns:
+        print("meals already point at the meal library, nothing to do")
+        return
+
+    with engine.begin() as conn:
+        if "canonical_meal_id" not in columns:
+            conn.execute(text("ALTER TABLE meals ADD COLUMN canonical_meal_id INTEGER REFERENCES canonical_meals(id)"))
+            conn.execute(text("CREATE INDEX ix_meals_canonical_meal_id ON meals (canonical_meal_id)"))
+        for column in missing_columns:
+            conn.execute(text(f"ALTER TABLE meals ADD COLUMN {column} {ADDED_COLUMNS[column]}"))
+
+    library = MealLibraryService()
+    selected = ", ".join(["id", "portion_multiplier"] + legacy_columns)
+    migrated = 0
+    with Session(engine) as db:
+        while True:
+            rows = db.execute(text(
+                f"SELECT {selected} FROM meals WHERE canonical_meal_id IS NULL ORDER BY id LIMIT {BATCH_SIZE}"
+            )).mappings().all()
+            if not rows:
+                break
+            meal_infos = []
+            for row in rows:
+                meal_info = dict(row)
+                for field in ("ingredients", "instructions"):
+                    meal_info[field] = json.loads(meal_info[field]) if meal_info.get(field) else []
+                meal_infos.append(meal_info)
+            for row, canonical_meal in zip(rows, library.canonical_meals(meal_infos, db)):
+                db.flush()
+                db.execute(text("UPDATE meals SET canonical_meal_id = :canonical_meal_id WHERE id = :id"),
+                           {"canonical_meal_id": canonical_meal.id, "id": row["id"]})
+            db.commit()
+            migrated += len(rows)
+            print(f"  {migrated} meals moved to the library")
+
+    with engine.begin() as conn:
+        for column in legacy_columns:
+            conn.execute(text(f"ALTER TABLE meals DROP COLUMN {column}"))
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ALTER TABLE meals ALTER COLUMN canonical_meal_id SET NOT NULL"))
+
+    print(f"Migrated {migrated} meals")
+
+
+def migrate_alternatives():
+    columns = {column["name"] for column in inspect(engine).get_columns("meal_alternatives")}
+    if "meal_data" not in columns:
+        print("meal alternatives already point at the meal library, nothing to do")
+        return
+
+    with engine.begin() as conn:
+        if "canonical_meal_id" not in columns:
+            conn.execute(text(
+                "ALTER TABLE meal_alternatives ADD COLUMN canonical_meal_id INTEGER REFERENCES canonical_meals(id)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX ix_meal_alternatives_canonical_meal_id ON meal_alternatives (canonical_meal_id)"
+            ))
+        if "portion_multiplier" not in columns:
+            conn.execute(text("ALTER TABLE meal_alternatives ADD COLUMN portion_multiplier FLOAT DEFAULT 1.0"))
+
+    library = MealLibraryService()
+    migrated = 0
+    with Session(engine) as db:
+        while True:
+            rows = db.execute(text(
+                "SELECT id, meal_data FROM meal_alternatives WHERE canonical_meal_id IS NULL "
+                f"ORDER BY id LIMIT {BATCH_SIZE}"
+            )).mappings().all()
+            if not rows:
+                break
+            meal_infos = [json.loads(row["meal_data"]) for row in rows]
+            for row, meal_info, canonical_meal in zip(rows, meal_infos, library.canonical_meals(meal_infos, db)):
+                db.flush()
+                db.execute(text(
+                    "UPDATE meal_alternatives SET canonical_meal_id = :canonical_meal_id, "
+                    "portion_multiplier = :portion_multiplier WHERE id = :id"
+                ), {
+                    "canonical_meal_id": canonical_meal.id,
+                    "portion_multiplier": meal_info.get("portion_multiplier") or 1.0,
+                    "id": row["id"]
+                })
+            db.commit()
+            migrated += len(rows)
+            print(f"  {migrated} meal alternatives moved to the library")
+
+    with engine.begin() as conn:
+        for column in LEGACY_ALTERNATIVE_COLUMNS:
+            if column in columns:
+                conn.execute(text(f"ALTER TABLE meal_alternatives DROP COLUMN {column}"))
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ALTER TABLE meal_alternatives ALTER COLUMN canonical_meal_id SET NOT NULL"))
+    print(f"Migrated {migrated} meal alternatives")
+
+
+def migrate_exercise_sets():
+    columns = {column["name"] for column in inspect(engine).get_columns("exercise_sets")}
+    indexes = {index["name"] for index in inspect(engine).get_indexes("exercise_sets")}
+    indexes |= {constraint["name"] for constraint in inspect(engine).get_unique_constraints("exercise_sets")}
+    if "client_set_id" in columns and "unique_user_client_set" in indexes:
+        print("exercise sets already have client_set_id, nothing to do")
+        return
+
+    with engine.begin() as conn:
+        if "client_set_id" not in columns:
+            conn.execute(text("ALTER TABLE exercise_sets ADD COLUMN client_set_id VARCHAR(64)"))
+        if "unique_user_client_set" not in indexes:
+            conn.execute(text(
+                "CREATE UNIQUE INDEX unique_user_client_set ON exercise_sets (user_id, client_set_id)"
+            ))
+    print("Added exercise_sets.client_set_id")
+
+
+def main():
+    # Creates canonical_meals (and meal_alternatives where missing), leaves existing tables alone
+    Base.metadata.create_all(bind=engine)
+    migrate_meals()
+    migrate_alternatives()
+    migrate_exercise_sets()
+
+    with engine.connect() as conn:
+        dishes = conn.execute(text("SELECT COUNT(*) FROM canonical_meals")).scalar()
+    print(f"The meal library has {dishes} dishes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
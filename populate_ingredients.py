@@ -0,0 +1,44 @@
+import sys
+import os
+from sqlalchemy.orm import Session
+
+# Add the project root to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db.db_conn import get_db
+from services.ingredient_nutrition_service import IngredientNutritionService
+
+
+def main():
+    """Main function to populate the default ingredients"""
+    print("Starting to populate default ingredients...")
+
+    # Get database session
+    db_gen = get_db()
+    db: Session = next(db_gen)
+
+    try:
+        result = IngredientNutritionService.populate_default_ingredients(db)
+
+        if result:
+            print(f"{result['message']}")
+            if result['status'] == 'success':
+                print(f"Total ingredients created: {result['ingredients_created']}")
+        else:
+            print("Failed to populate default ingredients")
+            return 1
+
+    except Exception as e:
+        print(f"Error occurred: {e}")
+        return 1
+
+    finally:
+        db.close()
+
+    print("Script completed successfully!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,392 @@
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from db.db_conn import SessionLocal
+from utils import app_logger
+from utils.redis_helper import RedisHelper
+
+
+class GenerationQueueService:
+    """
+    Meal plan generation jobs on a Redis Stream consumed through a consumer group.
+
+    - Every worker process is a consumer of GROUP, so scaling out means starting more workers.
+    - A job stays in the group's pending list until it is acked, a worker that dies mid-job
+      leaves it there and XAUTOCLAIM hands it to another worker once it has been idle for
+      VISIBILITY_TIMEOUT_MS (at-least-once delivery). Workers heartbeat long jobs so they
+      are not stolen while still running.
+    - Failed jobs are acked and parked in RETRY_KEY (a sorted set scored by due time) with
+      exponential backoff, after MAX_ATTEMPTS they go to DEAD_LETTER_STREAM.
+    - Job state lives in a hash per job so the API can report it, every change is also
+      published on the job's events channel for the SSE endpoint.
+    """
+
+    STREAM_KEY = "meal_plan:generation:jobs"
+    GROUP = "meal_plan_generators"
+    RETRY_KEY = "meal_plan:generation:retry"
+    DEAD_LETTER_STREAM = "meal_plan:generation:dead_letter"
+    JOB_KEY = "meal_plan:generation:job:{job_id}"
+    EVENTS_CHANNEL = "meal_plan:generation:events:{job_id}"
+    TERMINAL_STATUSES = ("completed", "failed", "dead_lettered")
+
+    # Must stay above the slowest LLM call (the Ollama timeout is 120s)
+    VISIBILITY_TIMEOUT_MS = int(os.getenv("GENERATION_VISIBILITY_TIMEOUT_MS", 180000))
+    MAX_ATTEMPTS = int(os.getenv("GENERATION_MAX_ATTEMPTS", 5))
+    BACKOFF_BASE_SECONDS = float(os.getenv("GENERATION_BACKOFF_BASE_SECONDS", 2))
+    BACKOFF_MAX_SECONDS = float(os.getenv("GENERATION_BACKOFF_MAX_SECONDS", 300))
+    JOB_TTL_SECONDS = int(os.getenv("GENERATION_JOB_TTL_SECONDS", 86400))
+    STREAM_MAX_LENGTH = 100000
+    READ_BLOCK_MS = 5000
+
+    # Moves one due retry back onto the stream, atomically so two workers never both promote it
+    # and a crash in between cannot lose it
+    PROMOTE_RETRY_SCRIPT = """
+    if redis.call('ZREM', KEYS[1], ARGV[1]) == 1 then
+        return redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'job_id', ARGV[2], 'payload', ARGV[1])
+    end
+    return false
+    """
+
+    _client = None
+
+    @classmethod
+    def get_client(cls):
+        """Shared Redis client of this process with the consumer group in place, None when Redis is down"""
+        if cls._client is None:
+            client = RedisHelper().client
+            if client is None:
+                return None
+            cls._ensure_group(client)
+            cls._client = client
+        return cls._client
+
+    @classmethod
+    def _ensure_group(cls, client):
+        try:
+            client.xgroup_create(cls.STREAM_KEY, cls.GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    @classmethod
+    def _job_key(cls, job_id: str) -> str:
+        return cls.JOB_KEY.format(job_id=job_id)
+
+    @classmethod
+    def enqueue(cls, user_id: int, target_date: date, custom_config: Optional[Dict[str, Any]] = None,
+                regenerate_if_exists: bool = False) -> Dict[str, Any]:
+        """Queue a generate_meal_plan call, the returned job_id can be polled with get_job"""
+        try:
+            client = cls.get_client()
+            if client is None:
+                return {"status": "error", "message": "Generation queue is unavailable"}
+
+            job_id = uuid.uuid4().hex
+            now = datetime.utcnow().isoformat()
+            payload = json.dumps({
+                "job_id": job_id,
+                "user_id": user_id,
+                "target_date": target_date.isoformat(),
+                "custom_config": custom_config or {},
+                "regenerate_if_exists": regenerate_if_exists
+            })
+
+            pipe = client.pipeline()
+            pipe.hset(cls._job_key(job_id), mapping={
+                "job_id": job_id,
+                "user_id": user_id,
+                "target_date": target_date.isoformat(),
+                "status": "queued",
+                "attempts": 0,
+                "created_at": now,
+                "updated_at": now
+            })
+            pipe.expire(cls._job_key(job_id), cls.JOB_TTL_SECONDS)
+            pipe.xadd(cls.STREAM_KEY, {"job_id": job_id, "payload": payload},
+                      maxlen=cls.STREAM_MAX_LENGTH, approximate=True)
+            pipe.execute()
+
+            return {"status": "success", "job_id": job_id, "job_status": "queued"}
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in enqueue generation job: {e}")
+            return {"status": "error", "message": "Failed to queue meal plan generation"}
+
+    @classmethod
+    def get_job(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            client = cls.get_client()
+            if client is None:
+                return None
+            job = client.hgetall(cls._job_key(job_id))
+            if not job:
+                return None
+            job["user_id"] = int(job["user_id"])
+            job["attempts"] = int(job.get("attempts", 0))
+            if job.get("result"):
+                job["result"] = json.loads(job["result"])
+            return job
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in get_job: {e}")
+            return None
+
+    @classmethod
+    def _update_job(cls, client, job_id: str, **fields):
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], default=str)
+        fields = {key: value for key, value in fields.items() if value is not None}
+
+        pipe = client.pipeline()
+        pipe.hset(cls._job_key(job_id), mapping=fields)
+        pipe.publish(cls.EVENTS_CHANNEL.format(job_id=job_id), json.dumps({"job_id": job_id, **fields}))
+        pipe.execute()
+
+    @classmethod
+    def backoff_seconds(cls, attempts: int) -> float:
+        """Exponential backoff with full jitter on the upper half"""
+        delay = min(cls.BACKOFF_MAX_SECONDS, cls.BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    @classmethod
+    def promote_due_retries(cls, client, limit: int = 100) -> int:
+        due = client.zrangebyscore(cls.RETRY_KEY, 0, time.time(), start=0, num=limit)
+        promoted = 0
+        for member in due:
+            job_id = json.loads(member)["job_id"]
+            if client.eval(cls.PROMOTE_RETRY_SCRIPT, 2, cls.RETRY_KEY, cls.STREAM_KEY,
+                           member, job_id, cls.STREAM_MAX_LENGTH):
+                cls._update_job(client, job_id, status="queued")
+                promoted += 1
+        return promoted
+
+    @classmethod
+    def claim_stale(cls, client, consumer: str, count: int = 10) -> List[tuple]:
+        """Take over jobs whose worker stopped heartbeating"""
+        response = client.xautoclaim(cls.STREAM_KEY, cls.GROUP, consumer, cls.VISIBILITY_TIMEOUT_MS,
+                                     start_id="0-0", count=count)
+        messages = response[1] if len(response) > 1 else []
+        stale = []
+        for message_id, fields in messages:
+            if not fields:
+                # Trimmed from the stream while pending, nothing left to run
+                client.xack(cls.STREAM_KEY, cls.GROUP, message_id)
+                continue
+            stale.append((message_id, fields))
+        return stale
+
+    @classmethod
+    def read_new(cls, client, consumer: str, count: int = 1, block_ms: Optional[int] = None) -> List[tuple]:
+        response = client.xreadgroup(cls.GROUP, consumer, {cls.STREAM_KEY: ">"}, count=count,
+                                     block=cls.READ_BLOCK_MS if block_ms is None else block_ms)
+        if not response:
+            return []
+        return response[0][1]
+
+    @classmethod
+    async def _heartbeat(cls, consumer: str, message_id: str):
+        """
+        Reset the idle time of an in-flight job so XAUTOCLAIM does not hand it out again, on an
+        asyncio client so a slow Redis never blocks the generation running on the same loop
+        """
+        interval = cls.VISIBILITY_TIMEOUT_MS / 3000
+        client = RedisHelper.create_async_client()
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await client.xclaim(cls.STREAM_KEY, cls.GROUP, consumer, 0, [message_id], justid=True)
+        finally:
+            await client.aclose()
+
+    @classmethod
+    async def process_message(cls, client, consumer: str, message_id: str, fields: Dict[str, str]) -> str:
+        """Run one job and ack it, returns the job status it ended in"""
+        payload = json.loads(fields["payload"])
+        job_id = payload["job_id"]
+
+        job = client.hgetall(cls._job_key(job_id))
+        if job.get("status") in cls.TERMINAL_STATUSES:
+            # Redelivery of a job that finished before its ack went through
+            client.xack(cls.STREAM_KEY, cls.GROUP, message_id)
+            return job["status"]
+
+        attempts = client.hincrby(cls._job_key(job_id), "attempts", 1)
+        if attempts > cls.MAX_ATTEMPTS:
+            # A job that keeps killing its worker never reaches the retry branch below
+            return cls._dead_letter(client, message_id, payload, attempts - 1, "Exceeded max attempts")
+
+        cls._update_job(client, job_id, status="running", worker=consumer, started_at=datetime.utcnow().isoformat())
+        heartbeat = asyncio.create_task(cls._heartbeat(consumer, message_id))
+        try:
+            result = await cls._run_generation(payload)
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in generation job {job_id}: {e}")
+            result = {"status": "error", "message": "Failed to generate meal plan", "error": str(e)}
+        finally:
+            heartbeat.cancel()
+
+        if result.get("status") in ("success", "info"):
+            cls._update_job(client, job_id, status="completed", meal_plan_id=result.get("meal_plan_id"),
+                            result=result, finished_at=datetime.utcnow().isoformat())
+            client.xack(cls.STREAM_KEY, cls.GROUP, message_id)
+            return "completed"
+
+        if result.get("status") != "error":
+            # Missing user, profile or fitness goal, retrying cannot fix it
+            cls._update_job(client, job_id, status="failed", result=result, error=result.get("message"),
+                            finished_at=datetime.utcnow().isoformat())
+            client.xack(cls.STREAM_KEY, cls.GROUP, message_id)
+            return "failed"
+
+        error = result.get("error") or result.get("message")
+        if attempts >= cls.MAX_ATTEMPTS:
+            return cls._dead_letter(client, message_id, payload, attempts, error)
+
+        due_at = time.time() + cls.backoff_seconds(attempts)
+        pipe = client.pipeline()
+        pipe.zadd(cls.RETRY_KEY, {json.dumps({**payload, "attempt": attempts}): due_at})
+        pipe.xack(cls.STREAM_KEY, cls.GROUP, message_id)
+        pipe.execute()
+        cls._update_job(client, job_id, status="retrying", error=error,
+                        next_attempt_at=datetime.utcfromtimestamp(due_at).isoformat())
+        return "retrying"
+
+    @classmethod
+    def _dead_letter(cls, client, message_id: str, payload: Dict[str, Any], attempts: int, error: str) -> str:
+        pipe = client.pipeline()
+        pipe.xadd(cls.DEAD_LETTER_STREAM, {
+            "job_id": payload["job_id"],
+            "payload": json.dumps(payload),
+            "attempts": attempts,
+            "error": error or "",
+            "failed_at": datetime.utcnow().isoformat()
+        }, maxlen=cls.STREAM_MAX_LENGTH, approximate=True)
+        pipe.xack(cls.STREAM_KEY, cls.GROUP, message_id)
+        pipe.execute()
+        cls._update_job(client, payload["job_id"], status="dead_lettered", error=error,
+                        finished_at=datetime.utcnow().isoformat())
+        return "dead_lettered"
+
+    @staticmethod
+    async def _run_generation(payload: Dict[str, Any]) -> Dict[str, Any]:
+        from services.meal_planning_service import MealPlanningService
+
+        db = SessionLocal()
+        try:
+            return await MealPlanningService().generate_meal_plan(
+                user_id=payload["user_id"],
+                target_date=date.fromisoformat(payload["target_date"]),
+                custom_config=payload.get("custom_config") or None,
+                regenerate_if_exists=payload.get("regenerate_if_exists", False),
+                db=db
+            )
+        finally:
+            db.close()
+
+    @classmethod
+    async def job_events(cls, job_id: str, keepalive_seconds: float = 15, max_wait_seconds: float = 900):
+        """
+        Async iterator of (event, data) for one job: its current state first, then every update
+        until a terminal status. Yields ("keepalive", None) while nothing happens.
+        """
+        client = RedisHelper.create_async_client()
+        pubsub = client.pubsub()
+        try:
+            # Subscribe before reading the state so an update in between is not missed
+            await pubsub.subscribe(cls.EVENTS_CHANNEL.format(job_id=job_id))
+            job = cls.get_job(job_id)
+            if not job:
+                return
+            yield job["status"], job
+            if job["status"] in cls.TERMINAL_STATUSES:
+                return
+
+            deadline = time.monotonic() + max_wait_seconds
+            while time.monotonic() < deadline:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=keepalive_seconds)
+                if not message:
+                    yield "keepalive", None
+                    continue
+                update = json.loads(message["data"])
+                job = cls.get_job(job_id) or update
+                yield update.get("status", job["status"]), job
+                if update.get("status") in cls.TERMINAL_STATUSES:
+                    return
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+    @classmethod
+    async def run_worker(cls, consumer: str, should_stop=lambda: False):
+        """Consume jobs until `should_stop()` is true, one job at a time"""
+        client = None
+        while not should_stop():
+            try:
+                client = client or cls.get_client()
+                if client is None:
+                    await asyncio.sleep(cls.READ_BLOCK_MS / 1000)
+                    continue
+
+                cls.promote_due_retries(client)
+                messages = cls.claim_stale(client, consumer) or cls.read_new(client, consumer)
+                for message_id, fields in messages:
+                    await cls.process_message(client, consumer, message_id, fields)
+            except Exception as e:
+                app_logger.exceptionlogs(f"Error in generation worker {consumer}: {e}")
+                cls._client = client = None
+                await asyncio.sleep(1)
+
+    @classmethod
+    def get_metrics(cls) -> Dict[str, Any]:
+        """Queue depth, in-flight work and lag of the consumer group"""
+        try:
+            client = cls.get_client()
+            if client is None:
+                return {"status": "error", "message": "Generation queue is unavailable"}
+
+            group = next(
+                (group for group in client.xinfo_groups(cls.STREAM_KEY) if group["name"] == cls.GROUP), {}
+            )
+            last_delivered_id = group.get("last-delivered-id", "0-0")
+
+            # Age of the oldest job nobody has picked up yet
+            oldest_waiting = client.xrange(cls.STREAM_KEY, min=f"({last_delivered_id}", count=1)
+            oldest_waiting_seconds = 0.0
+            if oldest_waiting:
+                enqueued_ms = int(oldest_waiting[0][0].split("-")[0])
+                oldest_waiting_seconds = max(0.0, time.time() - enqueued_ms / 1000)
+
+            oldest_pending = client.xpending_range(cls.STREAM_KEY, cls.GROUP, min="-", max="+", count=1)
+            consumers = client.xinfo_consumers(cls.STREAM_KEY, cls.GROUP) if group else []
+
+            lag = group.get("lag")
+            if lag is None:
+                # Redis < 7 does not report lag, count the undelivered entries instead
+                lag = len(client.xrange(cls.STREAM_KEY, min=f"({last_delivered_id}", count=cls.STREAM_MAX_LENGTH))
+
+            return {
+                "status": "success",
+                "data": {
+                    "depth": lag,
+                    "pending": group.get("pending", 0),
+                    "retry_scheduled": client.zcard(cls.RETRY_KEY),
+                    "dead_letter": client.xlen(cls.DEAD_LETTER_STREAM),
+                    "stream_length": client.xlen(cls.STREAM_KEY),
+                    "consumers": len(consumers),
+                    "active_consumers": sum(
+                        1 for consumer in consumers if consumer.get("idle", 0) < cls.VISIBILITY_TIMEOUT_MS
+                    ),
+                    "oldest_waiting_seconds": round(oldest_waiting_seconds, 3),
+                    "oldest_pending_idle_seconds": round(
+                        oldest_pending[0]["time_since_delivered"] / 1000, 3
+                    ) if oldest_pending else 0.0
+                }
+            }
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in get generation queue metrics: {e}")
+            return {"status": "error", "message": "Failed to read generation queue metrics"}
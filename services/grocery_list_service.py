@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, selectinload
+
+from db.models.meal_plan import MealPlan, Meal
+from services.ingredient_nutrition_service import IngredientNutritionService
+from utils import app_logger
+from utils.ingredient_parser import parse_ingredient, canonical_amount, display_amount
+from utils.redis_helper import RedisHelper
+
+
+class GroceryListService:
+    """
+    One shopping list for a set of meal plans.
+
+    Every ingredient line of every meal is parsed, scaled by the meal's portion and merged with
+    the lines naming the same food: through the ingredient index where the name resolves
+    ("boneless chicken breasts" and "chicken breast" are one item), else on the name without
+    preparation words. Amounts are summed in one unit per food (pieces for counted foods, ml for
+    liquids, grams for the rest that weighs, else the line's own unit), and lines without an
+    amount ("salt to taste") are listed once with no quantity.
+
+    Lists for a date range are cached in Redis under the version of the range's plans, a hash
+    of their meals' dishes and portions, so any regenerate, swap or adaptation of a day in the
+    range makes a new key and stale lists simply expire. Without Redis the last lists built are
+    kept in process instead.
+    """
+
+    CACHE_PREFIX = "grocery_list:v1"
+    CACHE_TTL_SECONDS = int(os.getenv("GROCERY_LIST_CACHE_TTL", 86400))
+    MAX_RANGE_DAYS = 31
+    LOCAL_CACHE_SIZE = 256
+    _redis: Optional[RedisHelper] = None
+    _local_lock = threading.Lock()
+    _local: "OrderedDict[str, str]" = OrderedDict()
+
+    @classmethod
+    def _redis_client(cls) -> RedisHelper:
+        if cls._redis is None:
+            cls._redis = RedisHelper()
+        return cls._redis
+
+    @classmethod
+    def _cache_get(cls, key: str) -> Optional[str]:
+        redis_helper = cls._redis_client()
+        if redis_helper.client:
+            return redis_helper.get(key)
+        with cls._local_lock:
+            value = cls._local.get(key)
+            if value is not None:
+                cls._local.move_to_end(key)
+            return value
+
+    @classmethod
+    def _cache_set(cls, key: str, value: str):
+        redis_helper = cls._redis_client()
+        if redis_helper.client:
+            redis_helper.set_with_ttl(key, value, cls.CACHE_TTL_SECONDS)
+            return
+        with cls._local_lock:
+            cls._local[key] = value
+            if len(cls._local) > cls.LOCAL_CACHE_SIZE:
+                cls._local.popitem(last=False)
+
+    def for_range(self, user_id: int, start_date: date, end_date: date, db: Session) -> Dict[str, Any]:
+        """The grocery list of the user's plans from `start_date` to `end_date`, both included"""
+        try:
+            days = (end_date - start_date).days + 1
+            if days < 1 or days > self.MAX_RANGE_DAYS:
+                return {
+                    "status": "error",
+                    "message": f"The range must span 1 to {self.MAX_RANGE_DAYS} days, got {days}"
+                }
+
+            # Only the keys of the meals, enough to tell whether a cached list still holds
+            rows = db.query(MealPlan.id, Meal.id, Meal.canonical_meal_id, Meal.portion_multiplier).outerjoin(
+                Meal, Meal.meal_plan_id == MealPlan.id
+            ).filter(
+                MealPlan.user_id == user_id,
+                MealPlan.date >= start_date,
+                MealPlan.date <= end_date
+            ).order_by(MealPlan.id, Meal.id).all()
+            if not rows:
+                return {"status": "not_found", "message": f"No meal plans from {start_date} to {end_date}"}
+
+            # Item names and categories come from the ingredient index, a changed index is a new list
+            version = self.plan_version(rows, IngredientNutritionService.source_version(db))
+            cache_key = f"{self.CACHE_PREFIX}:{user_id}:{start_date}:{end_date}:{version}"
+            cached = self._cache_get(cache_key)
+            if cached:
+                return {"status": "success", **json.loads(cached), "cached": True}
+
+            plan_ids = {row[0] for row in rows}
+            meal_plans = db.query(MealPlan).options(selectinload(MealPlan.meals)).filter(
+                MealPlan.id.in_(plan_ids)
+            ).order_by(MealPlan.date).all()
+            grocery_list = {
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "dates": [meal_plan.date.isoformat() for meal_plan in meal_plans],
+                "version": version,
+                "items": self.build(meal_plans, db)
+            }
+            self._cache_set(cache_key, json.dumps(grocery_list))
+            return {"status": "success", **grocery_list, "cached": False}
+
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error building grocery list for user {user_id}: {e}")
+            return {"status": "error", "message": str(e)}
+
+    @staticmethod
+    def plan_version(rows: List[Tuple[Any, ...]], ingredients_version: str = "") -> str:
+        """Hash of (plan id, meal id, dish id, portion) rows, ordered by plan and meal, and the ingredient index"""
+        key = ";".join(",".join("" if value is None else str(value) for value in row) for row in rows)
+        key = f"{ingredients_version}|{key}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    def build(self, meal_plans: List[MealPlan], db: Session) -> List[Dict[str, Any]]:
+        items: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        for meal_plan in meal_plans:
+            for meal in meal_plan.meals:
+                portion = meal.portion_multiplier or 1.0
+                for line in json.loads(meal.ingredients) if meal.ingredients else []:
+                    parsed = parse_ingredient(line)
+                    name = IngredientNutritionService.item_name(parsed.name, db)
+                    if not name:
+                        continue
+                    quantity, unit = canonical_amount(parsed)
+                    if quantity is not None:
+                        quantity *= portion
+
+                    item = items.setdefault((name, unit), {"item": name, "quantity": None, "unit": unit,
+                                                           "meal_count": 0})
+                    if quantity is not None:
+                        item["quantity"] = (item["quantity"] or 0.0) + quantity
+                    item["meal_count"] += 1
+
+        grocery_list = []
+        for item in items.values():
+            if item["quantity"] is not None:
+                item["quantity"] = round(item["quantity"], 1)
+            item["display"] = display_amount(item["quantity"], item["unit"])
+            item["category"] = IngredientNutritionService.category(item["item"], db) or "other"
+            grocery_list.append(item)
+        return sorted(grocery_list, key=lambda item: (item["category"], item["item"], item["unit"] or ""))
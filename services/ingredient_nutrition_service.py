@@ -0,0 +1,362 @@
+import difflib
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from db.models.recipe import Ingredient
+from utils import app_logger
+from utils.ingredient_parser import parse_ingredient
+from utils.term_matcher import singular
+
+# Nutrients an ingredient row gives per 100 g, in vector order
+NUTRIENTS = ("calories", "protein_g", "carbs_g", "fat_g")
+INGREDIENT_COLUMNS = ("calories_per_100g", "protein_per_100g", "carbs_per_100g", "fat_per_100g")
+
+# name, category, kcal, protein, carbs, fat per 100 g (cooked where usually eaten cooked)
+DEFAULT_INGREDIENTS = [
+    ("chicken breast", "protein", 165, 31.0, 0.0, 3.6),
+    ("chicken thigh", "protein", 209, 26.0, 0.0, 10.9),
+    ("egg", "protein", 143, 12.6, 0.7, 9.5),
+    ("egg white", "protein", 52, 10.9, 0.7, 0.2),
+    ("salmon", "protein", 208, 20.4, 0.0, 13.4),
+    ("tuna", "protein", 116, 25.5, 0.0, 0.8),
+    ("shrimp", "protein", 99, 24.0, 0.2, 0.3),
+    ("lean beef", "protein", 176, 20.0, 0.0, 10.0),
+    ("tofu", "protein", 76, 8.1, 1.9, 4.8),
+    ("paneer", "dairy", 265, 18.3, 1.2, 20.8),
+    ("whey protein", "protein", 400, 80.0, 8.0, 6.0),
+    ("milk", "dairy", 61, 3.2, 4.8, 3.3),
+    ("yogurt", "dairy", 61, 3.5, 4.7, 3.3),
+    ("greek yogurt", "dairy", 73, 10.0, 3.9, 2.0),
+    ("cottage cheese", "dairy", 98, 11.1, 3.4, 4.3),
+    ("cheddar cheese", "dairy", 403, 24.9, 1.3, 33.1),
+    ("butter", "fat", 717, 0.9, 0.1, 81.1),
+    ("ghee", "fat", 900, 0.0, 0.0, 100.0),
+    ("olive oil", "fat", 884, 0.0, 0.0, 100.0),
+    ("vegetable oil", "fat", 884, 0.0, 0.0, 100.0),
+    ("rice", "grain", 130, 2.7, 28.2, 0.3),
+    ("brown rice", "grain", 112, 2.3, 23.5, 0.8),
+    ("quinoa", "grain", 120, 4.4, 21.3, 1.9),
+    ("oats", "grain", 389, 16.9, 66.3, 6.9),
+    ("whole wheat bread", "grain", 247, 13.0, 41.3, 3.4),
+    ("whole wheat flour", "grain", 340, 13.2, 72.0, 2.5),
+    ("roti", "grain", 299, 7.9, 46.4, 9.2),
+    ("pasta", "grain", 158, 5.8, 30.9, 0.9),
+    ("potato", "vegetable", 77, 2.0, 17.5, 0.1),
+    ("sweet potato", "vegetable", 86, 1.6, 20.1, 0.1),
+    ("lentil", "legume", 116, 9.0, 20.1, 0.4),
+    ("chickpea", "legume", 164, 8.9, 27.4, 2.6),
+    ("kidney bean", "legume", 127, 8.7, 22.8, 0.5),
+    ("peas", "legume", 81, 5.4, 14.5, 0.4),
+    ("spinach", "vegetable", 23, 2.9, 3.6, 0.4),
+    ("broccoli", "vegetable", 34, 2.8, 6.6, 0.4),
+    ("cauliflower", "vegetable", 25, 1.9, 5.0, 0.3),
+    ("mushroom", "vegetable", 22, 3.1, 3.3, 0.3),
+    ("tomato", "vegetable", 18, 0.9, 3.9, 0.2),
+    ("onion", "vegetable", 40, 1.1, 9.3, 0.1),
+    ("carrot", "vegetable", 41, 0.9, 9.6, 0.2),
+    ("bell pepper", "vegetable", 31, 1.0, 6.0, 0.3),
+    ("cucumber", "vegetable", 15, 0.7, 3.6, 0.1),
+    ("garlic", "vegetable", 149, 6.4, 33.1, 0.5),
+    ("banana", "fruit", 89, 1.1, 22.8, 0.3),
+    ("apple", "fruit", 52, 0.3, 13.8, 0.2),
+    ("orange", "fruit", 47, 0.9, 11.8, 0.1),
+    ("blueberry", "fruit", 57, 0.7, 14.5, 0.3),
+    ("strawberry", "fruit", 32, 0.7, 7.7, 0.3),
+    ("avocado", "fruit", 160, 2.0, 8.5, 14.7),
+    ("almond", "nuts", 579, 21.2, 21.6, 49.9),
+    ("walnut", "nuts", 654, 15.2, 13.7, 65.2),
+    ("peanut butter", "nuts", 588, 25.1, 20.0, 50.4),
+    ("chia seed", "nuts", 486, 16.5, 42.1, 30.7),
+    ("coconut milk", "fat", 230, 2.3, 5.5, 23.8),
+    ("honey", "sweetener", 304, 0.3, 82.4, 0.0),
+    ("sugar", "sweetener", 387, 0.0, 100.0, 0.0),
+]
+
+# Words that describe how a food is prepared or sold rather than which food it is
+DESCRIPTORS = {
+    "fresh", "frozen", "raw", "cooked", "boiled", "steamed", "grilled", "roasted", "baked", "fried",
+    "chopped", "diced", "sliced", "minced", "grated", "shredded", "cubed", "mashed", "crushed",
+    "boneless", "skinless", "organic", "plain", "unsweetened", "ripe", "extra", "virgin", "large",
+    "medium", "small", "whole", "fillet", "canned", "dry", "dried", "rolled", "instant", "cup", "of",
+}
+
+
+class IngredientNutritionService:
+    """
+    Nutrition of generated meals computed from their ingredient lines and the `ingredients`
+    table, instead of trusting the numbers the LLM reports.
+
+    The table is loaded once per process into a name index (exact, then without descriptors,
+    then the longest known phrase in the name, then a fuzzy match), and the last
+    `RESOLVED_CACHE_SIZE` names resolved are memoized, so recomputing a plan costs no queries.
+    Call `invalidate()` after changing ingredient rows and the next read reloads them; rows
+    changed elsewhere (populate_ingredients.py, another worker) are picked up by a stamp query
+    on read, at most every `CHECK_SECONDS`.
+    """
+
+    MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack_1", "snack_2"]
+    # Share of a meal's measured ingredient lines that must resolve before its numbers are replaced
+    MIN_COVERAGE = float(os.getenv("NUTRITION_RECOMPUTE_MIN_COVERAGE", 1.0))
+    FUZZY_CUTOFF = 0.85
+    CHECK_SECONDS = float(os.getenv("INGREDIENT_INDEX_CHECK_SECONDS", 30))
+    # LLM output invents endless spellings, so only the most recent lookups are kept
+    RESOLVED_CACHE_SIZE = int(os.getenv("INGREDIENT_RESOLVED_CACHE_SIZE", 10000))
+
+    _lock = threading.Lock()
+    _loaded = False
+    _version = 0
+    # Stamp of the rows the index was loaded from, and when to compare it again
+    _stamp: Tuple = ()
+    _next_check = 0.0
+
+    # normalized name -> nutrients per gram, in NUTRIENTS order
+    _per_gram: Dict[str, Tuple[float, ...]] = {}
+    _names: List[str] = []
+    # normalized name -> category
+    _categories: Dict[str, str] = {}
+    # normalized name -> ingredient id
+    _ids: Dict[str, int] = {}
+    # ingredient line name -> resolved index name (or None), least recently used first
+    _resolved: "OrderedDict[str, Optional[str]]" = OrderedDict()
+
+    @classmethod
+    def load(cls, db: Session) -> int:
+        """(Re)load the ingredient index from the database and return the new version stamp"""
+        # Taken before the rows, so a change landing in between is seen by the next check
+        stamp = cls._source_stamp(db)
+        per_gram = {}
+        categories = {}
+        ids = {}
+        for ingredient in db.query(Ingredient).all():
+            name = cls._normalize(ingredient.name)
+            ids.setdefault(name, ingredient.id)
+            if ingredient.category:
+                categories.setdefault(name, ingredient.category)
+            values = [getattr(ingredient, column) for column in INGREDIENT_COLUMNS]
+            if values[0] is None:
+                continue
+            per_gram.setdefault(name, tuple((value or 0.0) / 100 for value in values))
+
+        with cls._lock:
+            cls._per_gram = per_gram
+            cls._names = sorted(per_gram)
+            cls._categories = categories
+            cls._ids = ids
+            cls._resolved = OrderedDict()
+            cls._stamp = stamp
+            cls._next_check = time.monotonic() + cls.CHECK_SECONDS
+            cls._version += 1
+            cls._loaded = True
+            return cls._version
+
+    @classmethod
+    def invalidate(cls):
+        """Drop the index so the next read reloads it (call after changing ingredients)"""
+        with cls._lock:
+            cls._loaded = False
+
+    @classmethod
+    def version(cls) -> int:
+        return cls._version
+
+    @classmethod
+    def source_version(cls, db: Session) -> str:
+        """Version of the ingredient rows behind the index, the same in every process"""
+        cls._ensure_loaded(db)
+        return hashlib.sha256(repr(cls._stamp).encode("utf-8")).hexdigest()[:8]
+
+    @staticmethod
+    def _source_stamp(db: Session) -> Tuple:
+        """Count, last id and last update of the ingredient rows"""
+        return tuple(db.query(
+            func.count(Ingredient.id), func.max(Ingredient.id), func.max(Ingredient.updated_at)
+        ).one())
+
+    @classmethod
+    def _ensure_loaded(cls, db: Session):
+        if cls._loaded and time.monotonic() < cls._next_check:
+            return
+        try:
+            if cls._loaded and cls._source_stamp(db) == cls._stamp:
+                cls._next_check = time.monotonic() + cls.CHECK_SECONDS
+                return
+            cls.load(db)
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error loading ingredient index: {e}")
+            raise
+
+    @staticmethod
+    def _normalize(name: Optional[str]) -> str:
+        words = re.findall(r"[a-z]+", (name or "").lower())
+        return " ".join(singular(word) for word in words)
+
+    @classmethod
+    def resolve(cls, name: str, db: Session) -> Optional[str]:
+        """The index name an ingredient line's name stands for, None when nothing is close"""
+        cls._ensure_loaded(db)
+        normalized = cls._normalize(name)
+        resolved_names = cls._resolved
+        with cls._lock:
+            if normalized in resolved_names:
+                resolved_names.move_to_end(normalized)
+                return resolved_names[normalized]
+
+        resolved = None
+        words = [word for word in normalized.split() if word not in DESCRIPTORS]
+        for candidate in (normalized, " ".join(words)):
+            if candidate in cls._per_gram:
+                resolved = candidate
+                break
+        if resolved is None:
+            # Longest known phrase inside the name, the later one on a tie ("low fat greek yogurt")
+            for size in range(len(words) - 1, 0, -1):
+                for start in range(len(words) - size, -1, -1):
+                    candidate = " ".join(words[start:start + size])
+                    if candidate in cls._per_gram:
+                        resolved = candidate
+                        break
+                if resolved:
+                    break
+        if resolved is None and words:
+            close = difflib.get_close_matches(" ".join(words), cls._names, n=1, cutoff=cls.FUZZY_CUTOFF)
+            resolved = close[0] if close else None
+
+        with cls._lock:
+            resolved_names[normalized] = resolved
+            if len(resolved_names) > cls.RESOLVED_CACHE_SIZE:
+                resolved_names.popitem(last=False)
+        return resolved
+
+    @classmethod
+    def item_name(cls, name: str, db: Session) -> str:
+        """The food a name stands for: its index name, else its words singular and unprepared"""
+        resolved = cls.resolve(name, db)
+        if resolved:
+            return resolved
+        return " ".join(word for word in cls._normalize(name).split() if word not in DESCRIPTORS)
+
+    @classmethod
+    def ingredient_id(cls, resolved_name: str, db: Session) -> Optional[int]:
+        """Id of the ingredient row behind an index name returned by `resolve`"""
+        cls._ensure_loaded(db)
+        return cls._ids.get(resolved_name)
+
+    @classmethod
+    def category(cls, resolved_name: str, db: Session) -> Optional[str]:
+        """Category of an index name returned by `resolve`"""
+        cls._ensure_loaded(db)
+        return cls._categories.get(resolved_name)
+
+    @classmethod
+    def meal_nutrition(cls, ingredients: List[Any], db: Session) -> Dict[str, Any]:
+        """
+        Nutrients of one meal's ingredient lines, with the lines that could not be used.
+        Lines without an amount ("salt to taste") count for nothing either way.
+        """
+        totals = (0.0,) * len(NUTRIENTS)
+        measured, matched, unmatched = 0, 0, []
+        for line in ingredients or []:
+            parsed = parse_ingredient(line)
+            if parsed.quantity is None:
+                continue
+            measured += 1
+            resolved = cls.resolve(parsed.name, db) if parsed.grams is not None else None
+            if resolved is None:
+                unmatched.append(str(line))
+                continue
+            matched += 1
+            totals = tuple(total + parsed.grams * value for total, value in zip(totals, cls._per_gram[resolved]))
+
+        return {
+            **{nutrient: round(value, 1) for nutrient, value in zip(NUTRIENTS, totals)},
+            "coverage": matched / measured if measured else 0.0,
+            "unmatched": unmatched
+        }
+
+    @classmethod
+    def recompute_meal(cls, meal_info: Dict[str, Any], db: Session,
+                       min_coverage: Optional[float] = None) -> bool:
+        """Replace the meal's reported nutrients with the computed ones when enough of it resolved"""
+        min_coverage = cls.MIN_COVERAGE if min_coverage is None else min_coverage
+        nutrition = cls.meal_nutrition(meal_info.get("ingredients"), db)
+        if nutrition["coverage"] <= 0 or nutrition["coverage"] < min_coverage:
+            return False
+        for nutrient in NUTRIENTS:
+            meal_info[nutrient] = nutrition[nutrient]
+        return True
+
+    @classmethod
+    def recompute_plan(cls, meal_data: Dict[str, Any], db: Session,
+                       min_coverage: Optional[float] = None) -> List[str]:
+        """
+        Recompute each meal of a generated plan from its ingredients where they all resolve,
+        then set the daily totals to the sum of the meals, whatever the response reported.
+        Returns the slots whose numbers were recomputed.
+        """
+        recomputed = []
+        meals = []
+        for meal_type in cls.MEAL_TYPES:
+            meal_info = meal_data.get(meal_type)
+            if not isinstance(meal_info, dict):
+                continue
+            meals.append(meal_info)
+            try:
+                if cls.recompute_meal(meal_info, db, min_coverage):
+                    recomputed.append(meal_type)
+            except Exception as e:
+                app_logger.exceptionlogs(f"Error recomputing nutrition of {meal_type}: {e}")
+
+        # Vector sum over the meals, one tuple of day totals
+        summed = NUTRIENTS + ("fiber_g",)
+        totals = tuple(map(sum, zip(*(
+            [float(meal.get(nutrient) or 0) for nutrient in summed] for meal in meals
+        )))) or (0.0,) * len(summed)
+        daily_summary = meal_data.get("daily_summary")
+        if not isinstance(daily_summary, dict):
+            daily_summary = meal_data["daily_summary"] = {}
+        for nutrient, total in zip(summed, totals):
+            daily_summary[f"total_{nutrient}"] = round(total, 1)
+        return recomputed
+
+    @staticmethod
+    def populate_default_ingredients(db: Session):
+        """Populate the default ingredients - Admin function"""
+        try:
+            existing_ingredients = db.query(Ingredient).filter(Ingredient.is_default == True).count()
+            if existing_ingredients > 0:
+                return {"status": "info", "message": "Default ingredients already exist"}
+
+            existing_names = {name.lower() for (name,) in db.query(Ingredient.name).all()}
+            created = 0
+            for name, category, calories, protein, carbs, fat in DEFAULT_INGREDIENTS:
+                if name in existing_names:
+                    continue
+                db.add(Ingredient(
+                    name=name,
+                    category=category,
+                    is_default=True,
+                    calories_per_100g=calories,
+                    protein_per_100g=protein,
+                    carbs_per_100g=carbs,
+                    fat_per_100g=fat
+                ))
+                created += 1
+            db.commit()
+            IngredientNutritionService.invalidate()
+            return {
+                "status": "success",
+                "message": "Default ingredients created successfully",
+                "ingredients_created": created
+            }
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error populating default ingredients: {e}")
+            db.rollback()
+            return None
@@ -0,0 +1,183 @@
+import os
+import time
+from datetime import date, timedelta
+from typing import Dict, Any, Optional
+
+from sqlalchemy.orm import Session
+
+from db.models.inventory import InventoryItem
+from services.ingredient_nutrition_service import IngredientNutritionService
+from services.recipe_index_service import RecipeIndexService
+from utils import app_logger
+
+
+class InventoryService:
+    """
+    The foods a user has at home, and the recipes they can cook with them.
+
+    Item names are matched to foods the same way meal and recipe ingredients are, so "boneless
+    chicken breasts" in the fridge counts for a recipe that needs chicken breast. Items within
+    `EXPIRY_WINDOW_DAYS` of their expiry push the recipes that use them up the suggestions;
+    expired items are left out.
+    """
+
+    EXPIRY_WINDOW_DAYS = int(os.getenv("INVENTORY_EXPIRY_WINDOW_DAYS", 3))
+    EXPIRY_WEIGHT = float(os.getenv("INVENTORY_EXPIRY_WEIGHT", 0.5))
+    MAX_SUGGESTIONS = 50
+
+    @staticmethod
+    def item_info(item: InventoryItem, today: Optional[date] = None) -> Dict[str, Any]:
+        today = today or date.today()
+        return {
+            "id": item.id,
+            "name": item.name,
+            "ingredient_id": item.ingredient_id,
+            "quantity": item.quantity,
+            "unit": item.unit,
+            "expiry_date": item.expiry_date.isoformat() if item.expiry_date else None,
+            "days_to_expiry": (item.expiry_date - today).days if item.expiry_date else None
+        }
+
+    @classmethod
+    def urgency(cls, expiry_date: Optional[date], today: date) -> float:
+        """1 for an item expiring today, falling to 0 past `EXPIRY_WINDOW_DAYS`"""
+        if expiry_date is None:
+            return 0.0
+        days_left = (expiry_date - today).days
+        if days_left > cls.EXPIRY_WINDOW_DAYS:
+            return 0.0
+        return (cls.EXPIRY_WINDOW_DAYS - days_left + 1) / (cls.EXPIRY_WINDOW_DAYS + 1)
+
+    @staticmethod
+    def _ingredient_id(name: str, db: Session) -> Optional[int]:
+        resolved = IngredientNutritionService.resolve(name, db)
+        return IngredientNutritionService.ingredient_id(resolved, db) if resolved else None
+
+    @classmethod
+    def create_item(cls, user_id: int, item_data, db: Session) -> Dict[str, Any]:
+        """Add a food to the user's inventory"""
+        try:
+            item = InventoryItem(
+                user_id=user_id,
+                ingredient_id=cls._ingredient_id(item_data.name, db),
+                name=item_data.name.strip(),
+                quantity=item_data.quantity,
+                unit=item_data.unit or "piece",
+                expiry_date=item_data.expiry_date
+            )
+            db.add(item)
+            db.commit()
+            db.refresh(item)
+            return {"status": "success", "message": f"{item.name} added to inventory", "item": cls.item_info(item)}
+
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in create_item: {e}")
+            db.rollback()
+            return {"status": "error", "message": str(e)}
+
+    @classmethod
+    def list_items(cls, user_id: int, db: Session,
+                   expiring_within_days: Optional[int] = None) -> Dict[str, Any]:
+        """The user's inventory, soonest expiry first and undated items last"""
+        try:
+            today = date.today()
+            query = db.query(InventoryItem).filter(InventoryItem.user_id == user_id)
+            if expiring_within_days is not None:
+                query = query.filter(
+                    InventoryItem.expiry_date != None,
+                    InventoryItem.expiry_date <= today + timedelta(days=expiring_within_days)
+                )
+            items = sorted(query.all(), key=lambda item: (item.expiry_date is None, item.expiry_date, item.name))
+            return {"status": "success", "items": [cls.item_info(item, today) for item in items]}
+
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in list_items: {e}")
+            return {"status": "error", "message": str(e)}
+
+    @classmethod
+    def update_item(cls, user_id: int, item_id: int, item_data, db: Session) -> Dict[str, Any]:
+        """Change an item's name, quantity, unit or expiry; a null expiry clears it"""
+        try:
+            item = db.query(InventoryItem).filter(
+                InventoryItem.id == item_id,
+                InventoryItem.user_id == user_id
+            ).first()
+            if not item:
+                return {"status": "not_found", "message": "Inventory item not found"}
+
+            update_data = item_data.model_dump(exclude_unset=True)
+            name = update_data.pop("name", None)
+            if name:
+                item.name = name.strip()
+                item.ingredient_id = cls._ingredient_id(item.name, db)
+            for field, value in update_data.items():
+                if value is not None or field == "expiry_date":
+                    setattr(item, field, value)
+
+            db.commit()
+            db.refresh(item)
+            return {"status": "success", "message": f"{item.name} updated", "item": cls.item_info(item)}
+
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in update_item: {e}")
+            db.rollback()
+            return {"status": "error", "message": str(e)}
+
+    @staticmethod
+    def delete_item(user_id: int, item_id: int, db: Session) -> Dict[str, Any]:
+        """Remove an item from the user's inventory"""
+        try:
+            item = db.query(InventoryItem).filter(
+                InventoryItem.id == item_id,
+                InventoryItem.user_id == user_id
+            ).first()
+            if not item:
+                return {"status": "not_found", "message": "Inventory item not found"}
+
+            db.delete(item)
+            db.commit()
+            return {"status": "success", "message": f"{item.name} removed from inventory"}
+
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in delete_item: {e}")
+            db.rollback()
+            return {"status": "error", "message": str(e)}
+
+    @classmethod
+    def suggest_recipes(cls, user_id: int, db: Session, limit: int = 10,
+                        max_missing: Optional[int] = None) -> Dict[str, Any]:
+        """Catalogue recipes ranked by how much of them the inventory covers, expiring items first"""
+        try:
+            today = date.today()
+            available: Dict[str, float] = {}
+            expired = []
+            items = db.query(InventoryItem).filter(
+                InventoryItem.user_id == user_id,
+                InventoryItem.quantity > 0
+            ).all()
+            for item in items:
+                if item.expiry_date and item.expiry_date < today:
+                    expired.append(item.name)
+                    continue
+                food = IngredientNutritionService.item_name(item.name, db)
+                if food:
+                    available[food] = max(available.get(food, 0.0), cls.urgency(item.expiry_date, today))
+
+            started = time.perf_counter()
+            suggestions = RecipeIndexService.rank(
+                user_id, available, db,
+                max_missing=max_missing,
+                expiry_weight=cls.EXPIRY_WEIGHT,
+                limit=min(max(1, limit), cls.MAX_SUGGESTIONS)
+            )
+            return {
+                "status": "success",
+                "suggestions": suggestions,
+                "foods_on_hand": sorted(available),
+                "expired": expired,
+                "ranking_time_ms": round((time.perf_counter() - started) * 1000, 3)
+            }
+
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in suggest_recipes: {e}")
+            return {"status": "error", "message": str(e)}
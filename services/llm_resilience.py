@@ -0,0 +1,267 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+
+class CircuitOpenError(Exception):
+    """The provider's breaker is open, the call was not attempted"""
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """No in-flight slot for the provider freed up in time, the call was not attempted"""
+
+
+class CircuitBreaker:
+    """
+    Rolling-window breaker for one provider/model.
+
+    Opens when, over the last `window_seconds` and at least `min_calls` calls, the error rate
+    reaches `error_rate_threshold` or the share of calls slower than `slow_call_seconds`
+    reaches `slow_call_rate_threshold`. After `open_seconds` it lets `half_open_max_calls`
+    probes through: all succeed and it closes, any failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, error_rate_threshold: float = 0.5, slow_call_rate_threshold: float = 0.8,
+                 slow_call_seconds: float = 60.0, window_seconds: float = 60.0, min_calls: int = 10,
+                 open_seconds: float = 30.0, half_open_max_calls: int = 2):
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()  # (finished_at, failed, slow)
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Reserve the right to call, raises CircuitOpenError when the breaker rejects it"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    raise CircuitOpenError("Circuit open")
+                self.state = self.HALF_OPEN
+                self._probes_in_flight = 0
+                self._probe_successes = 0
+
+            if self.state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_max_calls:
+                    raise CircuitOpenError("Circuit half open, probes in flight")
+                self._probes_in_flight += 1
+
+    def release(self):
+        """The reserved call never finished (e.g. cancelled hedge loser), it says nothing about health"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probes_in_flight:
+                self._probes_in_flight -= 1
+
+    def record_success(self, latency_seconds: float):
+        with self._lock:
+            slow = latency_seconds >= self.slow_call_seconds
+            if self.state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if slow:
+                    self._open()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_max_calls:
+                    self.state = self.CLOSED
+                    self._calls.clear()
+                return
+            self._record(False, slow)
+
+    def record_failure(self, latency_seconds: float = 0.0):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            self._record(True, latency_seconds >= self.slow_call_seconds)
+
+    def _record(self, failed: bool, slow: bool):
+        now = time.monotonic()
+        self._calls.append((now, failed, slow))
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+        if self.state != self.CLOSED or len(self._calls) < self.min_calls:
+            return
+        total = len(self._calls)
+        error_rate = sum(1 for _, call_failed, _ in self._calls if call_failed) / total
+        slow_rate = sum(1 for _, _, call_slow in self._calls if call_slow) / total
+        if error_rate >= self.error_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._calls.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            total = len(self._calls)
+            return {
+                "state": self.state,
+                "calls_in_window": total,
+                "error_rate": round(sum(1 for _, failed, _ in self._calls if failed) / total, 3) if total else 0.0,
+                "slow_rate": round(sum(1 for _, _, slow in self._calls if slow) / total, 3) if total else 0.0,
+                "open_for_seconds": round(
+                    max(0.0, self.open_seconds - (time.monotonic() - self.opened_at)), 1
+                ) if self.state == self.OPEN else 0.0
+            }
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on in-flight calls to one provider/model.
+
+    Every call that finishes within `latency_tolerance` x the baseline latency (a slow moving
+    average) grows the limit by 1/limit, roughly +1 per limit's worth of calls. A failure or
+    an overly slow call multiplies it by `backoff_ratio`. Calls beyond the limit wait up to
+    `queue_timeout_seconds` for a slot and are then rejected instead of piling onto a
+    provider that cannot serve them.
+    """
+
+    def __init__(self, initial_limit: float = 8, min_limit: float = 1, max_limit: float = 64,
+                 backoff_ratio: float = 0.7, latency_tolerance: float = 2.0, queue_timeout_seconds: float = 5.0):
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.queue_timeout_seconds = queue_timeout_seconds
+
+        self.in_flight = 0
+        self.rejected = 0
+        self.baseline_latency: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self):
+        if self._has_slot() and not self._waiters:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ConcurrencyLimitExceeded(f"{self.in_flight} calls in flight, limit {int(self.limit)}")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancel, pass it on
+                self.in_flight -= 1
+                self._wake_waiters()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        while self._waiters and self._has_slot():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(True)
+
+    def on_success(self, latency_seconds: float):
+        if self.baseline_latency is None:
+            self.baseline_latency = latency_seconds
+        if latency_seconds > self.baseline_latency * self.latency_tolerance:
+            self._decrease()
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._wake_waiters()
+        self.baseline_latency += 0.05 * (latency_seconds - self.baseline_latency)
+
+    def on_failure(self):
+        self._decrease()
+
+    def _decrease(self):
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "rejected": self.rejected,
+            "baseline_latency_seconds": round(self.baseline_latency, 3) if self.baseline_latency else None
+        }
+
+
+class LLMResilience:
+    """Process-wide breaker and limiter per (provider, model), configured from the environment"""
+
+    _lock = threading.Lock()
+    _breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+    _limiters: Dict[Tuple[str, str], AdaptiveConcurrencyLimiter] = {}
+
+    @classmethod
+    def for_target(cls, provider: str, model: str) -> Tuple[CircuitBreaker, AdaptiveConcurrencyLimiter]:
+        key = (provider, model)
+        with cls._lock:
+            if key not in cls._breakers:
+                cls._breakers[key] = CircuitBreaker(
+                    error_rate_threshold=float(os.getenv("LLM_BREAKER_ERROR_RATE", 0.5)),
+                    slow_call_rate_threshold=float(os.getenv("LLM_BREAKER_SLOW_CALL_RATE", 0.8)),
+                    slow_call_seconds=float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", 60)),
+                    window_seconds=float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", 60)),
+                    min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", 10)),
+                    open_seconds=float(os.getenv("LLM_BREAKER_OPEN_SECONDS", 30)),
+                    half_open_max_calls=int(os.getenv("LLM_BREAKER_HALF_OPEN_CALLS", 2))
+                )
+                cls._limiters[key] = AdaptiveConcurrencyLimiter(
+                    initial_limit=float(os.getenv("LLM_CONCURRENCY_INITIAL", 8)),
+                    min_limit=float(os.getenv("LLM_CONCURRENCY_MIN", 1)),
+                    max_limit=float(os.getenv("LLM_CONCURRENCY_MAX", 64)),
+                    queue_timeout_seconds=float(os.getenv("LLM_CONCURRENCY_QUEUE_TIMEOUT", 5))
+                )
+            return cls._breakers[key], cls._limiters[key]
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Any]:
+        with cls._lock:
+            return {
+                f"{provider}/{model}": {
+                    "breaker": cls._breakers[(provider, model)].snapshot(),
+                    "concurrency": cls._limiters[(provider, model)].snapshot()
+                }
+                for provider, model in cls._breakers
+            }
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._breakers.clear()
+            cls._limiters.clear()
@@ -1,12 +1,117 @@
-import json
+import asyncio
 import time
 import os
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable, Deque
 import httpx
-from utils import app_logger
+from services.llm_resilience import LLMResilience, ConcurrencyLimitExceeded
+from services.prompt_compaction import (
+    COMPACT_SYSTEM_PROMPT, MEAL_PLAN_JSON_SCHEMA, SYSTEM_PROMPT,
+    build_compact_prompt, estimate_tokens, expand_meal_plan, is_compact, summarize_meals
+)
+from utils import app_logger, tolerant_json
+from utils.rate_limiter import RateLimit, rate_limiter
+
+logger = app_logger.createLogger("app")
+
+ProviderHandler = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+MEAL_PLAN_REQUIREMENTS = """REQUIREMENTS:
+1. Create exactly 5 meals: breakfast, lunch, dinner, snack_1 (mid-morning), snack_2 (evening)
+2. Each meal must include complete nutritional breakdown
+3. Provide detailed ingredients list and cooking instructions
+4. Consider prep time constraints and cooking skill level
+5. Respect all dietary restrictions and preferences
+6. Ensure total daily nutrition meets targets (±50 calories acceptable)
+7. Include variety in cuisines and cooking methods
+8. Make snacks healthy and satisfying"""
+
+MEAL_RESPONSE_FORMAT = """{
+  "meal_name": "Meal name",
+  "description": "Brief description",
+  "calories": 400,
+  "protein_g": 25,
+  "carbs_g": 45,
+  "fat_g": 12,
+  "fiber_g": 8,
+  "sodium_mg": 300,
+  "sugar_g": 5,
+  "prep_time_minutes": 15,
+  "cooking_time_minutes": 10,
+  "difficulty_level": 2,
+  "cuisine_type": "American",
+  "ingredients": ["ingredient 1", "ingredient 2"],
+  "instructions": ["step 1", "step 2"],
+  "is_vegetarian": false,
+  "is_vegan": false,
+  "is_gluten_free": false,
+  "is_dairy_free": false
+}"""
+
+MEAL_PLAN_RESPONSE_FORMAT = """{
+  "breakfast": """ + MEAL_RESPONSE_FORMAT.replace("\n", "\n  ") + """,
+  "lunch": { ... },
+  "dinner": { ... },
+  "snack_1": { ... },
+  "snack_2": { ... },
+  "daily_summary": {
+    "total_calories": 2000,
+    "total_protein_g": 150,
+    "total_carbs_g": 200,
+    "total_fat_g": 67,
+    "total_fiber_g": 35,
+    "meets_targets": true,
+    "variety_score": 8,
+    "prep_time_total": 90
+  }
+}"""
+
+
+MEAL_ALTERNATIVES_REQUEST = """ALTERNATIVES:
+Also add an "alternatives" key mapping each meal type to a list of {count} other meals for that slot, in the same meal format, each close to the calories and macros of the slot's meal, best first. Leave them out of the daily_summary."""
 
 
 class LLMService:
+    # Providers registered at runtime, e.g. the deterministic fake used by the benchmarks.
+    # They take precedence over the built-in providers with the same name.
+    _registered_providers: Dict[str, ProviderHandler] = {}
+
+    MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack_1", "snack_2")
+    DEFAULT_MODELS = {
+        "openai": "gpt-4",
+        "anthropic": "claude-3-sonnet-20240229",
+        "ollama": "llama3.1:70b"
+    }
+
+    # Hedging and deadline defaults, all overridable per call through the config
+    DEFAULT_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", 120))
+    DEFAULT_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 95))
+    DEFAULT_HEDGE_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", 30))
+    LATENCY_WINDOW = 200
+    MIN_LATENCY_SAMPLES = 20
+
+    # Provider quotas, LLM_RATE_LIMIT_RPM_<PROVIDER> / LLM_RATE_LIMIT_TPM_<PROVIDER> override them
+    DEFAULT_REQUESTS_PER_MINUTE = {"openai": 500, "anthropic": 50}
+    RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT_SECONDS", 30))
+
+    # Completion budget of one batched call, however many users it packs
+    BATCH_MAX_TOKENS = int(os.getenv("LLM_BATCH_MAX_TOKENS", 16000))
+    # Completion budget of a single-meal call
+    SLOT_MAX_TOKENS = 1200
+
+    # Recent successful latencies per provider, in seconds
+    _latencies: Dict[str, Deque[float]] = {}
+
+    @classmethod
+    def register_provider(cls, name: str, handler: ProviderHandler):
+        """Register an async `handler(prompt, config) -> dict` under a provider name"""
+        cls._registered_providers[name.lower()] = handler
+
+    @classmethod
+    def unregister_provider(cls, name: str):
+        cls._registered_providers.pop(name.lower(), None)
+
     def __init__(self):
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
@@ -14,40 +119,278 @@ class LLMService:
                                          "http://localhost:11434")
     
     async def generate_meal_plan(self, prompt: str,
-                                 config: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate meal plan using specified LLM provider"""
+                                 config: Dict[str, Any],
+                                 validator: Optional[Callable[[Any], bool]] = None) -> Dict[str, Any]:
+        """
+        Generate meal plan with the configured provider, hedged against a secondary one.
+
+        The primary provider (`llm_provider`) is called first. When `secondary_provider` is set
+        (config or LLM_SECONDARY_PROVIDER) the same prompt also goes to it once the primary has
+        been running longer than its `hedge_percentile` latency, or right away when the primary
+        fails. The first valid meal plan (per `validator`, a single plan by default) wins and
+        the other call is cancelled. Nothing is waited for past `deadline_seconds`.
+        """
+        validator = validator or self._is_valid_meal_plan
         provider = config.get("llm_provider", "openai").lower()
-        
+        secondary_provider = (config.get("secondary_provider") or os.getenv("LLM_SECONDARY_PROVIDER", "")).lower()
+        if secondary_provider == provider:
+            secondary_provider = ""
+        deadline_seconds = float(config.get("deadline_seconds") or self.DEFAULT_DEADLINE_SECONDS)
+
         start_time = time.time()
-        
+        deadline = time.monotonic() + deadline_seconds
+        hedge_at = time.monotonic() + self._hedge_delay(provider, config)
+
+        calls = {asyncio.create_task(self._call_provider(provider, prompt, config)): (provider, config)}
+        secondary_started = False
+        errors = {}
+
+        def start_secondary():
+            secondary_config = self._secondary_config(secondary_provider, config)
+            calls[asyncio.create_task(self._call_provider(secondary_provider, prompt, secondary_config))] = (
+                secondary_provider, secondary_config
+            )
+
         try:
-            if provider == "openai":
-                result = await self._generate_with_openai(prompt, config)
-            elif provider == "anthropic":
-                result = await self._generate_with_anthropic(prompt, config)
-            elif provider == "ollama":
-                result = await self._generate_with_ollama(prompt, config)
-            else:
-                raise ValueError(f"Unsupported LLM provider: {provider}")
-            
-            generation_time = time.time() - start_time
-            
-            return {
-                "success": True,
-                "data": result,
-                "generation_time": generation_time,
-                "provider": provider,
-                "model": config.get("model_name", "unknown")
-            }
-            
-        except Exception as e:
-            app_logger.exceptionlogs(f"Error in generate_meal_plan with {provider}: {e}")
+            while calls:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                wait_until = deadline
+                if secondary_provider and not secondary_started:
+                    wait_until = min(deadline, hedge_at)
+
+                done, _ = await asyncio.wait(calls.keys(), timeout=max(0.0, wait_until - now),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if secondary_provider and not secondary_started and time.monotonic() >= hedge_at:
+                        # Primary is slower than usual, race the secondary against it
+                        start_secondary()
+                        secondary_started = True
+                    continue
+
+                for task in done:
+                    call_provider, call_config = calls.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        app_logger.exceptionlogs(f"Error in generate_meal_plan with {call_provider}: {e}")
+                        errors[call_provider] = str(e)
+                        continue
+
+                    if not validator(result):
+                        errors[call_provider] = "Response has no meals"
+                        continue
+
+                    return {
+                        "success": True,
+                        "data": result,
+                        "generation_time": time.time() - start_time,
+                        "provider": call_provider,
+                        "model": call_config.get("model_name", "unknown"),
+                        "secondary_used": secondary_started,
+                        "missing_slots": self.missing_slots(result)
+                    }
+
+                if secondary_provider and not secondary_started:
+                    # Primary failed outright, fail over without waiting for the hedge delay
+                    start_secondary()
+                    secondary_started = True
+
+            if calls:
+                errors["deadline"] = f"No provider answered within {deadline_seconds:g}s"
             return {
                 "success": False,
-                "error": str(e),
+                "error": "; ".join(f"{name}: {error}" for name, error in errors.items()),
                 "generation_time": time.time() - start_time,
-                "provider": provider
+                "provider": provider,
+                "secondary_used": secondary_started
             }
+        finally:
+            for task in calls:
+                task.cancel()
+            if calls:
+                # Let the losers unwind so their concurrency slots are back before returning
+                await asyncio.gather(*calls, return_exceptions=True)
+
+    async def generate_batch_meal_plans(self, users: Dict[str, Dict[str, Any]],
+                                        config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Generate plans for several users in one call, see `create_batch_meal_plan_prompt`.
+
+        The response is split by user key and each plan validated on its own, so `plans` holds
+        the usable ones and `failed` the keys the caller should retry individually.
+        """
+        prompt = self.create_batch_meal_plan_prompt(users)
+        provider = config.get("llm_provider", "openai").lower()
+        batch_config = {
+            **config,
+            "max_tokens": min(config.get("max_tokens", 4000) * len(users), self.BATCH_MAX_TOKENS),
+            "deadline_seconds": float(config.get("deadline_seconds") or self.DEFAULT_DEADLINE_SECONDS) * len(users),
+            "hedge_after_seconds": self._hedge_delay(provider, config) * len(users),
+            # The keyed batch response has its own format, not the compact single-plan schema
+            "prompt_mode": "full"
+        }
+
+        def has_any_plan(result: Any) -> bool:
+            return isinstance(result, dict) and any(self._is_valid_meal_plan(result.get(key)) for key in users)
+
+        result = await self.generate_meal_plan(prompt, batch_config, validator=has_any_plan)
+        if not result["success"]:
+            return {**result, "prompt": prompt, "plans": {}, "failed": list(users)}
+
+        plans = {}
+        for key in users:
+            plan = self._complete_meals_only(result["data"].get(key))
+            if self._is_valid_meal_plan(plan):
+                plans[key] = plan
+        return {
+            "success": True,
+            "prompt": prompt,
+            "plans": plans,
+            "failed": [key for key in users if key not in plans],
+            "generation_time": result["generation_time"],
+            "provider": result["provider"],
+            "model": result["model"],
+            "secondary_used": result["secondary_used"]
+        }
+
+    async def generate_meal_slot(self, prompt: str, meal_type: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate the single meal asked for by `create_meal_slot_prompt`"""
+        slot_config = {
+            **config,
+            "max_tokens": min(config.get("max_tokens", 4000), self.SLOT_MAX_TOKENS),
+            # One meal in the full format, not the compact whole-plan schema
+            "prompt_mode": "full"
+        }
+
+        def single_meal(result: Any) -> Any:
+            # Some models wrap the meal in its slot name
+            if isinstance(result, dict) and isinstance(result.get(meal_type), dict):
+                return result[meal_type]
+            return result
+
+        result = await self.generate_meal_plan(
+            prompt, slot_config, validator=lambda data: self._is_complete_meal(single_meal(data))
+        )
+        result.pop("missing_slots", None)
+        if result["success"]:
+            result["data"] = single_meal(result["data"])
+        return result
+
+    async def _call_provider(self, provider: str, prompt: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Dispatch to one provider behind its circuit breaker and concurrency limit.
+        Raises CircuitOpenError / ConcurrencyLimitExceeded without calling a provider that is
+        failing or saturated, so the dispatcher can fail over immediately.
+        """
+        if provider not in self._registered_providers and provider not in self.DEFAULT_MODELS:
+            raise ValueError(f"Unsupported LLM provider: {provider}")
+
+        await self._pace(provider, prompt, config)
+
+        model = config.get("model_name") or self.DEFAULT_MODELS.get(provider, "default")
+        breaker, limiter = LLMResilience.for_target(provider, model)
+        breaker.before_call()
+        try:
+            async with limiter.slot():
+                started = time.monotonic()
+                try:
+                    if provider in self._registered_providers:
+                        result = await self._registered_providers[provider](prompt, config)
+                    elif provider == "openai":
+                        result = await self._generate_with_openai(prompt, config)
+                    elif provider == "anthropic":
+                        result = await self._generate_with_anthropic(prompt, config)
+                    else:
+                        result = await self._generate_with_ollama(prompt, config)
+                    if is_compact(config):
+                        result = expand_meal_plan(result)
+                    result = self._complete_meals_only(result)
+                except Exception:
+                    breaker.record_failure(time.monotonic() - started)
+                    limiter.on_failure()
+                    raise
+        except (asyncio.CancelledError, ConcurrencyLimitExceeded):
+            # Hedge loser, deadline or no slot: not a verdict on the provider's health
+            breaker.release()
+            raise
+
+        latency = time.monotonic() - started
+        breaker.record_success(latency)
+        limiter.on_success(latency)
+        self.record_latency(provider, latency)
+        return result
+
+    def _rate_limits(self, provider: str):
+        """(limit, cost) pairs for the provider, requests per minute and optionally tokens per minute"""
+        limits = []
+        requests_per_minute = os.getenv(f"LLM_RATE_LIMIT_RPM_{provider.upper()}",
+                                        self.DEFAULT_REQUESTS_PER_MINUTE.get(provider))
+        if requests_per_minute:
+            limits.append((RateLimit("rpm", float(requests_per_minute)), 1))
+
+        tokens_per_minute = os.getenv(f"LLM_RATE_LIMIT_TPM_{provider.upper()}")
+        if tokens_per_minute:
+            return limits + [(RateLimit("tpm", float(tokens_per_minute), burst=float(tokens_per_minute)), None)]
+        return limits
+
+    async def _pace(self, provider: str, prompt: str, config: Dict[str, Any]):
+        """Wait for the provider's quota, shared by every worker using the same credential"""
+        credential = {
+            "openai": self.openai_api_key,
+            "anthropic": self.anthropic_api_key,
+            "ollama": self.ollama_base_url
+        }.get(provider)
+        for limit, cost in self._rate_limits(provider):
+            if cost is None:
+                # Prompt estimate plus the whole completion budget
+                cost = estimate_tokens(prompt) + config.get("max_tokens", 4000)
+            await rate_limiter.acquire(
+                rate_limiter.build_key(f"llm:{provider}", credential, limit), limit, cost,
+                max_wait_seconds=self.RATE_LIMIT_MAX_WAIT_SECONDS
+            )
+
+    @staticmethod
+    def _is_valid_meal_plan(result: Any) -> bool:
+        return isinstance(result, dict) and any(meal_type in result for meal_type in LLMService.MEAL_TYPES)
+
+    @staticmethod
+    def _secondary_config(secondary_provider: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        secondary_config = {**config, "llm_provider": secondary_provider}
+        # The primary's model name means nothing to another provider, fall back to its default model
+        secondary_model = (config.get("secondary_model_name") or os.getenv("LLM_SECONDARY_MODEL")
+                           or LLMService.DEFAULT_MODELS.get(secondary_provider))
+        if secondary_model:
+            secondary_config["model_name"] = secondary_model
+        else:
+            secondary_config.pop("model_name", None)
+        return secondary_config
+
+    def _hedge_delay(self, provider: str, config: Dict[str, Any]) -> float:
+        """Seconds to give the primary before hedging: explicit, its latency percentile, or the default"""
+        if config.get("hedge_after_seconds") is not None:
+            return float(config["hedge_after_seconds"])
+        hedge_percentile = float(config.get("hedge_percentile", self.DEFAULT_HEDGE_PERCENTILE))
+        percentile = self.latency_percentile(provider, hedge_percentile)
+        return percentile if percentile is not None else self.DEFAULT_HEDGE_DELAY_SECONDS
+
+    @classmethod
+    def record_latency(cls, provider: str, seconds: float):
+        window = cls._latencies.get(provider)
+        if window is None:
+            window = cls._latencies[provider] = deque(maxlen=cls.LATENCY_WINDOW)
+        window.append(seconds)
+
+    @classmethod
+    def latency_percentile(cls, provider: str, percentile: float) -> Optional[float]:
+        """Percentile of the provider's recent successful latencies, None until enough samples exist"""
+        window = cls._latencies.get(provider)
+        if not window or len(window) < cls.MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(window)
+        index = min(len(ordered) - 1, max(0, int(round(percentile / 100.0 * len(ordered))) - 1))
+        return ordered[index]
     
     async def _generate_with_openai(self, prompt: str, config: Dict[str, Any]) -> Dict[str, Any]:
         """Generate meal plan using OpenAI GPT"""
@@ -59,12 +402,13 @@ class LLMService:
             "Content-Type": "application/json"
         }
         
+        compact = is_compact(config)
         payload = {
-            "model": config.get("model_name", "gpt-4"),
+            "model": config.get("model_name", self.DEFAULT_MODELS["openai"]),
             "messages": [
                 {
                     "role": "system",
-                    "content": "You are a professional nutritionist and meal planning expert. Always respond with valid JSON format."
+                    "content": COMPACT_SYSTEM_PROMPT if compact else SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
@@ -73,7 +417,10 @@ class LLMService:
             ],
             "temperature": config.get("temperature", 0.7),
             "max_tokens": config.get("max_tokens", 4000),
-            "response_format": {"type": "json_object"}
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": "meal_plan", "strict": True, "schema": MEAL_PLAN_JSON_SCHEMA}
+            } if compact else {"type": "json_object"}
         }
         
         async with httpx.AsyncClient(timeout=60.0) as client:
@@ -89,11 +436,7 @@ class LLMService:
             result = response.json()
             content = result["choices"][0]["message"]["content"]
             
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError as e:
-                app_logger.exceptionlogs(f"Failed to parse OpenAI JSON response: {e}")
-                raise Exception("Invalid JSON response from OpenAI")
+            return self._parse_json_content(content, "OpenAI")
     
     async def _generate_with_anthropic(self, prompt: str, config: Dict[str, Any]) -> Dict[str, Any]:
         """Generate meal plan using Anthropic Claude"""
@@ -106,17 +449,27 @@ class LLMService:
             "anthropic-version": "2023-06-01"
         }
         
+        compact = is_compact(config)
         payload = {
-            "model": config.get("model_name", "claude-3-sonnet-20240229"),
+            "model": config.get("model_name", self.DEFAULT_MODELS["anthropic"]),
             "max_tokens": config.get("max_tokens", 4000),
             "temperature": config.get("temperature", 0.7),
+            "system": COMPACT_SYSTEM_PROMPT if compact else SYSTEM_PROMPT,
             "messages": [
                 {
                     "role": "user",
-                    "content": f"You are a professional nutritionist. Respond only with valid JSON format.\n\n{prompt}"
+                    "content": prompt
                 }
             ]
         }
+        if compact:
+            # A forced tool call is Anthropic's structured output, its input follows the schema
+            payload["tools"] = [{
+                "name": "submit_meal_plan",
+                "description": "Submit the day's meal plan",
+                "input_schema": MEAL_PLAN_JSON_SCHEMA
+            }]
+            payload["tool_choice"] = {"type": "tool", "name": "submit_meal_plan"}
         
         async with httpx.AsyncClient(timeout=60.0) as client:
             response = await client.post(
@@ -129,25 +482,29 @@ class LLMService:
                 raise Exception(f"Anthropic API error: {response.status_code} - {response.text}")
             
             result = response.json()
+            for block in result["content"]:
+                if block.get("type") == "tool_use":
+                    return block["input"]
             content = result["content"][0]["text"]
             
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError as e:
-                app_logger.exceptionlogs(f"Failed to parse Anthropic JSON response: {e}")
-                raise Exception("Invalid JSON response from Anthropic")
+            return self._parse_json_content(content, "Anthropic")
     
     async def _generate_with_ollama(self, prompt: str, config: Dict[str, Any]) -> Dict[str, Any]:
         """Generate meal plan using Ollama (local LLM)"""
+        compact = is_compact(config)
         payload = {
-            "model": config.get("model_name", "llama3.1:70b"),
-            "prompt": f"You are a professional nutritionist. Respond only with valid JSON format.\n\n{prompt}",
+            "model": config.get("model_name", self.DEFAULT_MODELS["ollama"]),
+            "system": COMPACT_SYSTEM_PROMPT if compact else SYSTEM_PROMPT,
+            "prompt": prompt,
             "stream": False,
             "options": {
                 "temperature": config.get("temperature", 0.7),
                 "num_predict": config.get("max_tokens", 4000)
             }
         }
+        if compact:
+            # Ollama constrains the output to the schema
+            payload["format"] = MEAL_PLAN_JSON_SCHEMA
         
         async with httpx.AsyncClient(timeout=120.0) as client:
             response = await client.post(
@@ -161,28 +518,148 @@ class LLMService:
             result = response.json()
             content = result["response"]
             
-            # Try to extract JSON from the response
-            try:
-                # Sometimes Ollama includes extra text, try to find JSON
-                start_idx = content.find('{')
-                end_idx = content.rfind('}') + 1
-                if start_idx != -1 and end_idx != -1:
-                    json_content = content[start_idx:end_idx]
-                    return json.loads(json_content)
-                else:
-                    return json.loads(content)
-            except json.JSONDecodeError as e:
-                app_logger.exceptionlogs(f"Failed to parse Ollama JSON response: {e}")
-                raise Exception("Invalid JSON response from Ollama")
+            # Ollama often wraps the JSON in prose or a markdown fence
+            return self._parse_json_content(content, "Ollama")
     
+    @staticmethod
+    def _parse_json_content(content: str, provider_label: str) -> Dict[str, Any]:
+        """
+        Parse a completion tolerantly. Top-level entries cut off by a truncated response are
+        dropped, so a plan that ran out of tokens still yields its complete meals.
+        """
+        try:
+            data, report = tolerant_json.parse(content)
+        except tolerant_json.TolerantJSONError as e:
+            app_logger.exceptionlogs(f"Failed to parse {provider_label} JSON response: {e}")
+            raise Exception(f"Invalid JSON response from {provider_label}")
+        if not isinstance(data, dict):
+            raise Exception(f"Invalid JSON response from {provider_label}")
+
+        if report.repaired:
+            logger.warning(f"Repaired {provider_label} JSON response, truncated={report.truncated}, "
+                           f"dropped incomplete entries {report.incomplete_keys}")
+        for key in report.incomplete_keys:
+            data.pop(key, None)
+        return data
+
+    @classmethod
+    def _complete_meals_only(cls, result: Any) -> Any:
+        """Drop meals without a name or calories, recounting the daily summary if any were dropped"""
+        if not isinstance(result, dict):
+            return result
+        incomplete = [
+            meal_type for meal_type in cls.MEAL_TYPES
+            if meal_type in result and not cls._is_complete_meal(result[meal_type])
+        ]
+        for meal_type in incomplete:
+            result.pop(meal_type)
+        if incomplete or "daily_summary" not in result:
+            result.pop("daily_summary", None)
+            result = summarize_meals(result)
+        return result
+
+    @staticmethod
+    def _is_complete_meal(meal: Any) -> bool:
+        return (isinstance(meal, dict) and bool(meal.get("meal_name"))
+                and isinstance(meal.get("calories"), (int, float)))
+
+    @classmethod
+    def missing_slots(cls, meal_plan: Dict[str, Any]) -> list:
+        return [meal_type for meal_type in cls.MEAL_TYPES if meal_type not in meal_plan]
+
     def create_meal_plan_prompt(self, user_data: Dict[str, Any], nutrition_targets: Dict[str, Any], 
-                               activity_data: Optional[Dict[str, Any]] = None) -> str:
-        """Create a comprehensive prompt for meal plan generation"""
+                               activity_data: Optional[Dict[str, Any]] = None,
+                               compact: bool = False, token_budget: Optional[int] = None,
+                               alternatives_per_slot: int = 0) -> str:
+        """
+        Create a comprehensive prompt for meal plan generation, or the compact one within `token_budget`.
+        With `alternatives_per_slot` the full prompt also asks for that many ranked alternatives per meal.
+        """
+        if compact:
+            return build_compact_prompt(user_data, nutrition_targets, activity_data, token_budget)
+        
+        alternatives = ""
+        if alternatives_per_slot:
+            alternatives = "\n\n" + MEAL_ALTERNATIVES_REQUEST.format(count=alternatives_per_slot)
         
         prompt = f"""
 Generate a complete daily meal plan in JSON format for a user with the following profile:
 
-USER PROFILE:
+{self._user_prompt_section(user_data, nutrition_targets, activity_data)}
+
+{MEAL_PLAN_REQUIREMENTS}
+
+RESPONSE FORMAT (JSON):
+{MEAL_PLAN_RESPONSE_FORMAT}{alternatives}
+
+Generate a nutritious, delicious, and practical meal plan that perfectly matches the user's profile and goals.
+"""
+        
+        return prompt.strip()
+
+    def create_batch_meal_plan_prompt(self, users: Dict[str, Dict[str, Any]]) -> str:
+        """
+        One prompt for several users, keyed by `users`' keys, each value holding user_data,
+        nutrition_targets and activity_data. The requirements and response format are sent once.
+        """
+        sections = "\n\n".join(
+            f"### User \"{key}\"\n"
+            + self._user_prompt_section(user["user_data"], user["nutrition_targets"], user.get("activity_data"))
+            for key, user in users.items()
+        )
+        keys = ", ".join(f'"{key}"' for key in users)
+        
+        prompt = f"""
+Generate a complete daily meal plan in JSON format for each of the {len(users)} users below. Plan for every user independently, using only their own profile.
+
+{sections}
+
+{MEAL_PLAN_REQUIREMENTS}
+
+RESPONSE FORMAT (JSON):
+A single JSON object with exactly the keys {keys}. The value under each key is that user's meal plan in this format:
+{MEAL_PLAN_RESPONSE_FORMAT}
+
+Generate nutritious, delicious, and practical meal plans that perfectly match each user's profile and goals.
+"""
+        
+        return prompt.strip()
+
+    def create_meal_slot_prompt(self, user_data: Dict[str, Any], meal_type: str, budget: Dict[str, Any],
+                                avoid_meals: Optional[list] = None, instructions: Optional[str] = None) -> str:
+        """Prompt for one meal of the day, sized to what the other meals leave of the day's targets"""
+        
+        prompt = f"""
+Generate a single meal in JSON format for one slot of a user's daily meal plan.
+
+MEAL SLOT: {meal_type}
+
+{self._profile_prompt_section(user_data)}
+
+MEAL BUDGET (what the other meals of the day leave of the targets):
+- Calorie Budget: {budget['calories']} kcal
+- Protein: {budget['protein_g']}g
+- Carbohydrates: {budget['carbs_g']}g
+- Fat: {budget['fat_g']}g
+
+{f"DO NOT REPEAT: {avoid_meals}" if avoid_meals else ""}
+{f"USER REQUEST: {instructions}" if instructions else ""}
+
+REQUIREMENTS:
+1. Stay within 10% of the calorie budget and close to the macro budget
+2. Respect all dietary restrictions and preferences
+3. Consider prep time constraints and cooking skill level
+
+RESPONSE FORMAT (JSON):
+{MEAL_RESPONSE_FORMAT}
+"""
+        
+        return prompt.strip()
+
+    @staticmethod
+    def _profile_prompt_section(user_data: Dict[str, Any]) -> str:
+        """Profile and restrictions of one user"""
+        return f"""USER PROFILE:
 - Gender: {user_data.get('gender', 'Male')}
 - Food Preference: {user_data.get('food_preference_type', 'omnivore')}
 - Cooking Skill Level: {user_data.get('cooking_skill_level', 3)}/5
@@ -194,7 +671,13 @@ DIETARY RESTRICTIONS:
 - Allergies: {user_data.get('allergies', [])}
 - Dietary Restrictions: {user_data.get('dietary_restrictions', [])}
 - Disliked Foods: {user_data.get('disliked_foods', [])}
-- Preferred Cuisines: {user_data.get('preferred_cuisines', [])}
+- Preferred Cuisines: {user_data.get('preferred_cuisines', [])}"""
+
+    @staticmethod
+    def _user_prompt_section(user_data: Dict[str, Any], nutrition_targets: Dict[str, Any],
+                             activity_data: Optional[Dict[str, Any]] = None) -> str:
+        """Profile, restrictions, targets and activity of one user"""
+        return f"""{LLMService._profile_prompt_section(user_data)}
 
 NUTRITION TARGETS:
 - Target Calories: {nutrition_targets['calories']} kcal
@@ -205,58 +688,4 @@ NUTRITION TARGETS:
 
 ACTIVITY LEVEL:
 {f"- Today's Activity: {activity_data.get('activity_summary', 'No specific workout data')}" if activity_data else "- No specific workout data for today"}
-{f"- Calories Burned: {activity_data.get('calories_burned', 0)} kcal" if activity_data else ""}
-
-REQUIREMENTS:
-1. Create exactly 5 meals: breakfast, lunch, dinner, snack_1 (mid-morning), snack_2 (evening)
-2. Each meal must include complete nutritional breakdown
-3. Provide detailed ingredients list and cooking instructions
-4. Consider prep time constraints and cooking skill level
-5. Respect all dietary restrictions and preferences
-6. Ensure total daily nutrition meets targets (±50 calories acceptable)
-7. Include variety in cuisines and cooking methods
-8. Make snacks healthy and satisfying
-
-RESPONSE FORMAT (JSON):
-{{
-  "breakfast": {{
-    "meal_name": "Meal name",
-    "description": "Brief description",
-    "calories": 400,
-    "protein_g": 25,
-    "carbs_g": 45,
-    "fat_g": 12,
-    "fiber_g": 8,
-    "sodium_mg": 300,
-    "sugar_g": 5,
-    "prep_time_minutes": 15,
-    "cooking_time_minutes": 10,
-    "difficulty_level": 2,
-    "cuisine_type": "American",
-    "ingredients": ["ingredient 1", "ingredient 2"],
-    "instructions": ["step 1", "step 2"],
-    "is_vegetarian": false,
-    "is_vegan": false,
-    "is_gluten_free": false,
-    "is_dairy_free": false
-  }},
-  "lunch": {{ ... }},
-  "dinner": {{ ... }},
-  "snack_1": {{ ... }},
-  "snack_2": {{ ... }},
-  "daily_summary": {{
-    "total_calories": 2000,
-    "total_protein_g": 150,
-    "total_carbs_g": 200,
-    "total_fat_g": 67,
-    "total_fiber_g": 35,
-    "meets_targets": true,
-    "variety_score": 8,
-    "prep_time_total": 90
-  }}
-}}
-
-Generate a nutritious, delicious, and practical meal plan that perfectly matches the user's profile and goals.
-"""
-        
-        return prompt.strip()
+{f"- Calories Burned: {activity_data.get('calories_burned', 0)} kcal" if activity_data else ""}"""
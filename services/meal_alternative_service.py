@@ -0,0 +1,332 @@
+import json
+import os
+from datetime import date
+from typing import Dict, Any, Optional, List, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, joinedload
+
+from db.models.meal_plan import MealPlan, Meal, MealAlternative
+from db.models.recipe import Recipe, RecipeIngredient
+from db.models.user import UserProfile
+from services.llm_service import LLMService
+from services.meal_history_service import MealHistoryService
+from services.meal_library_service import MealLibraryService
+from services.restriction_validation_service import RestrictionValidationService
+from utils import app_logger
+
+
+class MealAlternativeService:
+    """
+    Ranked alternatives for every slot of a meal plan, stored with the plan so a swap is one
+    indexed read instead of a generation. An alternative is a meal library dish and a portion,
+    like the plan's meals.
+
+    Rank 0 of a slot is the meal the plan was generated with, ranks 1..N the alternatives, best
+    first. They come from the LLM response when it was asked for them (`alternatives_source`
+    "llm"), topped up from the catalogue: the user's earlier meals for the slot and the recipe
+    library, each scaled to the slot's calories and ranked by how close its macros come. Meals
+    the user had within the history window, or that break their allergies or dislikes, are
+    left out.
+    """
+
+    MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack_1", "snack_2"]
+    # Nutrients that scale with the portion when a meal is resized
+    SCALED_NUTRIENTS = ["calories", "protein_g", "carbs_g", "fat_g", "fiber_g", "sodium_mg", "sugar_g"]
+    # (min, max) portion multiplier per meal relative to the recipe as generated
+    PORTION_BOUNDS = {
+        "breakfast": (0.6, 1.6),
+        "lunch": (0.6, 1.6),
+        "dinner": (0.6, 1.6),
+        "snack_1": (0.5, 2.0),
+        "snack_2": (0.5, 2.0)
+    }
+    DEFAULT_PORTION_BOUNDS = (0.6, 1.6)
+
+    # catalogue: only the catalogue, llm: asked for in the generation prompt and topped up
+    # from the catalogue, none: no alternatives
+    DEFAULT_SOURCE = os.getenv("MEAL_PLAN_ALTERNATIVES_SOURCE", "catalogue")
+    DEFAULT_PER_SLOT = int(os.getenv("MEAL_PLAN_ALTERNATIVES_PER_SLOT", 2))
+    # A catalogue meal whose scaled calories still miss the slot by more than this share is skipped
+    MAX_CALORIE_MISS = 0.15
+    HISTORY_LIMIT = 300
+    RECIPE_LIMIT = 200
+    # Food preferences a recipe without dietary flags can be offered to
+    RECIPE_FOOD_PREFERENCES = ("omnivore", "flexitarian")
+
+    def __init__(self):
+        self.history_service = MealHistoryService()
+        self.library_service = MealLibraryService()
+        self.restriction_service = RestrictionValidationService()
+
+    @classmethod
+    def source(cls, config: Optional[Dict[str, Any]]) -> str:
+        return ((config or {}).get("alternatives_source") or cls.DEFAULT_SOURCE).lower()
+
+    @classmethod
+    def per_slot(cls, config: Optional[Dict[str, Any]]) -> int:
+        if cls.source(config) == "none":
+            return 0
+        count = (config or {}).get("alternatives_per_slot")
+        return max(0, int(cls.DEFAULT_PER_SLOT if count is None else count))
+
+    def store_alternatives(self, meal_plan: MealPlan, meal_data: Dict[str, Any], count: int,
+                           db: Session) -> Dict[str, int]:
+        """
+        Add the plan's alternatives to the session, replacing any it had. Returns how many
+        alternatives each slot got; a failure only costs the alternatives, never the plan.
+        """
+        try:
+            db.query(MealAlternative).filter(MealAlternative.meal_plan_id == meal_plan.id).delete()
+            stored = {}
+            if count <= 0:
+                return stored
+
+            food_preference, restrictions = self._restrictions(meal_plan.user_id, db)
+            llm_alternatives = self._allowed_llm_alternatives(meal_data.get("alternatives"), restrictions)
+            taken = {
+                MealHistoryService.fingerprint(meal_data[meal_type].get("meal_name"))
+                for meal_type in self.MEAL_TYPES if isinstance(meal_data.get(meal_type), dict)
+            }
+            catalogue = None
+            # (meal type, rank, source, dish as it goes into the library, portion)
+            alternatives: List[Tuple[str, int, str, Dict[str, Any], float]] = []
+
+            for meal_type in self.MEAL_TYPES:
+                meal_info = meal_data.get(meal_type)
+                if not isinstance(meal_info, dict):
+                    continue
+
+                ranked = [("generated", meal_info, meal_info)]
+                for alternative in llm_alternatives.get(meal_type, []):
+                    if len(ranked) > count:
+                        break
+                    if self._take(alternative, taken):
+                        ranked.append(("llm", alternative, alternative))
+
+                if len(ranked) <= count:
+                    if catalogue is None:
+                        catalogue = self._catalogue(meal_plan.user_id, meal_plan.id, meal_plan.date,
+                                                    food_preference, restrictions, db)
+                    for source, candidate, scaled in self._rank_candidates(meal_type, meal_info, catalogue):
+                        if len(ranked) > count:
+                            break
+                        if self._take(scaled, taken):
+                            ranked.append((source, candidate, scaled))
+
+                for rank, (source, dish, alternative) in enumerate(ranked):
+                    alternatives.append((meal_type, rank, source, dish, alternative.get("portion_multiplier") or 1.0))
+                stored[meal_type] = len(ranked) - 1
+
+            # A catalogue meal goes into the library at the portion it was listed at, so however
+            # it is scaled for a slot it stays one dish
+            canonical_meals = self.library_service.canonical_meals([dish for _, _, _, dish, _ in alternatives], db)
+            for (meal_type, rank, source, _, portion), canonical_meal in zip(alternatives, canonical_meals):
+                db.add(MealAlternative(
+                    meal_plan_id=meal_plan.id,
+                    meal_type=meal_type,
+                    rank=rank,
+                    source=source,
+                    canonical_meal=canonical_meal,
+                    portion_multiplier=portion
+                ))
+            return stored
+
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error storing meal alternatives for plan {meal_plan.id}: {e}")
+            return {}
+
+    def _restrictions(self, user_id: int, db: Session) -> Tuple[str, Dict[str, List[str]]]:
+        """The user's food preference, and their allergies and dislikes in the shape the validator takes"""
+        profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+        food_preference = (
+            profile.food_preference_type.value if profile and profile.food_preference_type else "omnivore"
+        )
+        restrictions = {
+            field: json.loads(getattr(profile, field)) if profile and getattr(profile, field) else []
+            for field in ("allergies", "disliked_foods")
+        }
+        return food_preference, restrictions
+
+    def _allowed_llm_alternatives(self, llm_alternatives: Any,
+                                  restrictions: Dict[str, List[str]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Complete LLM alternatives per slot that break none of the restrictions, all checked in one pass"""
+        if not isinstance(llm_alternatives, dict):
+            return {}
+        candidates = {
+            (meal_type, index): alternative
+            for meal_type in self.MEAL_TYPES
+            for index, alternative in enumerate(llm_alternatives.get(meal_type) or [])
+            if LLMService._is_complete_meal(alternative)
+        }
+        violations = self.restriction_service.violations(candidates, restrictions)
+        allowed: Dict[str, List[Dict[str, Any]]] = {}
+        for (meal_type, index), alternative in candidates.items():
+            if (meal_type, index) not in violations:
+                allowed.setdefault(meal_type, []).append(alternative)
+        return allowed
+
+    @staticmethod
+    def _take(meal_info: Dict[str, Any], taken: set) -> bool:
+        """Claim the meal for the plan, False when the plan already has the same meal"""
+        fingerprint = MealHistoryService.fingerprint(meal_info["meal_name"])
+        if fingerprint in taken:
+            return False
+        taken.add(fingerprint)
+        return True
+
+    def next_alternative(self, meal_plan_id: int, meal_type: str, current_rank: Optional[int],
+                         db: Session) -> Optional[MealAlternative]:
+        """The alternative after `current_rank`, wrapping around to the generated meal"""
+        next_rank = (current_rank or 0) + 1
+        for rank in (next_rank, 0):
+            if rank == current_rank:
+                continue
+            alternative = db.query(MealAlternative).filter(
+                MealAlternative.meal_plan_id == meal_plan_id,
+                MealAlternative.meal_type == meal_type,
+                MealAlternative.rank == rank
+            ).first()
+            if alternative:
+                return alternative
+        return None
+
+    def list_alternatives(self, meal_plan_id: int, meal_type: str, db: Session) -> List[Dict[str, Any]]:
+        alternatives = db.query(MealAlternative).filter(
+            MealAlternative.meal_plan_id == meal_plan_id,
+            MealAlternative.meal_type == meal_type
+        ).order_by(MealAlternative.rank).all()
+        return [
+            {"rank": alternative.rank, "source": alternative.source, **self.alternative_info(alternative)}
+            for alternative in alternatives
+        ]
+
+    @staticmethod
+    def alternative_info(alternative: MealAlternative) -> Dict[str, Any]:
+        """Stored alternative as the LLM meal dict at its portion"""
+        return MealLibraryService.meal_info(alternative.canonical_meal, alternative.portion_multiplier)
+
+    def _catalogue(self, user_id: int, meal_plan_id: int, target_date: date, food_preference: str,
+                   restrictions: Dict[str, List[str]], db: Session) -> Dict[str, List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Candidate meals per slot at their base portion: the user's earlier meals for that slot,
+        then recipes (which fit any slot their calories scale to) under the key None. Meals
+        served within the history window around `target_date`, and meals breaking the user's
+        restrictions, are not candidates.
+        """
+        recent = self.history_service.recent_fingerprints(user_id, target_date, db)
+
+        # (slot or None, source, meal info), screened against the restrictions together at the end
+        candidates: List[Tuple[Optional[str], str, Dict[str, Any]]] = []
+        seen = set()
+        earlier_meals = db.query(Meal).join(MealPlan).filter(
+            MealPlan.user_id == user_id,
+            MealPlan.id != meal_plan_id
+        ).order_by(MealPlan.date.desc()).limit(self.HISTORY_LIMIT).all()
+        for meal in earlier_meals:
+            fingerprint = MealHistoryService.fingerprint(meal.meal_name)
+            key = (meal.meal_type, fingerprint)
+            if (key in seen or fingerprint in recent or not meal.calories
+                    or not self._fits_preference(meal, food_preference)):
+                continue
+            seen.add(key)
+            meal_info = self.meal_info(meal)
+            # Back to the portion as generated, so scaling starts from the recipe
+            meal_info = self.scale_meal_info(meal_info, 1 / (meal.portion_multiplier or 1.0))
+            candidates.append((meal.meal_type, "history", meal_info))
+
+        if food_preference in self.RECIPE_FOOD_PREFERENCES:
+            recipes = db.query(Recipe).options(
+                joinedload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient)
+            ).filter(
+                Recipe.is_active == True,
+                or_(Recipe.user_id == user_id, Recipe.is_default == True)
+            ).limit(self.RECIPE_LIMIT).all()
+            for recipe in recipes:
+                meal_info = self._recipe_meal_info(recipe)
+                if meal_info["calories"] > 0 and MealHistoryService.fingerprint(recipe.name) not in recent:
+                    candidates.append((None, "recipe", meal_info))
+
+        violations = self.restriction_service.violations(
+            {index: meal_info for index, (_, _, meal_info) in enumerate(candidates)}, restrictions
+        )
+        catalogue: Dict[Any, List[Tuple[str, Dict[str, Any]]]] = {}
+        for index, (meal_type, source, meal_info) in enumerate(candidates):
+            if index not in violations:
+                catalogue.setdefault(meal_type, []).append((source, meal_info))
+        return catalogue
+
+    def _rank_candidates(self, meal_type: str, meal_info: Dict[str, Any],
+                         catalogue: Dict[Any, List[Tuple[str, Dict[str, Any]]]]
+                         ) -> List[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+        """(source, catalogue meal, meal scaled to the slot meal's calories), closest macros first"""
+        target_calories = float(meal_info.get("calories") or 0)
+        if target_calories <= 0:
+            return []
+        low, high = self.PORTION_BOUNDS.get(meal_type, self.DEFAULT_PORTION_BOUNDS)
+
+        scored = []
+        for source, candidate in catalogue.get(meal_type, []) + catalogue.get(None, []):
+            scale = min(max(target_calories / candidate["calories"], low), high)
+            scaled = self.scale_meal_info(candidate, scale)
+            calorie_miss = abs(scaled["calories"] - target_calories)
+            if calorie_miss > target_calories * self.MAX_CALORIE_MISS:
+                continue
+            # Misses in kcal, so a gram of fat counts as much as it weighs in the day's energy
+            distance = (calorie_miss
+                        + 4 * abs(scaled["protein_g"] - float(meal_info.get("protein_g") or 0))
+                        + 4 * abs(scaled["carbs_g"] - float(meal_info.get("carbs_g") or 0))
+                        + 9 * abs(scaled["fat_g"] - float(meal_info.get("fat_g") or 0)))
+            scored.append((distance, source, candidate, scaled))
+
+        scored.sort(key=lambda entry: entry[0])
+        return [(source, candidate, scaled) for _, source, candidate, scaled in scored]
+
+    @staticmethod
+    def _fits_preference(meal: Meal, food_preference: str) -> bool:
+        if food_preference == "vegan":
+            return bool(meal.is_vegan)
+        if food_preference in ("vegetarian", "lacto_vegetarian"):
+            return bool(meal.is_vegetarian or meal.is_vegan)
+        return True
+
+    @staticmethod
+    def _recipe_meal_info(recipe: Recipe) -> Dict[str, Any]:
+        """A recipe as one serving in the LLM meal format, without the dietary flags it does not record"""
+        return {
+            "meal_name": recipe.name,
+            "description": recipe.description or "",
+            "calories": recipe.calories_per_serving,
+            "protein_g": recipe.protein_g,
+            "carbs_g": recipe.carbs_g,
+            "fat_g": recipe.fat_g,
+            "fiber_g": 0,
+            "sodium_mg": 0,
+            "sugar_g": 0,
+            "prep_time_minutes": recipe.prep_time_minutes,
+            "cooking_time_minutes": recipe.cook_time_minutes,
+            "difficulty_level": 1,
+            "cuisine_type": "",
+            "ingredients": [
+                f"{item.quantity / (recipe.servings or 1):g} {item.unit} {item.ingredient.name}"
+                for item in recipe.ingredients if item.ingredient
+            ],
+            "instructions": [step.strip() for step in recipe.instructions.splitlines() if step.strip()],
+            "is_vegetarian": False,
+            "is_vegan": False,
+            "is_gluten_free": False,
+            "is_dairy_free": False
+        }
+
+    @staticmethod
+    def meal_info(meal: Meal) -> Dict[str, Any]:
+        """Meal row as the LLM meal dict"""
+        return MealLibraryService.meal_info(meal.canonical_meal, meal.portion_multiplier)
+
+    @staticmethod
+    def scale_meal_info(meal_info: Dict[str, Any], scale: float) -> Dict[str, Any]:
+        """Copy of the meal dict with its nutrients and portion multiplied by `scale`"""
+        scaled = dict(meal_info)
+        for nutrient in MealAlternativeService.SCALED_NUTRIENTS:
+            scaled[nutrient] = round(float(meal_info.get(nutrient) or 0) * scale, 1)
+        scaled["portion_multiplier"] = round(float(meal_info.get("portion_multiplier") or 1.0) * scale, 3)
+        return scaled
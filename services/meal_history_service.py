@@ -0,0 +1,90 @@
+import hashlib
+import os
+import re
+from datetime import date, timedelta
+from typing import Dict, Any, Optional, Iterable
+
+from sqlalchemy.orm import Session
+
+from db.models.meal_plan import MealPlan, MealHistory
+from utils.term_matcher import singular
+
+
+class MealHistoryService:
+    """
+    Rolling per-user history of meal fingerprints, to keep meals from repeating within
+    `WINDOW_DAYS` of each other.
+
+    A fingerprint is a hash of the normalized meal name, so "Grilled Chicken Bowl" and
+    "grilled chicken bowls" collide. Lookups go through the (user, fingerprint, date) index
+    and only ever ask about the handful of meals at hand, so their cost does not grow with
+    the history, and rows older than the window are pruned as new ones are written.
+    """
+
+    MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack_1", "snack_2"]
+    WINDOW_DAYS = int(os.getenv("MEAL_HISTORY_WINDOW_DAYS", 14))
+    STOPWORDS = {"a", "an", "and", "the", "with", "of", "in", "on", "style"}
+
+    @classmethod
+    def fingerprint(cls, meal_name: Optional[str]) -> str:
+        """Order-insensitive hash of the name's words, without stopwords and plurals"""
+        words = re.findall(r"[a-z0-9]+", (meal_name or "").lower())
+        tokens = sorted({singular(word) for word in words if word not in cls.STOPWORDS})
+        return hashlib.sha1(" ".join(tokens).encode("utf-8")).hexdigest()[:16]
+
+    def record(self, meal_plan: MealPlan, meal_names: Dict[str, str], db: Session):
+        """Replace the plan's fingerprints with `meal_names` (meal type -> name), in the caller's transaction"""
+        db.query(MealHistory).filter(MealHistory.meal_plan_id == meal_plan.id).delete()
+        for meal_type, meal_name in meal_names.items():
+            db.add(MealHistory(
+                user_id=meal_plan.user_id,
+                meal_plan_id=meal_plan.id,
+                date=meal_plan.date,
+                meal_type=meal_type,
+                fingerprint=self.fingerprint(meal_name),
+                meal_name=meal_name
+            ))
+        # Rows that fell out of every future window are never read again
+        db.query(MealHistory).filter(
+            MealHistory.user_id == meal_plan.user_id,
+            MealHistory.date < date.today() - timedelta(days=self.WINDOW_DAYS)
+        ).delete()
+
+    def recent_fingerprints(self, user_id: int, target_date: date, db: Session,
+                            fingerprints: Optional[Iterable[str]] = None) -> Dict[str, date]:
+        """
+        Fingerprints served on other days within the window around `target_date`, with the
+        closest day each was served, restricted to `fingerprints` when given
+        """
+        query = db.query(MealHistory.fingerprint, MealHistory.date).filter(
+            MealHistory.user_id == user_id,
+            MealHistory.date >= target_date - timedelta(days=self.WINDOW_DAYS),
+            MealHistory.date <= target_date + timedelta(days=self.WINDOW_DAYS),
+            MealHistory.date != target_date
+        )
+        if fingerprints is not None:
+            fingerprints = list(fingerprints)
+            if not fingerprints:
+                return {}
+            query = query.filter(MealHistory.fingerprint.in_(fingerprints))
+
+        recent = {}
+        for fingerprint, served_on in query:
+            closest = recent.get(fingerprint)
+            if closest is None or abs((served_on - target_date).days) < abs((closest - target_date).days):
+                recent[fingerprint] = served_on
+        return recent
+
+    def colliding_slots(self, user_id: int, target_date: date, meal_data: Dict[str, Any],
+                        db: Session) -> Dict[str, date]:
+        """Slots of a generated plan whose meal was served within the window, with the day it was"""
+        slots_by_fingerprint = {}
+        for meal_type in self.MEAL_TYPES:
+            if isinstance(meal_data.get(meal_type), dict):
+                slots_by_fingerprint.setdefault(self.fingerprint(meal_data[meal_type].get("meal_name")), []).append(meal_type)
+
+        collisions = {}
+        for fingerprint, served_on in self.recent_fingerprints(user_id, target_date, db, slots_by_fingerprint).items():
+            for meal_type in slots_by_fingerprint[fingerprint]:
+                collisions[meal_type] = served_on
+        return collisions
@@ -0,0 +1,129 @@
+import hashlib
+import json
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db.models.meal_plan import CanonicalMeal, Meal
+
+
+class MealLibraryService:
+    """
+    The library of distinct dishes that meal rows point to.
+
+    A meal dict in the LLM format carries its nutrients at its portion; the library stores them
+    at portion 1 under a hash of the dish's content, and a `Meal` keeps only the slot, the
+    portion and the user's rating. Resolving a plan's meals is one query for all of them, and
+    only dishes the library has never seen are inserted.
+    """
+
+    # Nutrients that scale with the portion, stored at portion 1
+    SCALED_NUTRIENTS = ["calories", "protein_g", "carbs_g", "fat_g", "fiber_g", "sodium_mg", "sugar_g"]
+    TEXT_FIELDS = ["meal_name", "description", "cuisine_type"]
+    INTEGER_FIELDS = {"prep_time_minutes": 0, "cooking_time_minutes": 0, "difficulty_level": 1}
+    LIST_FIELDS = ["ingredients", "instructions"]
+    FLAGS = ["is_vegetarian", "is_vegan", "is_gluten_free", "is_dairy_free"]
+
+    @classmethod
+    def dish(cls, meal_info: Dict[str, Any]) -> Dict[str, Any]:
+        """The library columns of a meal dict, nutrients brought back to portion 1"""
+        portion = float(meal_info.get("portion_multiplier") or 1.0)
+        dish = {field: str(meal_info.get(field) or "") for field in cls.TEXT_FIELDS}
+        for nutrient in cls.SCALED_NUTRIENTS:
+            dish[nutrient] = round(float(meal_info.get(nutrient) or 0) / portion, 1)
+        for field, default in cls.INTEGER_FIELDS.items():
+            dish[field] = int(meal_info.get(field) or default)
+        for field in cls.LIST_FIELDS:
+            dish[field] = json.dumps([str(item) for item in meal_info.get(field) or []])
+        for flag in cls.FLAGS:
+            dish[flag] = bool(meal_info.get(flag, False))
+        return dish
+
+    @classmethod
+    def meal_info(cls, canonical_meal: CanonicalMeal, portion_multiplier: Optional[float] = None) -> Dict[str, Any]:
+        """A library dish back as the LLM meal dict, nutrients at the given portion"""
+        portion = portion_multiplier or 1.0
+        meal_info = {field: getattr(canonical_meal, field) for field in cls.TEXT_FIELDS}
+        for nutrient in cls.SCALED_NUTRIENTS:
+            meal_info[nutrient] = round((getattr(canonical_meal, nutrient) or 0.0) * portion, 1)
+        for field in cls.INTEGER_FIELDS:
+            meal_info[field] = getattr(canonical_meal, field)
+        for field in cls.LIST_FIELDS:
+            value = getattr(canonical_meal, field)
+            meal_info[field] = json.loads(value) if value else []
+        for flag in cls.FLAGS:
+            meal_info[flag] = getattr(canonical_meal, flag)
+        meal_info["portion_multiplier"] = portion
+        meal_info["canonical_meal_id"] = canonical_meal.id
+        return meal_info
+
+    @staticmethod
+    def content_hash(dish: Dict[str, Any]) -> str:
+        """Hash of the dish's content, blind to case and spacing in its text"""
+        normalized = {
+            field: " ".join(value.lower().split()) if isinstance(value, str) else value
+            for field, value in dish.items()
+        }
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def canonical_meals(self, meal_infos: List[Dict[str, Any]], db: Session) -> List[CanonicalMeal]:
+        """
+        The library dish of each meal dict, in order, adding the new ones to the session.
+        A dict that names the `canonical_meal_id` it was read from reuses that dish, since
+        its rounded, rescaled nutrients would no longer hash the same.
+        """
+        known_ids = {info["canonical_meal_id"] for info in meal_infos if info.get("canonical_meal_id")}
+        by_id = {}
+        if known_ids:
+            by_id = {dish.id: dish for dish in db.query(CanonicalMeal).filter(CanonicalMeal.id.in_(known_ids))}
+
+        dishes: List[Tuple[Optional[CanonicalMeal], str, Dict[str, Any]]] = []
+        for info in meal_infos:
+            known = by_id.get(info.get("canonical_meal_id"))
+            dish = self.dish(info) if known is None else None
+            dishes.append((known, self.content_hash(dish) if dish else "", dish))
+
+        hashes = {content_hash for known, content_hash, _ in dishes if known is None}
+        by_hash = {}
+        if hashes:
+            by_hash = {
+                dish.content_hash: dish
+                for dish in db.query(CanonicalMeal).filter(CanonicalMeal.content_hash.in_(hashes))
+            }
+
+        resolved = []
+        for known, content_hash, dish in dishes:
+            if known is None:
+                known = by_hash.get(content_hash)
+            if known is None:
+                known = self._insert(content_hash, dish, db)
+                by_hash[content_hash] = known
+            resolved.append(known)
+        return resolved
+
+    @staticmethod
+    def _insert(content_hash: str, dish: Dict[str, Any], db: Session) -> CanonicalMeal:
+        """Add a new dish, or take the one a concurrent request added first"""
+        canonical_meal = CanonicalMeal(content_hash=content_hash, **dish)
+        try:
+            with db.begin_nested():
+                db.add(canonical_meal)
+        except IntegrityError:
+            canonical_meal = db.query(CanonicalMeal).filter(CanonicalMeal.content_hash == content_hash).one()
+        return canonical_meal
+
+    def build_meals(self, meal_plan_id: int, meals: List[Tuple[str, Dict[str, Any]]],
+                    db: Session) -> List[Meal]:
+        """Meal rows for (meal type, meal dict) pairs, pointing at their library dishes"""
+        canonical_meals = self.canonical_meals([meal_info for _, meal_info in meals], db)
+        return [
+            Meal(
+                meal_plan_id=meal_plan_id,
+                meal_type=meal_type,
+                canonical_meal=canonical_meal,
+                portion_multiplier=meal_info.get("portion_multiplier") or 1.0,
+                alternative_rank=0
+            )
+            for (meal_type, meal_info), canonical_meal in zip(meals, canonical_meals)
+        ]
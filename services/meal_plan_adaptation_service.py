@@ -0,0 +1,200 @@
+import os
+from datetime import date
+from typing import Dict, Any, Optional, List
+from sqlalchemy.orm import Session
+
+from db.models.meal_plan import MealPlan, Meal
+from services.meal_alternative_service import MealAlternativeService
+from services.meal_planning_service import MealPlanningService
+from utils import app_logger
+
+
+class MealPlanAdaptationService:
+    """
+    Adapts an existing meal plan to new nutrition targets by rescaling portions.
+
+    Every meal gets its own portion multiplier within bounds, chosen by bounded least squares
+    so the day's calories and macros land on the targets. The LLM is only asked for a new
+    plan when no set of multipliers gets within tolerance.
+    """
+
+    # Macros the multipliers are fitted to, fiber and micronutrients just follow the portions
+    FITTED_NUTRIENTS = ["calories", "protein_g", "carbs_g", "fat_g"]
+    # (min, max) portion multiplier per meal relative to the generated recipe
+    PORTION_BOUNDS = MealAlternativeService.PORTION_BOUNDS
+    DEFAULT_PORTION_BOUNDS = MealAlternativeService.DEFAULT_PORTION_BOUNDS
+    CALORIE_TOLERANCE = float(os.getenv("ADAPTATION_CALORIE_TOLERANCE", 50))
+    MACRO_TOLERANCE_PERCENTAGE = float(os.getenv("ADAPTATION_MACRO_TOLERANCE_PERCENTAGE", 10))
+    # Pull towards one shared multiplier so meals keep their relative size when macros allow it
+    UNIFORMITY_WEIGHT = 0.01
+    MAX_SWEEPS = 200
+
+    def __init__(self):
+        self.meal_planning_service = MealPlanningService()
+
+    async def adapt_meal_plan(self, user_id: int, target_date: date,
+                              custom_config: Optional[Dict[str, Any]] = None,
+                              allow_llm_fallback: bool = True,
+                              db: Session = None) -> Dict[str, Any]:
+        """Rescale the plan for `target_date` to the current targets, regenerating only if that fails"""
+        try:
+            meal_plan = db.query(MealPlan).filter(
+                MealPlan.user_id == user_id,
+                MealPlan.date == target_date
+            ).first()
+            if not meal_plan or not meal_plan.meals:
+                return {
+                    "status": "not_found",
+                    "message": "No meal plan found for this date"
+                }
+
+            nutrition_targets = await self.meal_planning_service._calculate_nutrition_targets(
+                user_id, target_date, custom_config, db
+            )
+            if not nutrition_targets["success"]:
+                return nutrition_targets
+            targets = nutrition_targets["data"]
+
+            meals = list(meal_plan.meals)
+            multipliers = self.fit_portions(meals, targets)
+            totals = self._totals(meals, multipliers)
+            deviation = self._deviation(totals, targets)
+
+            if self._within_tolerance(deviation):
+                self._apply(meal_plan, meals, multipliers, targets)
+                db.commit()
+                return {
+                    "status": "success",
+                    "message": "Meal plan portions adapted to the new targets",
+                    "meal_plan_id": meal_plan.id,
+                    "date": target_date.isoformat(),
+                    "adapted": True,
+                    "target_calories": meal_plan.target_calories,
+                    "total_calories": meal_plan.total_calories,
+                    "portion_multipliers": {meal.meal_type: meal.portion_multiplier for meal in meals},
+                    "deviation": deviation
+                }
+
+            if not allow_llm_fallback:
+                return {
+                    "status": "error",
+                    "message": "Portion scaling cannot meet the new targets within tolerance",
+                    "adapted": False,
+                    "deviation": deviation
+                }
+
+            result = await self.meal_planning_service.generate_meal_plan(
+                user_id=user_id,
+                target_date=target_date,
+                custom_config=custom_config,
+                regenerate_if_exists=True,
+                db=db
+            )
+            result["adapted"] = False
+            result["deviation"] = deviation
+            return result
+
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in adapt_meal_plan: {e}")
+            db.rollback()
+            return {
+                "status": "error",
+                "message": "Failed to adapt meal plan",
+                "error": str(e)
+            }
+
+    def fit_portions(self, meals: List[Meal], targets: Dict[str, Any]) -> List[float]:
+        """
+        Portion multiplier per meal minimising the squared miss on each fitted nutrient,
+        by coordinate descent: every step solves one meal's multiplier exactly with
+        the others fixed and clamps it to the meal's bounds.
+        """
+        base = [self._base_nutrients(meal) for meal in meals]
+        bounds = [self.PORTION_BOUNDS.get(meal.meal_type, self.DEFAULT_PORTION_BOUNDS) for meal in meals]
+        # Misses are measured in units of their tolerance, so the tighter calorie band weighs more
+        weights = {"calories": 1 / self.CALORIE_TOLERANCE ** 2}
+        for nutrient in self.FITTED_NUTRIENTS[1:]:
+            tolerance = targets.get(nutrient, 0) * self.MACRO_TOLERANCE_PERCENTAGE / 100
+            weights[nutrient] = 1 / tolerance ** 2 if tolerance else 0.0
+
+        base_calories = sum(nutrients["calories"] for nutrients in base)
+        uniform = targets["calories"] / base_calories if base_calories else 1.0
+        multipliers = [min(max(uniform, low), high) for low, high in bounds]
+        totals = {
+            nutrient: sum(multiplier * nutrients[nutrient] for multiplier, nutrients in zip(multipliers, base))
+            for nutrient in self.FITTED_NUTRIENTS
+        }
+
+        for _ in range(self.MAX_SWEEPS):
+            largest_step = 0.0
+            for index, nutrients in enumerate(base):
+                numerator = self.UNIFORMITY_WEIGHT * uniform
+                denominator = self.UNIFORMITY_WEIGHT
+                for nutrient, weight in weights.items():
+                    others = totals[nutrient] - multipliers[index] * nutrients[nutrient]
+                    numerator += weight * nutrients[nutrient] * (targets[nutrient] - others)
+                    denominator += weight * nutrients[nutrient] ** 2
+
+                low, high = bounds[index]
+                updated = min(max(numerator / denominator, low), high)
+                step = updated - multipliers[index]
+                if step:
+                    for nutrient in self.FITTED_NUTRIENTS:
+                        totals[nutrient] += step * nutrients[nutrient]
+                    multipliers[index] = updated
+                    largest_step = max(largest_step, abs(step))
+
+            if largest_step < 1e-5:
+                break
+
+        return [round(multiplier, 3) for multiplier in multipliers]
+
+    @staticmethod
+    def _base_nutrients(meal: Meal) -> Dict[str, float]:
+        """Nutrients of the meal at multiplier 1, i.e. as generated"""
+        return {
+            nutrient: getattr(meal.canonical_meal, nutrient) or 0
+            for nutrient in MealPlanningService.SCALED_NUTRIENTS
+        }
+
+    def _totals(self, meals: List[Meal], multipliers: List[float]) -> Dict[str, float]:
+        totals = {nutrient: 0.0 for nutrient in MealPlanningService.SCALED_NUTRIENTS}
+        for meal, multiplier in zip(meals, multipliers):
+            for nutrient, value in self._base_nutrients(meal).items():
+                totals[nutrient] += value * multiplier
+        return totals
+
+    def _deviation(self, totals: Dict[str, float], targets: Dict[str, Any]) -> Dict[str, float]:
+        """Calorie miss in kcal, macro misses in percent of target"""
+        deviation = {"calories": round(totals["calories"] - targets["calories"], 1)}
+        for nutrient in self.FITTED_NUTRIENTS[1:]:
+            if targets.get(nutrient):
+                deviation[f"{nutrient}_percentage"] = round(
+                    (totals[nutrient] - targets[nutrient]) / targets[nutrient] * 100, 1
+                )
+        return deviation
+
+    def _within_tolerance(self, deviation: Dict[str, float]) -> bool:
+        if abs(deviation["calories"]) > self.CALORIE_TOLERANCE:
+            return False
+        return all(
+            abs(value) <= self.MACRO_TOLERANCE_PERCENTAGE
+            for key, value in deviation.items() if key != "calories"
+        )
+
+    def _apply(self, meal_plan: MealPlan, meals: List[Meal], multipliers: List[float],
+               targets: Dict[str, Any]):
+        for meal, multiplier in zip(meals, multipliers):
+            # The nutrients follow, they are the library dish's scaled by the portion
+            meal.portion_multiplier = multiplier
+
+        meal_plan.target_calories = targets["calories"]
+        meal_plan.target_protein_g = targets["protein_g"]
+        meal_plan.target_carbs_g = targets["carbs_g"]
+        meal_plan.target_fat_g = targets["fat_g"]
+        meal_plan.target_fiber_g = targets["fiber_g"]
+        meal_plan.total_calories = round(sum(meal.calories for meal in meals), 1)
+        meal_plan.total_protein_g = round(sum(meal.protein_g for meal in meals), 1)
+        meal_plan.total_carbs_g = round(sum(meal.carbs_g for meal in meals), 1)
+        meal_plan.total_fat_g = round(sum(meal.fat_g for meal in meals), 1)
+        meal_plan.total_fiber_g = round(sum(meal.fiber_g for meal in meals), 1)
@@ -1,21 +1,62 @@
+import asyncio
 import json
-from datetime import date
-from typing import Dict, Any, Optional, List
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, Any, Optional, List, Tuple
 from sqlalchemy.orm import Session
 
-from db.models.meal_plan import MealPlan, Meal
+from db.db_conn import SessionLocal
+from db.models.meal_plan import MealPlan, Meal, MealAlternative
 from db.models.user import User, UserProfile, FitnessGoal
 from db.models.tracker import DailyActivityTracker
+from services.ingredient_nutrition_service import IngredientNutritionService
+from services.grocery_list_service import GroceryListService
 from services.llm_service import LLMService
+from services.meal_alternative_service import MealAlternativeService
+from services.meal_history_service import MealHistoryService
+from services.meal_library_service import MealLibraryService
+from services.prompt_compaction import is_compact, summarize_meals
+from services.restriction_validation_service import RestrictionValidationService
 from services.tracker_service import TrackerService
 from utils import app_logger
 
+logger = app_logger.createLogger("app")
+
 
 class MealPlanningService:
     """Service for generating and managing meal plans using LLM"""
+
+    MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack_1", "snack_2"]
+    # Nutrients that scale with the portion when a previous plan is reused
+    SCALED_NUTRIENTS = MealAlternativeService.SCALED_NUTRIENTS
+    # llm_model_used of a plan served from the previous one while the LLM is still generating
+    FALLBACK_MODEL_LABEL = "fallback-previous-plan"
+    # Share of the day's calories each slot usually takes, to split a budget across slots
+    SLOT_CALORIE_SHARES = {"breakfast": 0.25, "lunch": 0.30, "dinner": 0.30, "snack_1": 0.075, "snack_2": 0.075}
+    # Nutrients a slot budget and the incremental plan totals cover
+    TOTAL_NUTRIENTS = ["calories", "protein_g", "carbs_g", "fat_g", "fiber_g"]
+    MIN_SLOT_CALORIES = 100
+    # Users packed into one LLM call by batch generation
+    DEFAULT_BATCH_SIZE = int(os.getenv("MEAL_PLAN_BATCH_SIZE", 4))
+    # Longest span one range request plans, and how many of its days are generated at once
+    MAX_RANGE_DAYS = 14
+    RANGE_CONCURRENCY = int(os.getenv("MEAL_PLAN_RANGE_CONCURRENCY", 3))
+
+    # Background generations replacing a fallback plan, referenced so they are not garbage collected
+    _pending_refinements = set()
+    # Per (event loop, user) semaphore and the range requests using it, shared by concurrent requests
+    _range_lock = threading.Lock()
+    _range_semaphores: Dict[Tuple[int, int], List] = {}
     
     def __init__(self):
         self.llm_service = LLMService()
+        self.alternative_service = MealAlternativeService()
+        self.library_service = MealLibraryService()
+        self.history_service = MealHistoryService()
+        self.restriction_service = RestrictionValidationService()
     
     async def generate_meal_plan(self, user_id: int, target_date: date, 
                                custom_config: Optional[Dict[str, Any]] = None,
@@ -50,18 +91,34 @@ class MealPlanningService:
             # Get activity data for the day
             activity_data = await self._get_activity_data(user_id, target_date, db)
             
+            # Configure LLM
+            llm_config = self._get_llm_config(custom_config)
+            alternatives_per_slot, llm_alternatives = self._alternatives_config(llm_config)
+            
             # Create LLM prompt
             prompt = self.llm_service.create_meal_plan_prompt(
                 user_data["data"],
                 nutrition_targets["data"],
-                activity_data
+                activity_data,
+                compact=is_compact(llm_config),
+                token_budget=llm_config.get("prompt_token_budget"),
+                alternatives_per_slot=llm_alternatives
             )
             
-            # Configure LLM
-            llm_config = self._get_llm_config(custom_config)
+            # Generate meal plan using LLM, serving the previous plan if it misses the deadline
+            llm_task = asyncio.ensure_future(self.llm_service.generate_meal_plan(prompt, llm_config))
+            fallback_deadline = self._fallback_deadline(custom_config)
+            if fallback_deadline is not None:
+                done, _ = await asyncio.wait({llm_task}, timeout=fallback_deadline)
+                if not done:
+                    fallback_result = await self._serve_fallback_plan(
+                        user_id, target_date, user_data["data"], nutrition_targets["data"], llm_config,
+                        prompt, existing_plan, llm_task, db
+                    )
+                    if fallback_result:
+                        return fallback_result
             
-            # Generate meal plan using LLM
-            llm_result = await self.llm_service.generate_meal_plan(prompt, llm_config)
+            llm_result = await llm_task
             
             if not llm_result["success"]:
                 return {
@@ -70,11 +127,19 @@ class MealPlanningService:
                     "provider": llm_result["provider"]
                 }
             
+            varied_slots, restricted_slots = await self._finish_generated_plan(
+                user_id, target_date, llm_result["data"], user_data["data"], nutrition_targets["data"], llm_config, db
+            )
+            
             # Save meal plan to database
             meal_plan_result = await self._save_meal_plan_to_db(
                 user_id, target_date, llm_result, nutrition_targets["data"], 
-                prompt, existing_plan, db
+                prompt, existing_plan, db, alternatives_per_slot
             )
+            if varied_slots and meal_plan_result["status"] == "success":
+                meal_plan_result["regenerated_for_variety"] = varied_slots
+            if restricted_slots and meal_plan_result["status"] == "success":
+                meal_plan_result["regenerated_for_restrictions"] = restricted_slots
             
             return meal_plan_result
             
@@ -86,6 +151,301 @@ class MealPlanningService:
                 "error": str(e)
             }
     
+    @classmethod
+    @contextmanager
+    def _range_semaphore(cls, user_id: int):
+        """
+        The semaphore capping the user's concurrent range generations, shared by every range
+        request of the user on this event loop and dropped once none of them uses it
+        """
+        key = (id(asyncio.get_running_loop()), user_id)
+        with cls._range_lock:
+            entry = cls._range_semaphores.get(key)
+            if entry is None:
+                entry = cls._range_semaphores[key] = [asyncio.Semaphore(max(1, cls.RANGE_CONCURRENCY)), 0]
+            entry[1] += 1
+        try:
+            yield entry[0]
+        finally:
+            with cls._range_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    cls._range_semaphores.pop(key, None)
+    
+    async def generate_meal_plan_range(self, user_id: int, start_date: date, end_date: date,
+                                       custom_config: Optional[Dict[str, Any]] = None,
+                                       regenerate_if_exists: bool = False,
+                                       db: Session = None) -> Dict[str, Any]:
+        """
+        Generate the plans of every day from `start_date` to `end_date` and the grocery list
+        for the span. The profile and LLM settings are read once, the days' LLM calls run
+        concurrently, at most `RANGE_CONCURRENCY` at a time for the user across all their range
+        requests, and all days are saved in one transaction.
+        A day whose generation fails is reported and left out, the others are still saved.
+        """
+        try:
+            days = (end_date - start_date).days + 1
+            if days < 1 or days > self.MAX_RANGE_DAYS:
+                return {
+                    "status": "error",
+                    "message": f"The range must span 1 to {self.MAX_RANGE_DAYS} days, got {days}"
+                }
+            dates = [start_date + timedelta(days=offset) for offset in range(days)]
+            
+            existing_plans = {
+                meal_plan.date: meal_plan
+                for meal_plan in db.query(MealPlan).filter(
+                    MealPlan.user_id == user_id,
+                    MealPlan.date >= start_date,
+                    MealPlan.date <= end_date
+                )
+            }
+            results: Dict[date, Dict[str, Any]] = {}
+            
+            user_data = await self._gather_user_data(user_id, db)
+            if not user_data["success"]:
+                return user_data
+            llm_config = self._get_llm_config(custom_config)
+            alternatives_per_slot, llm_alternatives = self._alternatives_config(llm_config)
+            
+            # Targets and activity differ per day, they are cheap reads done up front
+            contexts = {}
+            for target_date in dates:
+                if target_date in existing_plans and not regenerate_if_exists:
+                    results[target_date] = {"status": "exists", "meal_plan_id": existing_plans[target_date].id}
+                    continue
+                nutrition_targets = await self._calculate_nutrition_targets(user_id, target_date, custom_config, db)
+                if not nutrition_targets["success"]:
+                    results[target_date] = {"status": "failed", "message": nutrition_targets.get("message")}
+                    continue
+                activity_data = await self._get_activity_data(user_id, target_date, db)
+                prompt = self.llm_service.create_meal_plan_prompt(
+                    user_data["data"],
+                    nutrition_targets["data"],
+                    activity_data,
+                    compact=is_compact(llm_config),
+                    token_budget=llm_config.get("prompt_token_budget"),
+                    alternatives_per_slot=llm_alternatives
+                )
+                contexts[target_date] = (nutrition_targets["data"], prompt)
+            
+            async def generate_day(target_date: date, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+                nutrition_targets, prompt = contexts[target_date]
+                async with semaphore:
+                    llm_result = await self.llm_service.generate_meal_plan(prompt, llm_config)
+                    if llm_result["success"]:
+                        missing_slots = self.llm_service.missing_slots(llm_result["data"])
+                        if missing_slots and llm_config.get("repair_missing_slots", True):
+                            await self._regenerate_slots_in_payload(
+                                llm_result["data"], missing_slots, user_data["data"], nutrition_targets, llm_config
+                            )
+                    return llm_result
+            
+            started = time.time()
+            with self._range_semaphore(user_id) as semaphore:
+                llm_results = dict(zip(contexts, await asyncio.gather(
+                    *(generate_day(day, semaphore) for day in contexts)
+                )))
+            
+            # In date order, so each day's variety check sees the days saved before it
+            for target_date, llm_result in llm_results.items():
+                if not llm_result["success"]:
+                    results[target_date] = {
+                        "status": "failed",
+                        "message": f"Failed to generate meal plan: {llm_result['error']}"
+                    }
+                    continue
+                nutrition_targets, prompt = contexts[target_date]
+                varied_slots = await self._enforce_variety(
+                    user_id, target_date, llm_result["data"], user_data["data"], nutrition_targets, llm_config, db
+                )
+                restricted_slots = await self._enforce_restrictions(
+                    llm_result["data"], user_data["data"], nutrition_targets, llm_config
+                )
+                save_result = await self._save_meal_plan_to_db(
+                    user_id, target_date, llm_result, nutrition_targets, prompt,
+                    existing_plans.get(target_date), db, alternatives_per_slot, commit=False
+                )
+                if save_result["status"] != "success":
+                    # The failed save rolled back every day of the range
+                    return save_result
+                day_result = {
+                    "status": "generated",
+                    "meal_plan_id": save_result["meal_plan_id"],
+                    "target_calories": save_result["target_calories"],
+                    "total_calories": save_result["total_calories"],
+                    "meals_created": save_result["meals_created"]
+                }
+                if save_result.get("missing_slots"):
+                    day_result["missing_slots"] = save_result["missing_slots"]
+                if varied_slots:
+                    day_result["regenerated_for_variety"] = varied_slots
+                if restricted_slots:
+                    day_result["regenerated_for_restrictions"] = restricted_slots
+                results[target_date] = day_result
+            db.commit()
+            
+            generated = sum(1 for result in results.values() if result["status"] == "generated")
+            failed = sum(1 for result in results.values() if result["status"] == "failed")
+            if failed and not generated and len(results) == failed:
+                return {
+                    "status": "error",
+                    "message": f"Failed to generate meal plans from {start_date} to {end_date}",
+                    "days": {day.isoformat(): results[day] for day in dates}
+                }
+            
+            meal_plans = db.query(MealPlan).filter(
+                MealPlan.user_id == user_id,
+                MealPlan.date >= start_date,
+                MealPlan.date <= end_date
+            ).order_by(MealPlan.date).all()
+            return {
+                "status": "success",
+                "message": f"Generated {generated} meal plans from {start_date} to {end_date}",
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "generated": generated,
+                "failed": failed,
+                "existing": sum(1 for result in results.values() if result["status"] == "exists"),
+                "generation_time": round(time.time() - started, 3),
+                "days": {day.isoformat(): results[day] for day in dates},
+                "grocery_list": GroceryListService().build(meal_plans, db)
+            }
+            
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in generate_meal_plan_range: {e}")
+            db.rollback()
+            return {
+                "status": "error",
+                "message": "Failed to generate meal plans for the range",
+                "error": str(e)
+            }
+    
+    async def generate_meal_plans_batch(self, user_ids: Optional[List[int]], target_date: date,
+                                        custom_config: Optional[Dict[str, Any]] = None,
+                                        regenerate_if_exists: bool = False,
+                                        batch_size: Optional[int] = None,
+                                        db: Session = None) -> Dict[str, Any]:
+        """
+        Generate plans for many users (all active users when `user_ids` is None), packing up to
+        `batch_size` users with the same food preference into each LLM call. Users whose plan
+        is missing or invalid in the batched response are retried with a single-user generation.
+        """
+        try:
+            if user_ids is None:
+                user_ids = [user.id for user in db.query(User.id).filter(User.is_active == True)]
+            batch_size = max(1, batch_size or self.DEFAULT_BATCH_SIZE)
+            results = {}
+            
+            existing_plans = {
+                plan.user_id: plan for plan in db.query(MealPlan).filter(
+                    MealPlan.user_id.in_(user_ids),
+                    MealPlan.date == target_date
+                )
+            }
+            
+            # Compatible users share a prompt, so group them by food preference first
+            groups = {}
+            prepared = {}
+            for user_id in user_ids:
+                if user_id in existing_plans and not regenerate_if_exists:
+                    results[user_id] = "exists"
+                    continue
+                
+                user_data = await self._gather_user_data(user_id, db)
+                if not user_data["success"]:
+                    results[user_id] = user_data["message"]
+                    continue
+                nutrition_targets = await self._calculate_nutrition_targets(user_id, target_date, custom_config, db)
+                if not nutrition_targets["success"]:
+                    results[user_id] = nutrition_targets["message"]
+                    continue
+                
+                prepared[user_id] = {
+                    "user_data": user_data["data"],
+                    "nutrition_targets": nutrition_targets["data"],
+                    "activity_data": await self._get_activity_data(user_id, target_date, db)
+                }
+                groups.setdefault(user_data["data"]["food_preference_type"], []).append(user_id)
+            
+            llm_config = self._get_llm_config(custom_config)
+            batches = 0
+            generated_in_batch = 0
+            retry_user_ids = []
+            
+            for group_user_ids in groups.values():
+                for start in range(0, len(group_user_ids), batch_size):
+                    chunk = group_user_ids[start:start + batch_size]
+                    # Positional keys, so no user ids end up in the prompt
+                    keys = {f"u{index + 1}": user_id for index, user_id in enumerate(chunk)}
+                    batch_result = await self.llm_service.generate_batch_meal_plans(
+                        {key: prepared[user_id] for key, user_id in keys.items()}, llm_config
+                    )
+                    batches += 1
+                    
+                    for key, user_id in keys.items():
+                        plan = batch_result["plans"].get(key)
+                        if not plan:
+                            retry_user_ids.append(user_id)
+                            continue
+                        
+                        await self._enforce_variety(
+                            user_id, target_date, plan, prepared[user_id]["user_data"],
+                            prepared[user_id]["nutrition_targets"], llm_config, db
+                        )
+                        await self._enforce_restrictions(
+                            plan, prepared[user_id]["user_data"], prepared[user_id]["nutrition_targets"], llm_config
+                        )
+                        save_result = await self._save_meal_plan_to_db(
+                            user_id, target_date,
+                            {
+                                "data": plan,
+                                "provider": batch_result["provider"],
+                                "model": batch_result["model"],
+                                "generation_time": batch_result["generation_time"]
+                            },
+                            prepared[user_id]["nutrition_targets"], batch_result["prompt"],
+                            existing_plans.get(user_id), db
+                        )
+                        if save_result["status"] == "success":
+                            results[user_id] = "generated"
+                            generated_in_batch += 1
+                        else:
+                            retry_user_ids.append(user_id)
+            
+            retried_ok = 0
+            for user_id in retry_user_ids:
+                retry_result = await self.generate_meal_plan(
+                    user_id, target_date, custom_config, regenerate_if_exists=regenerate_if_exists, db=db
+                )
+                if retry_result.get("status") == "success":
+                    results[user_id] = "generated_individually"
+                    retried_ok += 1
+                else:
+                    results[user_id] = retry_result.get("message", "failed")
+            
+            return {
+                "status": "success",
+                "message": f"Generated {generated_in_batch + retried_ok} meal plans for {target_date}",
+                "date": target_date.isoformat(),
+                "users": len(user_ids),
+                "batches": batches,
+                "generated_in_batch": generated_in_batch,
+                "retried_individually": len(retry_user_ids),
+                "retry_succeeded": retried_ok,
+                "skipped_existing": sum(1 for value in results.values() if value == "exists"),
+                "results": {str(user_id): value for user_id, value in results.items()}
+            }
+            
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in generate_meal_plans_batch: {e}")
+            db.rollback()
+            return {
+                "status": "error",
+                "message": "Failed to generate meal plans in batch",
+                "error": str(e)
+            }
+    
     async def _gather_user_data(self, user_id: int, db: Session) -> Dict[str, Any]:
         """Gather all relevant user data for meal planning"""
         try:
@@ -213,6 +573,18 @@ class MealPlanningService:
             app_logger.exceptionlogs(f"Error getting activity data: {e}")
             return None
     
+    def _alternatives_config(self, llm_config: Dict[str, Any]) -> Tuple[int, int]:
+        """Alternatives to store per slot and how many of them the generation call asks for"""
+        alternatives_per_slot = MealAlternativeService.per_slot(llm_config)
+        llm_alternatives = 0
+        if MealAlternativeService.source(llm_config) == "llm" and not is_compact(llm_config):
+            # Asked for in the same call, which needs room for the extra meals
+            llm_alternatives = alternatives_per_slot
+            llm_config["max_tokens"] = min(
+                llm_config["max_tokens"] * (1 + llm_alternatives), self.llm_service.BATCH_MAX_TOKENS
+            )
+        return alternatives_per_slot, llm_alternatives
+    
     def _get_llm_config(self, custom_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         """Get LLM configuration with defaults"""
         default_config = {
@@ -227,13 +599,198 @@ class MealPlanningService:
         
         return default_config
     
+    async def _finish_generated_plan(self, user_id: int, target_date: date, meal_data: Dict[str, Any],
+                                     user_data: Dict[str, Any], nutrition_targets: Dict[str, Any],
+                                     llm_config: Dict[str, Any], db: Session) -> Tuple[List[str], List[str]]:
+        """
+        Everything a generated plan goes through before it is saved: missing slots are repaired,
+        repeats of recent meals regenerated, and meals breaking the user's restrictions replaced.
+        Returns the slots replaced for variety and for restrictions.
+        """
+        # Fill slots lost to a truncated or malformed response with single-meal calls
+        missing_slots = self.llm_service.missing_slots(meal_data)
+        if missing_slots and llm_config.get("repair_missing_slots", True):
+            await self._regenerate_slots_in_payload(meal_data, missing_slots, user_data, nutrition_targets, llm_config)
+        
+        # Meals the user had within the last couple of weeks are generated again, slot by slot
+        varied_slots = await self._enforce_variety(
+            user_id, target_date, meal_data, user_data, nutrition_targets, llm_config, db
+        )
+        
+        # Last, so no regenerated meal skips the check: meals with allergens or dislikes are replaced
+        restricted_slots = await self._enforce_restrictions(meal_data, user_data, nutrition_targets, llm_config)
+        return varied_slots, restricted_slots
+    
+    @staticmethod
+    def _fallback_deadline(custom_config: Optional[Dict[str, Any]]) -> Optional[float]:
+        """Seconds to wait for the LLM before serving the previous plan, None to always wait"""
+        deadline = (custom_config or {}).get("fallback_deadline_seconds")
+        if deadline is None:
+            deadline = os.getenv("MEAL_PLAN_FALLBACK_DEADLINE_SECONDS")
+        if deadline in (None, ""):
+            return None
+        return float(deadline)
+    
+    async def _serve_fallback_plan(self, user_id: int, target_date: date, user_data: Dict[str, Any],
+                                   nutrition_targets: Dict[str, Any], llm_config: Dict[str, Any],
+                                   prompt: str, existing_plan: Optional[MealPlan],
+                                   llm_task: asyncio.Future, db: Session) -> Optional[Dict[str, Any]]:
+        """
+        Save the user's most recent plan rescaled to today's targets and leave the LLM generating
+        in the background to replace it. Returns None when there is no plan to fall back to, or
+        when that plan has a meal with one of the user's current allergies.
+        """
+        try:
+            source_plan = existing_plan if existing_plan and existing_plan.meals else db.query(MealPlan).filter(
+                MealPlan.user_id == user_id,
+                MealPlan.date < target_date,
+                MealPlan.total_calories > 0
+            ).order_by(MealPlan.date.desc()).first()
+            if not source_plan or not source_plan.meals:
+                return None
+            
+            source_calories = sum(meal.calories or 0 for meal in source_plan.meals)
+            if source_calories <= 0:
+                return None
+            scale = nutrition_targets["calories"] / source_calories
+            source_date = source_plan.date
+            scaled_meals = [
+                (meal.meal_type, self._scaled_meal_info(meal, scale))
+                for meal in sorted(source_plan.meals, key=lambda meal: self._meal_order(meal.meal_type))
+            ]
+            # Allergies may have been added since the source plan was generated
+            violations = self.restriction_service.violations(dict(scaled_meals), user_data)
+            if any(self.restriction_service.has_allergen(found) for found in violations.values()):
+                logger.warning(f"Not serving the plan of {source_date} as a fallback for user {user_id}, "
+                               f"it has meals with allergens: {sorted(violations)}")
+                return None
+            
+            if existing_plan:
+                meal_plan = existing_plan
+                db.query(Meal).filter(Meal.meal_plan_id == meal_plan.id).delete()
+                db.query(MealAlternative).filter(MealAlternative.meal_plan_id == meal_plan.id).delete()
+            else:
+                meal_plan = MealPlan(user_id=user_id, date=target_date)
+                db.add(meal_plan)
+            
+            meal_plan.target_calories = nutrition_targets["calories"]
+            meal_plan.target_protein_g = nutrition_targets["protein_g"]
+            meal_plan.target_carbs_g = nutrition_targets["carbs_g"]
+            meal_plan.target_fat_g = nutrition_targets["fat_g"]
+            meal_plan.target_fiber_g = nutrition_targets["fiber_g"]
+            meal_plan.total_calories = round(sum(info["calories"] for _, info in scaled_meals), 1)
+            meal_plan.total_protein_g = round(sum(info["protein_g"] for _, info in scaled_meals), 1)
+            meal_plan.total_carbs_g = round(sum(info["carbs_g"] for _, info in scaled_meals), 1)
+            meal_plan.total_fat_g = round(sum(info["fat_g"] for _, info in scaled_meals), 1)
+            meal_plan.total_fiber_g = round(sum(info["fiber_g"] for _, info in scaled_meals), 1)
+            meal_plan.generation_prompt = prompt
+            meal_plan.llm_model_used = self.FALLBACK_MODEL_LABEL
+            meal_plan.generation_time_seconds = 0
+            
+            db.flush()
+            db.add_all(self.library_service.build_meals(meal_plan.id, scaled_meals, db))
+            self.history_service.record(
+                meal_plan, {meal_type: meal_info["meal_name"] for meal_type, meal_info in scaled_meals}, db
+            )
+            db.commit()
+            
+            refinement = asyncio.ensure_future(
+                self._replace_fallback_plan(user_id, target_date, user_data, nutrition_targets, llm_config,
+                                            prompt, llm_task)
+            )
+            self._pending_refinements.add(refinement)
+            refinement.add_done_callback(self._pending_refinements.discard)
+            
+            return {
+                "status": "success",
+                "message": f"Meal plan adapted from {source_date} while a new one is generated",
+                "meal_plan_id": meal_plan.id,
+                "date": target_date.isoformat(),
+                "target_calories": meal_plan.target_calories,
+                "total_calories": meal_plan.total_calories,
+                "meals_created": len(scaled_meals),
+                "generation_time": 0,
+                "llm_provider": None,
+                "llm_model": self.FALLBACK_MODEL_LABEL,
+                "fallback": True,
+                "fallback_source_date": source_date.isoformat(),
+                "refinement_pending": True
+            }
+            
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error serving fallback meal plan: {e}")
+            db.rollback()
+            return None
+    
+    async def _replace_fallback_plan(self, user_id: int, target_date: date, user_data: Dict[str, Any],
+                                     nutrition_targets: Dict[str, Any], llm_config: Dict[str, Any],
+                                     prompt: str, llm_task: asyncio.Future):
+        """
+        Wait for the LLM and swap its plan in for the fallback, unless the plan changed meanwhile.
+        The plan goes through the same repair, variety and restriction steps as a direct
+        generation, and is discarded if a meal with an allergen is still left in it.
+        """
+        try:
+            llm_result = await llm_task
+        except Exception as e:
+            app_logger.exceptionlogs(f"Background meal plan generation failed for user {user_id}: {e}")
+            return
+        if not llm_result["success"]:
+            logger.warning(f"Background meal plan generation failed for user {user_id} on {target_date}, "
+                             f"keeping the fallback plan: {llm_result['error']}")
+            return
+        
+        db = SessionLocal()
+        try:
+            meal_plan = db.query(MealPlan).filter(
+                MealPlan.user_id == user_id,
+                MealPlan.date == target_date
+            ).first()
+            if not meal_plan or meal_plan.llm_model_used != self.FALLBACK_MODEL_LABEL:
+                return
+            await self._finish_generated_plan(
+                user_id, target_date, llm_result["data"], user_data, nutrition_targets, llm_config, db
+            )
+            # Slots dropped for allergens would leave the plan short of the complete fallback
+            violations = self.restriction_service.plan_violations(llm_result["data"], user_data)
+            missing_slots = self.llm_service.missing_slots(llm_result["data"])
+            if missing_slots or any(self.restriction_service.has_allergen(found) for found in violations.values()):
+                logger.warning(f"Background meal plan for user {user_id} on {target_date} still has allergens "
+                               f"or missing slots {sorted(set(violations) | set(missing_slots))}, "
+                               f"keeping the fallback plan")
+                return
+            # Generating took a while, the fallback may have been replaced in the meantime
+            db.refresh(meal_plan)
+            if meal_plan.llm_model_used != self.FALLBACK_MODEL_LABEL:
+                return
+            alternatives_per_slot, _ = self._alternatives_config(llm_config)
+            await self._save_meal_plan_to_db(
+                user_id, target_date, llm_result, nutrition_targets, prompt, meal_plan, db, alternatives_per_slot
+            )
+        finally:
+            db.close()
+    
+    def _meal_order(self, meal_type: str) -> int:
+        return self.MEAL_TYPES.index(meal_type) if meal_type in self.MEAL_TYPES else len(self.MEAL_TYPES)
+    
+    def _scaled_meal_info(self, meal: Meal, scale: float) -> Dict[str, Any]:
+        """Meal row as the LLM meal dict, with its nutrients scaled by `scale`"""
+        return MealAlternativeService.scale_meal_info(MealAlternativeService.meal_info(meal), scale)
+    
     async def _save_meal_plan_to_db(self, user_id: int, target_date: date, 
                                   llm_result: Dict[str, Any], nutrition_targets: Dict[str, Any],
                                   prompt: str, existing_plan: Optional[MealPlan],
-                                  db: Session) -> Dict[str, Any]:
-        """Save the generated meal plan to database"""
+                                  db: Session, alternatives_per_slot: Optional[int] = None,
+                                  commit: bool = True) -> Dict[str, Any]:
+        """
+        Save the generated meal plan to database, with the ranked alternatives for each slot.
+        With `commit` False it is only flushed, for a caller saving several plans in one
+        transaction; a failure still rolls the whole transaction back.
+        """
         try:
             meal_data = llm_result["data"]
+            # Meals from their ingredients where they all resolve, the day's totals always from the meals
+            recomputed_meals = IngredientNutritionService.recompute_plan(meal_data, db)
             daily_summary = meal_data.get("daily_summary", {})
             
             # Create or update meal plan
@@ -266,43 +823,30 @@ class MealPlanningService:
             db.flush()  # Get the meal plan ID
             
             # Create meals
-            meal_types = ["breakfast", "lunch", "dinner", "snack_1", "snack_2"]
             created_meals = []
             
-            for meal_type in meal_types:
+            for meal_type in self.MEAL_TYPES:
                 if meal_type in meal_data:
-                    meal_info = meal_data[meal_type]
-                    
-                    meal = Meal(
-                        meal_plan_id=meal_plan.id,
-                        meal_type=meal_type,
-                        meal_name=meal_info.get("meal_name", ""),
-                        description=meal_info.get("description", ""),
-                        calories=meal_info.get("calories", 0),
-                        protein_g=meal_info.get("protein_g", 0),
-                        carbs_g=meal_info.get("carbs_g", 0),
-                        fat_g=meal_info.get("fat_g", 0),
-                        fiber_g=meal_info.get("fiber_g", 0),
-                        sodium_mg=meal_info.get("sodium_mg", 0),
-                        sugar_g=meal_info.get("sugar_g", 0),
-                        prep_time_minutes=meal_info.get("prep_time_minutes", 0),
-                        cooking_time_minutes=meal_info.get("cooking_time_minutes", 0),
-                        difficulty_level=meal_info.get("difficulty_level", 1),
-                        cuisine_type=meal_info.get("cuisine_type", ""),
-                        ingredients=json.dumps(meal_info.get("ingredients", [])),
-                        instructions=json.dumps(meal_info.get("instructions", [])),
-                        is_vegetarian=meal_info.get("is_vegetarian", False),
-                        is_vegan=meal_info.get("is_vegan", False),
-                        is_gluten_free=meal_info.get("is_gluten_free", False),
-                        is_dairy_free=meal_info.get("is_dairy_free", False)
-                    )
-                    
-                    db.add(meal)
                     created_meals.append(meal_type)
+            db.add_all(self.library_service.build_meals(
+                meal_plan.id, [(meal_type, meal_data[meal_type]) for meal_type in created_meals], db
+            ))
             
-            db.commit()
+            if alternatives_per_slot is None:
+                alternatives_per_slot = MealAlternativeService.per_slot(None)
+            self.history_service.record(
+                meal_plan, {meal_type: meal_data[meal_type].get("meal_name", "") for meal_type in created_meals}, db
+            )
+            alternatives = self.alternative_service.store_alternatives(
+                meal_plan, meal_data, alternatives_per_slot, db
+            )
             
-            return {
+            if commit:
+                db.commit()
+            else:
+                db.flush()
+            
+            result = {
                 "status": "success",
                 "message": "Meal plan generated successfully",
                 "meal_plan_id": meal_plan.id,
@@ -312,8 +856,16 @@ class MealPlanningService:
                 "meals_created": len(created_meals),
                 "generation_time": llm_result["generation_time"],
                 "llm_provider": llm_result["provider"],
-                "llm_model": llm_result["model"]
+                "llm_model": llm_result["model"],
+                "alternatives": alternatives
             }
+            if recomputed_meals:
+                result["recomputed_meals"] = recomputed_meals
+            missing_slots = [meal_type for meal_type in self.MEAL_TYPES if meal_type not in meal_data]
+            if missing_slots:
+                # Cut off or malformed in the LLM response, only these slots need regenerating
+                result["missing_slots"] = missing_slots
+            return result
             
         except Exception as e:
             app_logger.exceptionlogs(f"Error saving meal plan to database: {e}")
@@ -324,6 +876,299 @@ class MealPlanningService:
                 "error": str(e)
             }
     
+    async def regenerate_meal_slot(self, user_id: int, target_date: date, meal_type: str,
+                                   custom_config: Optional[Dict[str, Any]] = None,
+                                   instructions: Optional[str] = None,
+                                   db: Session = None) -> Dict[str, Any]:
+        """Ask the LLM for a new meal in one slot, within what the other meals leave of the targets"""
+        try:
+            lookup = self._find_slot(user_id, target_date, meal_type, db)
+            if lookup["status"] != "success":
+                return lookup
+            meal_plan, current_meal = lookup["meal_plan"], lookup["meal"]
+            
+            user_data = await self._gather_user_data(user_id, db)
+            if not user_data["success"]:
+                return user_data
+            
+            other_meals = [meal for meal in meal_plan.meals if meal is not current_meal]
+            budget = self._slot_budget(
+                self._plan_targets(meal_plan),
+                [{nutrient: getattr(meal, nutrient) or 0 for nutrient in self.TOTAL_NUTRIENTS} for meal in other_meals]
+            )
+            avoid_meals = [meal.meal_name for meal in meal_plan.meals]
+            
+            llm_config = self._get_llm_config(custom_config)
+            prompt = self.llm_service.create_meal_slot_prompt(
+                user_data["data"], meal_type, budget, avoid_meals, instructions
+            )
+            llm_result = await self.llm_service.generate_meal_slot(prompt, meal_type, llm_config)
+            if not llm_result["success"]:
+                return {
+                    "status": "error",
+                    "message": f"Failed to regenerate {meal_type}: {llm_result['error']}",
+                    "provider": llm_result["provider"]
+                }
+            
+            IngredientNutritionService.recompute_meal(llm_result["data"], db)
+            violations = self.restriction_service.violations({meal_type: llm_result["data"]}, user_data["data"])
+            if self.restriction_service.has_allergen(violations.get(meal_type, [])):
+                # The current meal stays, a dislike the user's own instructions may have asked for does not block
+                return {
+                    "status": "error",
+                    "message": f"Regenerated {meal_type} contains an allergen, the current meal was kept",
+                    "violations": violations[meal_type]
+                }
+            
+            meal = self._replace_meal(meal_plan, current_meal, meal_type, llm_result["data"], db)
+            db.commit()
+            
+            return {
+                **self._slot_response(meal_plan, meal, f"{meal_type} regenerated"),
+                "generation_time": llm_result["generation_time"],
+                "llm_provider": llm_result["provider"],
+                "llm_model": llm_result["model"]
+            }
+            
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in regenerate_meal_slot: {e}")
+            db.rollback()
+            return {
+                "status": "error",
+                "message": f"Failed to regenerate {meal_type}",
+                "error": str(e)
+            }
+    
+    async def swap_meal(self, user_id: int, target_date: date, meal_type: str,
+                        meal_info: Optional[Dict[str, Any]] = None, db: Session = None) -> Dict[str, Any]:
+        """
+        Put the given meal in one slot, or without one the slot's next stored alternative.
+        No generation involved either way.
+        """
+        try:
+            lookup = self._find_slot(user_id, target_date, meal_type, db)
+            if lookup["status"] != "success":
+                return lookup
+            meal_plan, current_meal = lookup["meal_plan"], lookup["meal"]
+            
+            alternative_rank = None
+            if meal_info is None:
+                alternative = self.alternative_service.next_alternative(
+                    meal_plan.id, meal_type, current_meal.alternative_rank if current_meal else None, db
+                )
+                if not alternative:
+                    return {
+                        "status": "not_found",
+                        "message": f"No alternatives stored for {meal_type}"
+                    }
+                meal_info = self.alternative_service.alternative_info(alternative)
+                alternative_rank = alternative.rank
+            
+            meal = self._replace_meal(meal_plan, current_meal, meal_type, meal_info, db, alternative_rank)
+            db.commit()
+            
+            return self._slot_response(meal_plan, meal, f"{meal_type} swapped")
+            
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in swap_meal: {e}")
+            db.rollback()
+            return {
+                "status": "error",
+                "message": f"Failed to swap {meal_type}",
+                "error": str(e)
+            }
+    
+    def _find_slot(self, user_id: int, target_date: date, meal_type: str, db: Session) -> Dict[str, Any]:
+        if meal_type not in self.MEAL_TYPES:
+            return {
+                "status": "error",
+                "message": f"Unknown meal type {meal_type}, expected one of {', '.join(self.MEAL_TYPES)}"
+            }
+        meal_plan = db.query(MealPlan).filter(
+            MealPlan.user_id == user_id,
+            MealPlan.date == target_date
+        ).first()
+        if not meal_plan:
+            return {
+                "status": "not_found",
+                "message": "No meal plan found for this date"
+            }
+        meal = next((meal for meal in meal_plan.meals if meal.meal_type == meal_type), None)
+        return {"status": "success", "meal_plan": meal_plan, "meal": meal}
+    
+    def _replace_meal(self, meal_plan: MealPlan, current_meal: Optional[Meal], meal_type: str,
+                      meal_info: Dict[str, Any], db: Session, alternative_rank: Optional[int] = None) -> Meal:
+        """Swap the slot's row for a new one and move the plan totals by the difference"""
+        meal = self.library_service.build_meals(meal_plan.id, [(meal_type, meal_info)], db)[0]
+        meal.alternative_rank = alternative_rank
+        for nutrient in self.TOTAL_NUTRIENTS:
+            previous = (getattr(current_meal, nutrient) or 0) if current_meal else 0
+            total_field = f"total_{nutrient}"
+            setattr(meal_plan, total_field,
+                    round((getattr(meal_plan, total_field) or 0) + (getattr(meal, nutrient) or 0) - previous, 1))
+        if current_meal:
+            meal_plan.meals.remove(current_meal)
+            db.delete(current_meal)
+        meal_plan.meals.append(meal)
+        self.history_service.record(meal_plan, {other.meal_type: other.meal_name for other in meal_plan.meals}, db)
+        return meal
+    
+    @staticmethod
+    def _plan_targets(meal_plan: MealPlan) -> Dict[str, float]:
+        return {
+            "calories": meal_plan.target_calories,
+            "protein_g": meal_plan.target_protein_g,
+            "carbs_g": meal_plan.target_carbs_g,
+            "fat_g": meal_plan.target_fat_g,
+            "fiber_g": meal_plan.target_fiber_g
+        }
+    
+    def _slot_budget(self, targets: Dict[str, Any], other_meals: List[Dict[str, Any]],
+                     share: float = 1.0) -> Dict[str, float]:
+        """`share` of what `other_meals` leave of the targets, never below a small snack"""
+        budget = {}
+        for nutrient in self.TOTAL_NUTRIENTS:
+            remaining = (targets.get(nutrient) or 0) - sum(float(meal.get(nutrient) or 0) for meal in other_meals)
+            budget[nutrient] = round(max(0.0, remaining) * share, 1)
+        budget["calories"] = max(budget["calories"], self.MIN_SLOT_CALORIES)
+        return budget
+    
+    async def _regenerate_slots_in_payload(self, meal_data: Dict[str, Any], missing_slots: List[str],
+                                           user_data: Dict[str, Any], nutrition_targets: Dict[str, Any],
+                                           llm_config: Dict[str, Any], avoid_meals: Optional[List[str]] = None):
+        """
+        Repair hook for a response that lost some meals: generate just those slots, splitting
+        what the kept meals leave of the targets by the slots' usual shares, then recount
+        the daily summary. Slots that still fail stay missing.
+        """
+        present_meals = [meal_data[meal_type] for meal_type in self.MEAL_TYPES if meal_type in meal_data]
+        missing_share = sum(self.SLOT_CALORIE_SHARES[meal_type] for meal_type in missing_slots)
+        avoid_meals = [meal.get("meal_name") for meal in present_meals] + list(avoid_meals or [])
+        
+        for meal_type in missing_slots:
+            budget = self._slot_budget(
+                nutrition_targets, present_meals, self.SLOT_CALORIE_SHARES[meal_type] / missing_share
+            )
+            prompt = self.llm_service.create_meal_slot_prompt(user_data, meal_type, budget, avoid_meals)
+            slot_result = await self.llm_service.generate_meal_slot(prompt, meal_type, llm_config)
+            if slot_result["success"]:
+                meal_data[meal_type] = slot_result["data"]
+                avoid_meals.append(slot_result["data"].get("meal_name"))
+            else:
+                logger.warning(f"Could not regenerate missing {meal_type}: {slot_result['error']}")
+        
+        meal_data.pop("daily_summary", None)
+        summarize_meals(meal_data)
+    
+    async def _enforce_variety(self, user_id: int, target_date: date, meal_data: Dict[str, Any],
+                               user_data: Dict[str, Any], nutrition_targets: Dict[str, Any],
+                               llm_config: Dict[str, Any], db: Session) -> List[str]:
+        """
+        Regenerate the slots whose meal the user had within the history window, once each,
+        keeping the repeat where the new call fails. Returns the slots that were replaced.
+        """
+        if not llm_config.get("enforce_variety", True):
+            return []
+        collisions = self.history_service.colliding_slots(user_id, target_date, meal_data, db)
+        if not collisions:
+            return []
+        
+        repeats = {meal_type: meal_data.pop(meal_type) for meal_type in self.MEAL_TYPES if meal_type in collisions}
+        await self._regenerate_slots_in_payload(
+            meal_data, list(repeats), user_data, nutrition_targets, llm_config,
+            avoid_meals=[meal.get("meal_name") for meal in repeats.values()]
+        )
+        
+        replaced = [meal_type for meal_type in repeats if meal_type in meal_data]
+        if len(replaced) < len(repeats):
+            for meal_type, meal in repeats.items():
+                meal_data.setdefault(meal_type, meal)
+            meal_data.pop("daily_summary", None)
+            summarize_meals(meal_data)
+        return replaced
+    
+    async def _enforce_restrictions(self, meal_data: Dict[str, Any], user_data: Dict[str, Any],
+                                    nutrition_targets: Dict[str, Any], llm_config: Dict[str, Any]) -> List[str]:
+        """
+        Regenerate the slots whose meal contains one of the user's allergies or disliked foods,
+        once each. Where the replacement breaks a restriction too, the slot keeps whichever meal
+        is free of allergens, the original first; when neither is, the slot is left missing.
+        Returns the slots that were replaced.
+        """
+        violations = self.restriction_service.plan_violations(meal_data, user_data)
+        if not violations:
+            return []
+        
+        offending = {meal_type: meal_data.pop(meal_type) for meal_type in self.MEAL_TYPES if meal_type in violations}
+        await self._regenerate_slots_in_payload(
+            meal_data, list(offending), user_data, nutrition_targets, llm_config,
+            avoid_meals=[meal.get("meal_name") for meal in offending.values()]
+        )
+        
+        remaining = self.restriction_service.violations(
+            {meal_type: meal_data[meal_type] for meal_type in offending if meal_type in meal_data}, user_data
+        )
+        replaced = []
+        for meal_type, meal in offending.items():
+            replacement = meal_data.pop(meal_type, None)
+            if replacement is not None and meal_type not in remaining:
+                meal_data[meal_type] = replacement
+                replaced.append(meal_type)
+            elif not self.restriction_service.has_allergen(violations[meal_type]):
+                meal_data[meal_type] = meal
+            elif replacement is not None and not self.restriction_service.has_allergen(remaining[meal_type]):
+                meal_data[meal_type] = replacement
+                replaced.append(meal_type)
+            else:
+                logger.warning(f"Dropped {meal_type} for allergens: {violations[meal_type]}")
+        
+        meal_data.pop("daily_summary", None)
+        summarize_meals(meal_data)
+        return replaced
+    
+    def _slot_response(self, meal_plan: MealPlan, meal: Meal, message: str) -> Dict[str, Any]:
+        return {
+            "status": "success",
+            "message": message,
+            "meal_plan_id": meal_plan.id,
+            "date": meal_plan.date.isoformat(),
+            "meal_type": meal.meal_type,
+            "meal_name": meal.meal_name,
+            "calories": meal.calories,
+            "alternative_rank": meal.alternative_rank,
+            "target_calories": meal_plan.target_calories,
+            "total_calories": meal_plan.total_calories,
+            "total_protein_g": meal_plan.total_protein_g,
+            "total_carbs_g": meal_plan.total_carbs_g,
+            "total_fat_g": meal_plan.total_fat_g
+        }
+    
+    async def get_meal_alternatives(self, user_id: int, target_date: date, meal_type: str,
+                                    db: Session = None) -> Dict[str, Any]:
+        """The slot's stored alternatives in swap order, the generated meal first"""
+        try:
+            lookup = self._find_slot(user_id, target_date, meal_type, db)
+            if lookup["status"] != "success":
+                return lookup
+            meal_plan, current_meal = lookup["meal_plan"], lookup["meal"]
+            
+            return {
+                "status": "success",
+                "meal_plan_id": meal_plan.id,
+                "date": meal_plan.date.isoformat(),
+                "meal_type": meal_type,
+                "current_rank": current_meal.alternative_rank if current_meal else None,
+                "alternatives": self.alternative_service.list_alternatives(meal_plan.id, meal_type, db)
+            }
+            
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in get_meal_alternatives: {e}")
+            return {
+                "status": "error",
+                "message": f"Failed to get alternatives for {meal_type}",
+                "error": str(e)
+            }
+    
     async def get_meal_plan(self, user_id: int, target_date: date, db: Session) -> Optional[MealPlan]:
         """Get meal plan for a specific date"""
         try:
@@ -0,0 +1,166 @@
+from datetime import date, datetime, time
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from db.models.workout import ExerciseProgression
+from utils import app_logger
+
+
+class ProgressionService:
+    """
+    Keeps one ExerciseProgression row per user and exercise up to date as sets are inserted,
+    so workout generation can prescribe weights without scanning the set history.
+    """
+
+    # Weight of the newest set in the rolling estimated 1RM
+    ROLLING_ALPHA = 0.3
+    # Overload applied on top of the rolling 1RM while the trend is not negative
+    PROGRESSIVE_OVERLOAD = 1.025
+    WEIGHT_INCREMENT = 2.5
+
+    @staticmethod
+    def estimate_1rm(weight: float, reps: int) -> float:
+        """Epley formula, a single rep is the 1RM itself"""
+        if not weight or not reps or reps <= 0:
+            return 0.0
+        if reps == 1:
+            return float(weight)
+        return weight * (1 + reps / 30.0)
+
+    @staticmethod
+    def get_user_progressions(user_id: int, db: Session) -> Dict[int, ExerciseProgression]:
+        """All progression rows of a user keyed by exercise id (one indexed query)"""
+        try:
+            rows = db.query(ExerciseProgression).filter(ExerciseProgression.user_id == user_id).all()
+            return {row.exercise_id: row for row in rows}
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in get_user_progressions: {e}")
+            return {}
+
+    @staticmethod
+    def record_sets(user_id: int, exercise_sets: List[dict], db: Session,
+                    progressions: Optional[Dict[int, ExerciseProgression]] = None):
+        """
+        Fold newly inserted sets into the user's progression rows. Does not commit.
+
+        `exercise_sets` are dicts with exercise_id, weight, reps, time and created_at.
+        Pass `progressions` when the caller already loaded them to skip the lookup.
+        """
+        if not exercise_sets:
+            return progressions or {}
+
+        if progressions is None:
+            exercise_ids = list({item["exercise_id"] for item in exercise_sets})
+            progressions = {
+                row.exercise_id: row
+                for row in db.query(ExerciseProgression).filter(
+                    ExerciseProgression.user_id == user_id,
+                    ExerciseProgression.exercise_id.in_(exercise_ids)
+                ).all()
+            }
+
+        for item in sorted(exercise_sets, key=lambda entry: ProgressionService._as_datetime(entry.get("created_at"))):
+            progression = progressions.get(item["exercise_id"])
+            if not progression:
+                progression = ExerciseProgression(
+                    user_id=user_id,
+                    exercise_id=item["exercise_id"],
+                    best_weight=0.0,
+                    best_reps=0,
+                    best_estimated_1rm=0.0,
+                    max_reps=0,
+                    max_time=0.0,
+                    last_estimated_1rm=0.0,
+                    rolling_estimated_1rm=0.0,
+                    estimated_1rm_trend=0.0,
+                    last_session_volume=0.0,
+                    total_volume=0.0,
+                    total_sets=0
+                )
+                db.add(progression)
+                progressions[item["exercise_id"]] = progression
+
+            ProgressionService.apply_set(progression, item)
+
+        return progressions
+
+    @staticmethod
+    def _as_datetime(value) -> datetime:
+        """Sets can carry a datetime, a plain date (generated workouts) or nothing"""
+        if value is None:
+            return datetime.utcnow()
+        if isinstance(value, datetime):
+            return value.replace(tzinfo=None)
+        if isinstance(value, date):
+            return datetime.combine(value, time.min)
+        return value
+
+    @staticmethod
+    def apply_set(progression: ExerciseProgression, item: dict):
+        weight = item.get("weight") or 0.0
+        reps = item.get("reps") or 0
+        set_time = item.get("time") or 0.0
+        performed_at = ProgressionService._as_datetime(item.get("created_at"))
+        performed_on = performed_at.date()
+        volume = weight * reps
+
+        progression.total_sets = (progression.total_sets or 0) + 1
+        progression.total_volume = (progression.total_volume or 0.0) + volume
+        progression.max_reps = max(progression.max_reps or 0, reps)
+        progression.max_time = max(progression.max_time or 0.0, set_time)
+
+        # Session volume only tracks the latest day, late (offline) sets for older days are skipped
+        if progression.last_session_date is None or performed_on > progression.last_session_date:
+            progression.last_session_date = performed_on
+            progression.last_session_volume = volume
+        elif performed_on == progression.last_session_date:
+            progression.last_session_volume = (progression.last_session_volume or 0.0) + volume
+
+        estimated_1rm = ProgressionService.estimate_1rm(weight, reps)
+        if estimated_1rm <= 0:
+            return
+
+        if estimated_1rm > (progression.best_estimated_1rm or 0.0):
+            progression.best_estimated_1rm = estimated_1rm
+            progression.best_weight = weight
+            progression.best_reps = reps
+            progression.best_set_at = performed_at
+
+        previous_rolling = progression.rolling_estimated_1rm or 0.0
+        alpha = ProgressionService.ROLLING_ALPHA
+        if previous_rolling <= 0:
+            rolling = estimated_1rm
+        else:
+            rolling = alpha * estimated_1rm + (1 - alpha) * previous_rolling
+            progression.estimated_1rm_trend = (
+                alpha * (rolling - previous_rolling) + (1 - alpha) * (progression.estimated_1rm_trend or 0.0)
+            )
+        progression.rolling_estimated_1rm = rolling
+        progression.last_estimated_1rm = estimated_1rm
+
+    @staticmethod
+    def prescribe_sets(progression: Optional[ExerciseProgression], default_sets: List[dict]) -> List[dict]:
+        """
+        Scale the weights of a default set scheme to the user's rolling estimated 1RM.
+        Bodyweight / timed sets and users without history keep the default scheme.
+        """
+        if not progression or not progression.rolling_estimated_1rm:
+            return default_sets
+
+        target_1rm = progression.rolling_estimated_1rm
+        if (progression.estimated_1rm_trend or 0.0) >= 0:
+            target_1rm *= ProgressionService.PROGRESSIVE_OVERLOAD
+
+        increment = ProgressionService.WEIGHT_INCREMENT
+        prescribed = []
+        for set_data in default_sets:
+            if not set_data.get("weight") or not set_data.get("reps"):
+                prescribed.append(set_data)
+                continue
+            weight = target_1rm / (1 + set_data["reps"] / 30.0)
+            prescribed.append({
+                **set_data,
+                "weight": max(increment, round(weight / increment) * increment)
+            })
+        return prescribed
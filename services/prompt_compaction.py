@@ -0,0 +1,172 @@
+"""
+Compact meal plan prompt format.
+
+The full prompt spells out the profile in prose and carries a verbose example response on every
+request. In compact mode the static instructions move to the system prompt, the response shape
+is given as a JSON schema with short keys (enforced by the provider's structured output where it
+has one), and the user prompt is trimmed to a token budget. `expand_meal_plan` maps the short
+keys back, so everything after the provider call sees the usual meal plan dict.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack_1", "snack_2")
+
+SHORT_MEAL_TYPES = {"b": "breakfast", "l": "lunch", "d": "dinner", "s1": "snack_1", "s2": "snack_2"}
+
+# short key: (field, JSON type, description)
+SHORT_FIELDS = {
+    "n": ("meal_name", "string", "meal name"),
+    "ds": ("description", "string", "one sentence description"),
+    "kc": ("calories", "number", "kcal"),
+    "p": ("protein_g", "number", "protein g"),
+    "c": ("carbs_g", "number", "carbohydrates g"),
+    "f": ("fat_g", "number", "fat g"),
+    "fb": ("fiber_g", "number", "fiber g"),
+    "na": ("sodium_mg", "number", "sodium mg"),
+    "su": ("sugar_g", "number", "sugar g"),
+    "pt": ("prep_time_minutes", "integer", "prep minutes"),
+    "ct": ("cooking_time_minutes", "integer", "cooking minutes"),
+    "dl": ("difficulty_level", "integer", "difficulty 1-5"),
+    "cu": ("cuisine_type", "string", "cuisine"),
+    "ig": ("ingredients", "array", "ingredients with quantities"),
+    "in": ("instructions", "array", "cooking steps"),
+    "vg": ("is_vegetarian", "boolean", "vegetarian"),
+    "vn": ("is_vegan", "boolean", "vegan"),
+    "gf": ("is_gluten_free", "boolean", "gluten free"),
+    "df": ("is_dairy_free", "boolean", "dairy free"),
+}
+
+LONG_FIELDS = {short: field for short, (field, _, _) in SHORT_FIELDS.items()}
+
+SYSTEM_PROMPT = "You are a professional nutritionist and meal planning expert. Always respond with valid JSON format."
+
+COMPACT_SYSTEM_PROMPT = (
+    "You are a professional nutritionist. Reply with one day of meals as JSON: "
+    "b breakfast, l lunch, d dinner, s1 mid-morning snack, s2 evening snack. "
+    "Each meal has " + ", ".join(f"{short} {description}" for short, (_, _, description) in SHORT_FIELDS.items()) + ". "
+    "Daily totals within 50 kcal of the calorie target and close to the macro targets. "
+    "Never use allergens, respect restrictions and dislikes, fit the prep time and cooking skill, "
+    "vary cuisines and cooking methods, keep snacks healthy."
+)
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", 300))
+
+
+def _meal_schema() -> Dict[str, Any]:
+    properties = {}
+    for short, (_, json_type, description) in SHORT_FIELDS.items():
+        properties[short] = {"type": json_type, "description": description}
+        if json_type == "array":
+            properties[short]["items"] = {"type": "string"}
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(SHORT_FIELDS),
+        "additionalProperties": False
+    }
+
+
+# Every key required and no extras, as OpenAI's strict structured output demands
+MEAL_PLAN_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {short: _meal_schema() for short in SHORT_MEAL_TYPES},
+    "required": list(SHORT_MEAL_TYPES),
+    "additionalProperties": False
+}
+
+
+def is_compact(config: Dict[str, Any]) -> bool:
+    return (config.get("prompt_mode") or os.getenv("LLM_PROMPT_MODE", "full")).lower() == "compact"
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count estimate without a tokenizer, about 4 characters per token"""
+    if not text:
+        return 0
+    return len(text) // 4 + 1
+
+
+def _join(values: List[Any]) -> str:
+    return ", ".join(str(value) for value in values)
+
+
+def build_compact_prompt(user_data: Dict[str, Any], nutrition_targets: Dict[str, Any],
+                         activity_data: Optional[Dict[str, Any]] = None,
+                         token_budget: Optional[int] = None) -> str:
+    """
+    User prompt of one line per fact. When system and user prompt together exceed
+    `token_budget`, the least important lines are dropped first; targets, allergies and
+    restrictions are always kept. The schema is a fixed cost outside the budget.
+    """
+    token_budget = token_budget or DEFAULT_TOKEN_BUDGET
+
+    # (priority, line), lines with a priority of None are never dropped
+    lines: List[Tuple[Optional[int], str]] = [
+        (None, f"Target Calories: {nutrition_targets['calories']} kcal | protein {nutrition_targets['protein_g']}g "
+               f"| carbs {nutrition_targets['carbs_g']}g | fat {nutrition_targets['fat_g']}g "
+               f"| fiber {nutrition_targets['fiber_g']}g"),
+        (None, f"Diet: {user_data.get('food_preference_type', 'omnivore')}"),
+    ]
+    if user_data.get("allergies"):
+        lines.append((None, f"Allergies (never use): {_join(user_data['allergies'])}"))
+    if user_data.get("dietary_restrictions"):
+        lines.append((None, f"Restrictions: {_join(user_data['dietary_restrictions'])}"))
+    if user_data.get("disliked_foods"):
+        lines.append((3, f"Avoid: {_join(user_data['disliked_foods'])}"))
+    lines.append((2, f"Cooking skill {user_data.get('cooking_skill_level', 3)}/5, "
+                     f"max prep {user_data.get('max_prep_time_minutes', 45)} min"))
+    if activity_data:
+        lines.append((1, f"Today: {activity_data.get('activity_summary', 'workout')}, "
+                         f"{activity_data.get('calories_burned', 0)} kcal burned"))
+    if user_data.get("preferred_cuisines"):
+        lines.append((1, f"Preferred cuisines: {_join(user_data['preferred_cuisines'])}"))
+    lines.append((0, f"Gender: {user_data.get('gender', 'not_specified')}, "
+                     f"usually {user_data.get('preferred_meal_frequency', 3)} meals, "
+                     f"snacks {'yes' if user_data.get('snack_preference', True) else 'no'}"))
+
+    def render(kept: List[Tuple[Optional[int], str]]) -> str:
+        return "\n".join(line for _, line in kept)
+
+    system_tokens = estimate_tokens(COMPACT_SYSTEM_PROMPT)
+    kept = list(lines)
+    for priority in (0, 1, 2, 3):
+        if system_tokens + estimate_tokens(render(kept)) <= token_budget:
+            break
+        kept = [line for line in kept if line[0] != priority]
+    return render(kept)
+
+
+def expand_meal_plan(data: Any) -> Any:
+    """Map short keys back to the full meal plan format and add the daily summary"""
+    if not isinstance(data, dict):
+        return data
+
+    plan = {}
+    for key, value in data.items():
+        meal_type = SHORT_MEAL_TYPES.get(key, key)
+        if meal_type in MEAL_TYPES and isinstance(value, dict):
+            plan[meal_type] = {LONG_FIELDS.get(field, field): field_value for field, field_value in value.items()}
+        else:
+            plan[meal_type] = value
+
+    return summarize_meals(plan)
+
+
+def summarize_meals(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the daily summary from the meals when the plan has none"""
+    meals = [plan[meal_type] for meal_type in MEAL_TYPES if isinstance(plan.get(meal_type), dict)]
+    if meals and "daily_summary" not in plan:
+        def total(field: str) -> float:
+            return round(sum(float(meal.get(field) or 0) for meal in meals), 1)
+
+        plan["daily_summary"] = {
+            "total_calories": total("calories"),
+            "total_protein_g": total("protein_g"),
+            "total_carbs_g": total("carbs_g"),
+            "total_fat_g": total("fat_g"),
+            "total_fiber_g": total("fiber_g"),
+            "prep_time_total": int(total("prep_time_minutes") + total("cooking_time_minutes"))
+        }
+    return plan
@@ -0,0 +1,217 @@
+import heapq
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+
+from db.models.recipe import Recipe, RecipeIngredient
+from services.ingredient_nutrition_service import IngredientNutritionService
+from utils import app_logger
+
+
+@dataclass(frozen=True)
+class IndexedRecipe:
+    id: int
+    name: str
+    calories: float
+    protein_g: float
+    carbs_g: float
+    fat_g: float
+    total_time_minutes: int
+    # Distinct foods the recipe needs, as `IngredientNutritionService.item_name` spells them
+    ingredients: Tuple[str, ...]
+
+
+def _positions(bits: int):
+    """Indexes of the set bits, lowest first, read off the binary string in one pass"""
+    digits = bin(bits)[:1:-1]
+    position = digits.find("1")
+    while position != -1:
+        yield position
+        position = digits.find("1", position + 1)
+
+
+class RecipeIndexService:
+    """
+    Process-wide inverted index of the active recipes by the foods they need.
+
+    Every recipe gets a bit position; each food maps to the bitset of the recipes using it,
+    and the default recipes and each user's own recipes have a mask. Ranking an inventory
+    against the catalogue is then a handful of big-int ANDs and ORs: the recipes a user may
+    see that use anything they have, and per recipe how many of its foods they have, summed
+    as bit-sliced counters, with no query and no per-recipe set arithmetic. Every (re)load
+    bumps `version`; call `invalidate()` after changing recipes. Recipes changed elsewhere
+    (the admin panel, another worker) are picked up by a stamp query on read, at most every
+    `CHECK_SECONDS`.
+    """
+
+    CHECK_SECONDS = float(os.getenv("RECIPE_INDEX_CHECK_SECONDS", 30))
+
+    _lock = threading.Lock()
+    _loaded = False
+    _version = 0
+    # Stamp of the rows the index was built from, and when to compare it again
+    _stamp: Tuple = ()
+    _next_check = 0.0
+
+    _recipes: Tuple[IndexedRecipe, ...] = ()
+    # food -> bitset of recipe positions
+    _postings: Dict[str, int] = {}
+    _default_mask = 0
+    # user id -> bitset of the user's own recipes
+    _user_masks: Dict[int, int] = {}
+
+    @classmethod
+    def load(cls, db: Session) -> int:
+        """(Re)load the index from the database and return the new version stamp"""
+        # Taken before the rows, so a change landing in between is seen by the next check
+        stamp = cls._source_stamp(db)
+        recipes = db.query(Recipe).options(
+            joinedload(Recipe.ingredients).joinedload(RecipeIngredient.ingredient)
+        ).filter(Recipe.is_active == True).order_by(Recipe.id).all()
+
+        indexed = []
+        postings: Dict[str, int] = {}
+        default_mask = 0
+        user_masks: Dict[int, int] = {}
+        for position, recipe in enumerate(recipes):
+            foods = []
+            for recipe_ingredient in recipe.ingredients:
+                if recipe_ingredient.ingredient is None:
+                    continue
+                food = IngredientNutritionService.item_name(recipe_ingredient.ingredient.name, db)
+                if food and food not in foods:
+                    foods.append(food)
+            indexed.append(IndexedRecipe(
+                id=recipe.id,
+                name=recipe.name,
+                calories=recipe.calories_per_serving or 0.0,
+                protein_g=recipe.protein_g or 0.0,
+                carbs_g=recipe.carbs_g or 0.0,
+                fat_g=recipe.fat_g or 0.0,
+                total_time_minutes=(recipe.prep_time_minutes or 0) + (recipe.cook_time_minutes or 0),
+                ingredients=tuple(foods)
+            ))
+            bit = 1 << position
+            for food in foods:
+                postings[food] = postings.get(food, 0) | bit
+            if recipe.is_default:
+                default_mask |= bit
+            if recipe.user_id is not None:
+                user_masks[recipe.user_id] = user_masks.get(recipe.user_id, 0) | bit
+
+        with cls._lock:
+            cls._recipes = tuple(indexed)
+            cls._postings = postings
+            cls._default_mask = default_mask
+            cls._user_masks = user_masks
+            cls._stamp = stamp
+            cls._next_check = time.monotonic() + cls.CHECK_SECONDS
+            cls._version += 1
+            cls._loaded = True
+            return cls._version
+
+    @classmethod
+    def invalidate(cls):
+        """Drop the index so the next read reloads it (call after changing recipes)"""
+        with cls._lock:
+            cls._loaded = False
+
+    @classmethod
+    def version(cls) -> int:
+        return cls._version
+
+    @staticmethod
+    def _source_stamp(db: Session) -> Tuple:
+        """Count, last id and last update of the recipes and of their ingredient rows"""
+        recipes = db.query(func.count(Recipe.id), func.max(Recipe.id), func.max(Recipe.updated_at)).one()
+        ingredients = db.query(
+            func.count(RecipeIngredient.id), func.max(RecipeIngredient.id), func.max(RecipeIngredient.updated_at)
+        ).one()
+        return tuple(recipes) + tuple(ingredients)
+
+    @classmethod
+    def _ensure_loaded(cls, db: Session):
+        if cls._loaded and time.monotonic() < cls._next_check:
+            return
+        try:
+            if cls._loaded and cls._source_stamp(db) == cls._stamp:
+                cls._next_check = time.monotonic() + cls.CHECK_SECONDS
+                return
+            cls.load(db)
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error loading recipe index: {e}")
+            raise
+
+    @classmethod
+    def rank(cls, user_id: int, available: Dict[str, float], db: Session,
+             max_missing: Optional[int] = None, expiry_weight: float = 0.5,
+             limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        The recipes the user may cook with the foods in `available`, best first.
+
+        `available` maps each food on hand to its urgency, 0 for no hurry up to 1 for use
+        today. A recipe scores the share of its foods on hand plus `expiry_weight` times the
+        urgency of those it uses, so of two equally covered recipes the one that uses up what
+        is about to expire comes first. Recipes missing more than `max_missing` foods are left out.
+        """
+        cls._ensure_loaded(db)
+        recipes, postings = cls._recipes, cls._postings
+        visible = cls._default_mask | cls._user_masks.get(user_id, 0)
+
+        # counters[i] holds bit i of every recipe's count of foods on hand
+        counters: List[int] = []
+        candidates = 0
+        for food in available:
+            carry = postings.get(food, 0) & visible
+            candidates |= carry
+            for index, counter in enumerate(counters):
+                if not carry:
+                    break
+                counters[index], carry = counter ^ carry, counter & carry
+            if carry:
+                counters.append(carry)
+
+        matched: Dict[int, int] = {}
+        for index, counter in enumerate(counters):
+            for position in _positions(counter):
+                matched[position] = matched.get(position, 0) + (1 << index)
+        urgency: Dict[int, float] = {}
+        for food, value in available.items():
+            if value > 0:
+                for position in _positions(postings.get(food, 0) & visible):
+                    urgency[position] = urgency.get(position, 0.0) + value
+
+        scored = []
+        for position in _positions(candidates):
+            recipe = recipes[position]
+            missing = len(recipe.ingredients) - matched[position]
+            if max_missing is not None and missing > max_missing:
+                continue
+            coverage = matched[position] / len(recipe.ingredients)
+            scored.append((coverage + expiry_weight * urgency.get(position, 0.0), missing, recipe.total_time_minutes,
+                           position, coverage))
+
+        ranked = []
+        best = heapq.nsmallest(limit, scored, key=lambda entry: (-entry[0], entry[1], entry[2], entry[3]))
+        for score, missing, _, position, coverage in best:
+            recipe = recipes[position]
+            ranked.append({
+                "recipe_id": recipe.id,
+                "name": recipe.name,
+                "score": round(score, 3),
+                "coverage": round(coverage, 3),
+                "have": [food for food in recipe.ingredients if food in available],
+                "missing": [food for food in recipe.ingredients if food not in available],
+                "uses_expiring": [food for food in recipe.ingredients if available.get(food, 0) > 0],
+                "calories": recipe.calories,
+                "protein_g": recipe.protein_g,
+                "carbs_g": recipe.carbs_g,
+                "fat_g": recipe.fat_g,
+                "total_time_minutes": recipe.total_time_minutes
+            })
+        return ranked
@@ -0,0 +1,200 @@
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.term_matcher import TermMatcher, singular
+
+
+# Names of the same food, a restriction on one of them is a restriction on all
+SYNONYMS = [
+    ("peanut", "groundnut", "arachis", "monkey nut"),
+    ("yogurt", "yoghurt", "curd", "dahi"),
+    ("chickpea", "garbanzo", "chana", "chole"),
+    ("eggplant", "aubergine", "brinjal", "baingan"),
+    ("coriander", "cilantro", "dhania"),
+    ("okra", "bhindi", "lady finger"),
+    ("zucchini", "courgette"),
+    ("bell pepper", "capsicum"),
+    ("shrimp", "prawn"),
+    ("soy", "soya", "soybean"),
+    ("sesame", "gingelly", "til"),
+]
+
+_DAIRY = ("milk", "cheese", "butter", "cream", "yogurt", "ghee", "paneer", "whey", "casein", "lactose",
+          "buttermilk", "khoa", "mozzarella", "parmesan", "cheddar", "feta", "kefir", "custard")
+_WHEAT = ("wheat", "flour", "bread", "pasta", "semolina", "couscous", "seitan", "atta", "maida", "bulgur",
+          "noodle", "roti", "chapati", "paratha", "naan", "kulcha", "bhatura", "dalia")
+_CRUSTACEANS = ("shrimp", "crab", "lobster", "crayfish")
+_MOLLUSCS = ("scallop", "mussel", "oyster", "clam", "squid", "octopus")
+_FISH = ("fish", "salmon", "tuna", "cod", "tilapia", "sardine", "mackerel", "anchovy", "trout", "basa")
+_TREE_NUTS = ("almond", "cashew", "walnut", "pecan", "pistachio", "hazelnut", "macadamia", "brazil nut",
+              "pine nut")
+
+# Restrictions that name a whole category of foods. The usual names of the common allergens
+# ("milk", "eggs", "wheat", "shellfish", ...) are all here; plurals are singular by then.
+CATEGORIES = {
+    "nut": ("peanut",) + _TREE_NUTS,
+    "tree nut": ("nut",) + _TREE_NUTS,
+    "dairy": _DAIRY,
+    "milk": _DAIRY,
+    "lactose": ("milk", "cheese", "butter", "cream", "yogurt", "paneer", "whey", "buttermilk", "khoa", "kefir",
+                "custard"),
+    "egg": ("albumen", "mayonnaise", "mayo", "meringue", "omelette", "omelet", "frittata", "custard"),
+    "gluten": _WHEAT + ("barley", "rye"),
+    "wheat": _WHEAT,
+    "shellfish": _CRUSTACEANS + _MOLLUSCS,
+    "crustacean": _CRUSTACEANS,
+    "mollusc": _MOLLUSCS,
+    "mollusk": _MOLLUSCS,
+    "fish": _FISH,
+    "seafood": _FISH + _CRUSTACEANS + _MOLLUSCS,
+    "soy": ("tofu", "tempeh", "edamame", "miso", "soy sauce"),
+    "sesame": ("tahini",),
+    "mushroom": ("shiitake", "portobello"),
+    "pork": ("bacon", "ham", "prosciutto", "pancetta"),
+    "beef": ("steak", "veal"),
+    "meat": ("chicken", "beef", "pork", "lamb", "mutton", "turkey", "bacon", "ham", "steak"),
+}
+
+# Phrases that mean something else than the words in them, e.g. "peanut butter" is not dairy.
+# The value is the restriction word whose labels the phrase carries, None for none.
+COMPOUND_TERMS = {
+    "peanut butter": "peanut",
+    "almond butter": "almond",
+    "cashew butter": "cashew",
+    "almond milk": "almond",
+    "cashew milk": "cashew",
+    "soy milk": "soy",
+    "coconut milk": None,
+    "coconut cream": None,
+    "oat milk": None,
+    "rice milk": None,
+    "cocoa butter": None,
+    "cream of tartar": None,
+    "nutmeg": None,
+    "butternut squash": None,
+    "water chestnut": None,
+    "vegan cheese": None,
+    "vegan butter": None,
+    "dairy free cheese": None,
+    "dairy-free cheese": None,
+    "dairy free milk": None,
+    "dairy-free milk": None,
+    "rice flour": None,
+    "chickpea flour": "chickpea",
+    "almond flour": "almond",
+    "coconut flour": None,
+    "gluten free bread": None,
+    "gluten-free bread": None,
+    "gluten free pasta": None,
+    "gluten-free pasta": None,
+    "rice noodle": None,
+    "fish sauce": "fish",
+}
+
+# A match followed by one of these is declared absent, as in "gluten-free"
+FREE_SUFFIXES = ("-free", " free")
+
+_SYNONYM_INDEX = {word: group for group in SYNONYMS for word in group}
+
+
+def _expand(term: str) -> set:
+    """The words a restriction covers: itself, its category's members and all their synonyms"""
+    words = {term, *CATEGORIES.get(term, ())}
+    return {synonym for word in words for synonym in _SYNONYM_INDEX.get(word, (word,))}
+
+
+def _normalize(term: str) -> str:
+    words = term.strip().lower().split()
+    if words:
+        words[-1] = singular(words[-1])
+    return " ".join(words)
+
+
+@lru_cache(maxsize=1024)
+def _compile(allergies: Tuple[str, ...], disliked_foods: Tuple[str, ...]) -> Optional[TermMatcher]:
+    """
+    Matcher for one set of restrictions. The cache key is the restrictions themselves, so it is
+    a version of the profile: editing allergies or dislikes compiles a new matcher, every other
+    generation for the user reuses the compiled one.
+    """
+    patterns: Dict[str, set] = {}
+    for kind, terms in (("allergy", allergies), ("dislike", disliked_foods)):
+        for term in terms:
+            normalized = _normalize(term)
+            if not normalized:
+                continue
+            for word in _expand(normalized):
+                patterns.setdefault(word, set()).add((kind, term))
+    if not patterns:
+        return None
+
+    for phrase, meaning in COMPOUND_TERMS.items():
+        if any(word in phrase for word in patterns):
+            # A restriction on the phrase itself is kept, the words inside it no longer count
+            patterns[phrase] = patterns.get(phrase, set()) | (set(patterns.get(meaning, ())) if meaning else set())
+    return TermMatcher(patterns)
+
+
+class RestrictionValidationService:
+    """
+    Checks generated meals against the user's allergies and disliked foods.
+
+    The restrictions, expanded with their synonyms, are compiled into one multi-pattern matcher
+    that scans the names and ingredients of all meals in a single pass, so validating a plan
+    costs microseconds and flags exactly the slots that need regenerating.
+    """
+
+    MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack_1", "snack_2"]
+
+    @staticmethod
+    def matcher(user_data: Dict[str, Any]) -> Optional[TermMatcher]:
+        return _compile(
+            tuple(sorted(str(term) for term in user_data.get("allergies") or [])),
+            tuple(sorted(str(term) for term in user_data.get("disliked_foods") or []))
+        )
+
+    def violations(self, meals: Dict[str, Any], user_data: Dict[str, Any]) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Restrictions each meal breaks, keyed like `meals` (slot -> meal dict), as
+        {"kind": "allergy" | "dislike", "term": the user's term, "found": the matched text}
+        """
+        matcher = self.matcher(user_data)
+        if matcher is None:
+            return {}
+
+        # One text for all meals, each meal's segment starting at a known offset
+        keys, starts, segments = [], [], []
+        offset = 0
+        for key, meal in meals.items():
+            if not isinstance(meal, dict):
+                continue
+            segment = " | ".join(
+                [str(meal.get("meal_name") or "")] + [str(item) for item in meal.get("ingredients") or []]
+            )
+            keys.append(key)
+            starts.append(offset)
+            segments.append(segment)
+            offset += len(segment) + 1
+        text = "\n".join(segments)
+
+        found: Dict[str, List[Dict[str, str]]] = {}
+        for start, end, labels in matcher.find(text):
+            if text.startswith(FREE_SUFFIXES, end):
+                continue
+            key = keys[bisect_right(starts, start) - 1]
+            for kind, term in sorted(labels):
+                violation = {"kind": kind, "term": term, "found": text[start:end]}
+                if violation not in found.setdefault(key, []):
+                    found[key].append(violation)
+        return {key: violations for key, violations in found.items() if violations}
+
+    def plan_violations(self, meal_data: Dict[str, Any], user_data: Dict[str, Any]) -> Dict[str, List[Dict[str, str]]]:
+        """Violations per slot of a generated plan"""
+        return self.violations(
+            {meal_type: meal_data[meal_type] for meal_type in self.MEAL_TYPES if meal_type in meal_data}, user_data
+        )
+
+    @staticmethod
+    def has_allergen(violations: List[Dict[str, str]]) -> bool:
+        return any(violation["kind"] == "allergy" for violation in violations)
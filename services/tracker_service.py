@@ -2,7 +2,7 @@ import json
 from datetime import date
 from typing import List, Optional
 
-from sqlalchemy import func
+from sqlalchemy import func, distinct
 from sqlalchemy.orm import Session
 from db.models.tracker import DailyActivityTracker
 from db.models.workout import ExerciseSet, Exercise, Workout
@@ -135,6 +135,87 @@ class TrackerService:
             app_logger.exceptionlogs(f"Error in get_daily_activity_tracker: {e}")
             return None
     
+    @staticmethod
+    def apply_exercise_sets_to_trackers(user_id: int, exercise_sets: List[dict],
+                                        workout_types_by_exercise: dict, db: Session):
+        """
+        Incrementally add freshly inserted exercise sets to the user's daily trackers.
+        Does not commit, so it can share the caller's transaction.
+        """
+        sets_by_date = {}
+        for exercise_set in exercise_sets:
+            sets_by_date.setdefault(exercise_set["created_at"].date(), []).append(exercise_set)
+
+        if not sets_by_date:
+            return {}
+
+        target_dates = list(sets_by_date.keys())
+
+        trackers = {
+            tracker.date: tracker
+            for tracker in db.query(DailyActivityTracker).filter(
+                DailyActivityTracker.user_id == user_id,
+                DailyActivityTracker.date.in_(target_dates)
+            ).all()
+        }
+
+        # Distinct exercises per day, including the sets flushed by the caller
+        exercise_counts = {
+            str(row.day)[:10]: row.exercise_count
+            for row in db.query(
+                func.date(ExerciseSet.created_at).label('day'),
+                func.count(distinct(ExerciseSet.exercise_id)).label('exercise_count')
+            ).filter(
+                ExerciseSet.user_id == user_id,
+                func.date(ExerciseSet.created_at).in_(target_dates)
+            ).group_by(func.date(ExerciseSet.created_at)).all()
+        }
+
+        for target_date, day_sets in sets_by_date.items():
+            weight_lifted = sum(item["weight"] * item["reps"] for item in day_sets)
+            reps = sum(item["reps"] for item in day_sets)
+            workout_time = sum(item["time"] for item in day_sets)
+            # Same rough estimate as calculate_and_populate_activity_data
+            calories_burned = (weight_lifted * 0.05) + (workout_time * 5)
+            day_workout_types = {
+                workout_types_by_exercise[item["exercise_id"]]
+                for item in day_sets if workout_types_by_exercise.get(item["exercise_id"])
+            }
+
+            tracker = trackers.get(target_date)
+            if not tracker:
+                tracker = DailyActivityTracker(
+                    user_id=user_id,
+                    date=target_date,
+                    total_exercises_done=0,
+                    total_sets_completed=0,
+                    total_weight_lifted=0.0,
+                    total_reps_completed=0,
+                    total_workout_time=0.0,
+                    calories_burned_from_activity=0.0,
+                    calories_consumed=0.0,
+                    protein_consumed_g=0.0,
+                    carbs_consumed_g=0.0,
+                    fat_consumed_g=0.0,
+                    fiber_consumed_g=0.0,
+                    net_calorie_balance=0.0
+                )
+                db.add(tracker)
+                trackers[target_date] = tracker
+
+            existing_types = json.loads(tracker.workout_types_done) if tracker.workout_types_done else []
+
+            tracker.total_exercises_done = exercise_counts.get(target_date.isoformat(), tracker.total_exercises_done or 0)
+            tracker.total_sets_completed = (tracker.total_sets_completed or 0) + len(day_sets)
+            tracker.total_weight_lifted = (tracker.total_weight_lifted or 0.0) + weight_lifted
+            tracker.total_reps_completed = (tracker.total_reps_completed or 0) + reps
+            tracker.total_workout_time = (tracker.total_workout_time or 0.0) + workout_time
+            tracker.calories_burned_from_activity = (tracker.calories_burned_from_activity or 0.0) + calories_burned
+            tracker.workout_types_done = json.dumps(sorted(set(existing_types) | day_workout_types))
+            tracker.net_calorie_balance = (tracker.calories_consumed or 0.0) - tracker.calories_burned_from_activity
+
+        return trackers
+
     @staticmethod
     def calculate_and_populate_activity_data(user_id: int, target_date: date, db: Session):
         """Calculate activity data from ExerciseSet data and populate tracker"""
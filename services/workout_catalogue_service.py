@@ -0,0 +1,203 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from db.models.workout import Workout, Exercise
+from utils import app_logger
+from utils.enums import WorkoutType
+
+
+@dataclass(frozen=True)
+class CatalogueWorkout:
+    id: int
+    name: str
+    workout_type: WorkoutType
+    exercise_type: WorkoutType
+    is_default: bool
+
+
+@dataclass(frozen=True)
+class CatalogueExercise:
+    id: int
+    workout_id: Optional[int]
+    name: str
+
+
+class WorkoutCatalogueService:
+    """
+    Process-wide, read-only snapshot of the default workouts and their exercises.
+
+    The default catalogue only changes when the admin repopulates it, so it is loaded
+    once per process and served from memory afterwards. Every (re)load bumps `version`;
+    call `invalidate()` after changing the default rows and the next read reloads them.
+    Changes made elsewhere (another worker, the admin panel) are picked up by a cheap stamp
+    query on read, at most every `CHECK_SECONDS`.
+    """
+
+    CHECK_SECONDS = float(os.getenv("WORKOUT_CATALOGUE_CHECK_SECONDS", 30))
+
+    _lock = threading.Lock()
+    _loaded = False
+    _version = 0
+    # Stamp of the rows the snapshot was loaded from, and when to compare it again
+    _stamp: Tuple = ()
+    _next_check = 0.0
+
+    _workouts: Tuple[CatalogueWorkout, ...] = ()
+    _workouts_by_id: Dict[int, CatalogueWorkout] = {}
+    _workouts_by_type: Dict[WorkoutType, CatalogueWorkout] = {}
+    _workouts_by_name: Dict[str, CatalogueWorkout] = {}
+    _exercises_by_id: Dict[int, CatalogueExercise] = {}
+    _exercises_by_workout: Dict[int, Tuple[CatalogueExercise, ...]] = {}
+    _exercises_by_type: Dict[WorkoutType, Tuple[CatalogueExercise, ...]] = {}
+    _exercises_by_name: Dict[str, CatalogueExercise] = {}
+
+    @classmethod
+    def load(cls, db: Session) -> int:
+        """(Re)load the catalogue from the database and return the new version stamp"""
+        # Taken before the rows, so a change landing in between is seen by the next check
+        stamp = cls._source_stamp(db)
+        workouts = db.query(Workout).filter(Workout.is_default == True).order_by(Workout.id).all()
+        workout_ids = [workout.id for workout in workouts]
+        exercises = []
+        if workout_ids:
+            exercises = db.query(Exercise).filter(
+                Exercise.workout_id.in_(workout_ids)
+            ).order_by(Exercise.id).all()
+
+        catalogue_workouts = tuple(
+            CatalogueWorkout(
+                id=workout.id,
+                name=workout.name,
+                workout_type=workout.workout_type,
+                exercise_type=workout.exercise_type,
+                is_default=workout.is_default
+            )
+            for workout in workouts
+        )
+
+        workouts_by_type = {}
+        for workout in catalogue_workouts:
+            # Keep the first default workout per type, same as the old `.first()` lookup
+            workouts_by_type.setdefault(workout.workout_type, workout)
+
+        exercises_by_workout = {workout.id: [] for workout in catalogue_workouts}
+        exercises_by_id = {}
+        exercises_by_name = {}
+        for exercise in exercises:
+            catalogue_exercise = CatalogueExercise(
+                id=exercise.id,
+                workout_id=exercise.workout_id,
+                name=exercise.name
+            )
+            exercises_by_workout[exercise.workout_id].append(catalogue_exercise)
+            exercises_by_id[exercise.id] = catalogue_exercise
+            exercises_by_name.setdefault(cls._normalize_name(exercise.name), catalogue_exercise)
+
+        with cls._lock:
+            cls._workouts = catalogue_workouts
+            cls._workouts_by_id = {workout.id: workout for workout in catalogue_workouts}
+            cls._workouts_by_type = workouts_by_type
+            cls._workouts_by_name = {cls._normalize_name(workout.name): workout for workout in catalogue_workouts}
+            cls._exercises_by_id = exercises_by_id
+            cls._exercises_by_workout = {
+                workout_id: tuple(items) for workout_id, items in exercises_by_workout.items()
+            }
+            cls._exercises_by_type = {
+                workout_type: cls._exercises_by_workout.get(workout.id, ())
+                for workout_type, workout in workouts_by_type.items()
+            }
+            cls._exercises_by_name = exercises_by_name
+            cls._stamp = stamp
+            cls._next_check = time.monotonic() + cls.CHECK_SECONDS
+            cls._version += 1
+            cls._loaded = True
+            return cls._version
+
+    @classmethod
+    def invalidate(cls):
+        """Drop the snapshot so the next read reloads it (call after repopulating defaults)"""
+        with cls._lock:
+            cls._loaded = False
+
+    @classmethod
+    def version(cls) -> int:
+        return cls._version
+
+    @staticmethod
+    def _source_stamp(db: Session) -> Tuple:
+        """Count, last id and last update of the default workouts and of their exercises"""
+        workouts = db.query(
+            func.count(Workout.id), func.max(Workout.id), func.max(Workout.updated_at)
+        ).filter(Workout.is_default == True).one()
+        exercises = db.query(
+            func.count(Exercise.id), func.max(Exercise.id), func.max(Exercise.updated_at)
+        ).join(Workout, Exercise.workout_id == Workout.id).filter(Workout.is_default == True).one()
+        return tuple(workouts) + tuple(exercises)
+
+    @classmethod
+    def _ensure_loaded(cls, db: Session):
+        if cls._loaded and time.monotonic() < cls._next_check:
+            return
+        try:
+            if cls._loaded and cls._source_stamp(db) == cls._stamp:
+                cls._next_check = time.monotonic() + cls.CHECK_SECONDS
+                return
+            cls.load(db)
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error loading workout catalogue: {e}")
+            raise
+
+    @staticmethod
+    def _normalize_name(name: Optional[str]) -> str:
+        return (name or "").strip().lower()
+
+    @classmethod
+    def get_default_workouts(cls, db: Session) -> List[CatalogueWorkout]:
+        cls._ensure_loaded(db)
+        return list(cls._workouts)
+
+    @classmethod
+    def get_workout(cls, workout_id: int, db: Session) -> Optional[CatalogueWorkout]:
+        cls._ensure_loaded(db)
+        return cls._workouts_by_id.get(workout_id)
+
+    @classmethod
+    def get_workout_by_type(cls, workout_type: WorkoutType, db: Session) -> Optional[CatalogueWorkout]:
+        cls._ensure_loaded(db)
+        return cls._workouts_by_type.get(workout_type)
+
+    @classmethod
+    def get_workout_by_name(cls, name: str, db: Session) -> Optional[CatalogueWorkout]:
+        cls._ensure_loaded(db)
+        return cls._workouts_by_name.get(cls._normalize_name(name))
+
+    @classmethod
+    def is_default_workout(cls, workout_id: int, db: Session) -> bool:
+        cls._ensure_loaded(db)
+        return workout_id in cls._workouts_by_id
+
+    @classmethod
+    def get_exercises_for_workout(cls, workout_id: int, db: Session) -> List[CatalogueExercise]:
+        cls._ensure_loaded(db)
+        return list(cls._exercises_by_workout.get(workout_id, ()))
+
+    @classmethod
+    def get_exercises_by_type(cls, workout_type: WorkoutType, db: Session) -> List[CatalogueExercise]:
+        cls._ensure_loaded(db)
+        return list(cls._exercises_by_type.get(workout_type, ()))
+
+    @classmethod
+    def get_exercise(cls, exercise_id: int, db: Session) -> Optional[CatalogueExercise]:
+        cls._ensure_loaded(db)
+        return cls._exercises_by_id.get(exercise_id)
+
+    @classmethod
+    def get_exercise_by_name(cls, name: str, db: Session) -> Optional[CatalogueExercise]:
+        cls._ensure_loaded(db)
+        return cls._exercises_by_name.get(cls._normalize_name(name))
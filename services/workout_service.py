@@ -1,11 +1,14 @@
 
 
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta, timezone
 from typing import List, Optional
 
-from sqlalchemy import func
+from sqlalchemy import func, insert
 from sqlalchemy.orm import Session
 from db.models.workout import Workout, Exercise, ExerciseSet
+from services.progression_service import ProgressionService
+from services.tracker_service import TrackerService
+from services.workout_catalogue_service import WorkoutCatalogueService
 from utils.enums import WorkoutType, ExerciseType
 from utils import app_logger
 
@@ -13,18 +16,21 @@ from utils import app_logger
 class WorkoutService:
     
     @staticmethod
-    def get_all_workouts(db: Session) -> List[Workout]:
-        """Get all default workouts"""
+    def get_all_workouts(db: Session):
+        """Get all default workouts (served from the in-memory catalogue)"""
         try:
-            return db.query(Workout).filter(Workout.is_default == True).all()
+            return WorkoutCatalogueService.get_default_workouts(db)
         except Exception as e:
             app_logger.exceptionlogs(f"Error in get_all_workouts: {e}")
             return []
     
     @staticmethod
-    def get_workout_exercises(workout_id: int, db: Session) -> List[Exercise]:
+    def get_workout_exercises(workout_id: int, db: Session):
         """Get all exercises for a specific workout"""
         try:
+            # Default workouts are static, so they come from the catalogue
+            if WorkoutCatalogueService.is_default_workout(workout_id, db):
+                return WorkoutCatalogueService.get_exercises_for_workout(workout_id, db)
             return db.query(Exercise).filter(Exercise.workout_id == workout_id).all()
         except Exception as e:
             app_logger.exceptionlogs(f"Error in get_workout_exercises: {e}")
@@ -34,10 +40,11 @@ class WorkoutService:
     def create_exercise_set(user_id: int, exercise_id: int, set_data, db: Session):
         """Create a new exercise set for a user"""
         try:
-            # Verify the exercise exists
-            exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
-            if not exercise:
-                return None
+            # Verify the exercise exists, default exercises are checked in memory
+            if not WorkoutCatalogueService.get_exercise(exercise_id, db):
+                exercise = db.query(Exercise.id).filter(Exercise.id == exercise_id).first()
+                if not exercise:
+                    return None
             
             exercise_set = ExerciseSet(
                 user_id=user_id,
@@ -48,6 +55,13 @@ class WorkoutService:
             )
             
             db.add(exercise_set)
+            ProgressionService.record_sets(user_id, [{
+                "exercise_id": exercise_id,
+                "weight": set_data.weight,
+                "reps": set_data.reps,
+                "time": set_data.time,
+                "created_at": datetime.utcnow()
+            }], db)
             db.commit()
             db.refresh(exercise_set)
             
@@ -65,6 +79,97 @@ class WorkoutService:
             db.rollback()
             return None
     
+    @staticmethod
+    def bulk_create_exercise_sets(user_id: int, sets_data: list, db: Session):
+        """
+        Ingest a batch of exercise sets (offline sync) in a single transaction.
+        Sets already synced (same client_set_id) are skipped, so retries are safe.
+        """
+        try:
+            # De-duplicate inside the payload, first occurrence wins
+            unique_sets = {}
+            for set_data in sets_data:
+                unique_sets.setdefault(set_data.client_set_id, set_data)
+
+            # Validate exercise ids, default exercises come from the catalogue
+            workout_types_by_exercise = {}
+            unknown_exercise_ids = set()
+            for set_data in unique_sets.values():
+                exercise_id = set_data.exercise_id
+                if exercise_id in workout_types_by_exercise or exercise_id in unknown_exercise_ids:
+                    continue
+                exercise = WorkoutCatalogueService.get_exercise(exercise_id, db)
+                if exercise:
+                    workout = WorkoutCatalogueService.get_workout(exercise.workout_id, db)
+                    workout_types_by_exercise[exercise_id] = workout.workout_type.value if workout else None
+                else:
+                    unknown_exercise_ids.add(exercise_id)
+
+            if unknown_exercise_ids:
+                custom_exercises = db.query(Exercise.id, Workout.workout_type).outerjoin(
+                    Workout, Exercise.workout_id == Workout.id
+                ).filter(Exercise.id.in_(unknown_exercise_ids)).all()
+                for row in custom_exercises:
+                    workout_types_by_exercise[row.id] = row.workout_type.value if row.workout_type else None
+
+            # Sets from earlier syncs of the same batch
+            already_synced = {
+                row.client_set_id
+                for row in db.query(ExerciseSet.client_set_id).filter(
+                    ExerciseSet.user_id == user_id,
+                    ExerciseSet.client_set_id.in_(list(unique_sets.keys()))
+                ).all()
+            }
+
+            now = datetime.utcnow()
+            rows = []
+            rejected = []
+            for client_set_id, set_data in unique_sets.items():
+                if client_set_id in already_synced:
+                    continue
+                if set_data.exercise_id not in workout_types_by_exercise:
+                    rejected.append({
+                        "client_set_id": client_set_id,
+                        "exercise_id": set_data.exercise_id,
+                        "reason": "Exercise not found"
+                    })
+                    continue
+                rows.append({
+                    "user_id": user_id,
+                    "exercise_id": set_data.exercise_id,
+                    "weight": set_data.weight,
+                    "reps": set_data.reps,
+                    "time": set_data.time,
+                    "client_set_id": client_set_id,
+                    "created_at": WorkoutService._to_utc_naive(set_data.performed_at) or now
+                })
+
+            if rows:
+                db.execute(insert(ExerciseSet), rows)
+                TrackerService.apply_exercise_sets_to_trackers(user_id, rows, workout_types_by_exercise, db)
+                ProgressionService.record_sets(user_id, rows, db)
+                db.commit()
+
+            return {
+                "status": "success",
+                "message": "Exercise sets synced successfully",
+                "created": len(rows),
+                "created_client_set_ids": [row["client_set_id"] for row in rows],
+                "duplicates": sorted(already_synced),
+                "rejected": rejected
+            }
+        except Exception as e:
+            app_logger.exceptionlogs(f"Error in bulk_create_exercise_sets: {e}")
+            db.rollback()
+            return None
+
+    @staticmethod
+    def _to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+        """Client timestamps may carry an offset, stored timestamps are naive UTC"""
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
     @staticmethod
     def get_daily_workout(user_id: int, workout_date: date, db: Session):
         """Get all exercises and sets performed by user on a specific date"""
@@ -234,6 +339,7 @@ class WorkoutService:
                 })
             
             db.commit()
+            WorkoutCatalogueService.invalidate()
             
             return {
                 "status": "success",
@@ -332,6 +438,8 @@ class WorkoutService:
         """Generate Push workout sets (Chest, Shoulders, Triceps + Cardio)"""
         try:
             created_sets = []
+            # One indexed lookup for the user's history, used to prescribe weights
+            progressions = ProgressionService.get_user_progressions(user_id, db)
             
             # Get exercises for each muscle group
             chest_exercises = WorkoutService._get_exercises_by_type(WorkoutType.CHEST, db)
@@ -349,7 +457,7 @@ class WorkoutService:
                     {'weight': 80.0, 'reps': 8, 'time': 0.0},
                     {'weight': 85.0, 'reps': 6, 'time': 0.0}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, bench_press.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, bench_press.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
                 
                 # Incline Press - 3 sets
@@ -359,7 +467,7 @@ class WorkoutService:
                     {'weight': 30.0, 'reps': 10, 'time': 0.0},
                     {'weight': 35.0, 'reps': 8, 'time': 0.0}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, incline_press.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, incline_press.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
             
             # Shoulder exercises
@@ -372,7 +480,7 @@ class WorkoutService:
                     {'weight': 50.0, 'reps': 8, 'time': 0.0},
                     {'weight': 55.0, 'reps': 6, 'time': 0.0}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, overhead_press.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, overhead_press.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
                 
                 # Lateral Raises - 3 sets
@@ -382,7 +490,7 @@ class WorkoutService:
                     {'weight': 15.0, 'reps': 12, 'time': 0.0},
                     {'weight': 15.0, 'reps': 10, 'time': 0.0}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, lateral_raises.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, lateral_raises.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
             
             # Triceps exercises
@@ -394,14 +502,14 @@ class WorkoutService:
                     {'weight': 35.0, 'reps': 12, 'time': 0.0},
                     {'weight': 40.0, 'reps': 10, 'time': 0.0}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, pushdowns.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, pushdowns.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
             
             # Cardio - 20 minutes
             if cardio_exercises:
                 treadmill = next((ex for ex in cardio_exercises if "Treadmill" in ex.name), cardio_exercises[0])
                 sets_data = [{'weight': 0.0, 'reps': 0, 'time': 20.0}]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, treadmill.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, treadmill.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
             
             db.commit()
@@ -425,6 +533,8 @@ class WorkoutService:
         """Generate Pull workout sets (Back, Biceps + Cardio)"""
         try:
             created_sets = []
+            # One indexed lookup for the user's history, used to prescribe weights
+            progressions = ProgressionService.get_user_progressions(user_id, db)
             
             # Get exercises for each muscle group
             back_exercises = WorkoutService._get_exercises_by_type(WorkoutType.BACK, db)
@@ -441,7 +551,7 @@ class WorkoutService:
                     {'weight': 0.0, 'reps': 5, 'time': 0.0},
                     {'weight': 0.0, 'reps': 4, 'time': 0.0}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, pullups.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, pullups.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
                 
                 # Barbell Rows - 4 sets
@@ -452,7 +562,7 @@ class WorkoutService:
                     {'weight': 80.0, 'reps': 8, 'time': 0.0},
                     {'weight': 85.0, 'reps': 6, 'time': 0.0}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, barbell_rows.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, barbell_rows.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
             
             # Biceps exercises
@@ -464,14 +574,14 @@ class WorkoutService:
                     {'weight': 35.0, 'reps': 10, 'time': 0.0},
                     {'weight': 40.0, 'reps': 8, 'time': 0.0}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, barbell_curls.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, barbell_curls.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
             
             # Cardio - 20 minutes
             if cardio_exercises:
                 cycling = next((ex for ex in cardio_exercises if "Cycling" in ex.name), cardio_exercises[1])
                 sets_data = [{'weight': 0.0, 'reps': 0, 'time': 20.0}]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, cycling.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, cycling.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
             
             db.commit()
@@ -495,6 +605,8 @@ class WorkoutService:
         """Generate Legs + Abs workout sets (no cardio on leg day)"""
         try:
             created_sets = []
+            # One indexed lookup for the user's history, used to prescribe weights
+            progressions = ProgressionService.get_user_progressions(user_id, db)
             
             # Get exercises for each muscle group
             leg_exercises = WorkoutService._get_exercises_by_type(WorkoutType.LEGS, db)
@@ -510,7 +622,7 @@ class WorkoutService:
                     {'weight': 100.0, 'reps': 8, 'time': 0.0},
                     {'weight': 110.0, 'reps': 6, 'time': 0.0}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, squats.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, squats.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
                 
                 # Leg Press - 3 sets
@@ -520,7 +632,7 @@ class WorkoutService:
                     {'weight': 170.0, 'reps': 12, 'time': 0.0},
                     {'weight': 190.0, 'reps': 10, 'time': 0.0}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, leg_press.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, leg_press.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
             
             # Abs exercises
@@ -532,7 +644,7 @@ class WorkoutService:
                     {'weight': 0.0, 'reps': 20, 'time': 0.0},
                     {'weight': 0.0, 'reps': 15, 'time': 0.0}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, crunches.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, crunches.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
                 
                 # Plank - 3 sets
@@ -542,7 +654,7 @@ class WorkoutService:
                     {'weight': 0.0, 'reps': 0, 'time': 1.2},
                     {'weight': 0.0, 'reps': 0, 'time': 1.5}
                 ]
-                sets = WorkoutService._create_exercise_sets_for_date(user_id, plank.id, sets_data, target_date, db)
+                sets = WorkoutService._create_exercise_sets_for_date(user_id, plank.id, sets_data, target_date, db, progressions)
                 created_sets.extend(sets)
             
             db.commit()
@@ -563,22 +675,21 @@ class WorkoutService:
     
     @staticmethod
     def _get_exercises_by_type(workout_type: WorkoutType, db: Session):
-        """Helper method to get exercises by workout type"""
-        workout = db.query(Workout).filter(
-            Workout.workout_type == workout_type,
-            Workout.is_default == True
-        ).first()
-        
-        if not workout:
-            return []
-        
-        return db.query(Exercise).filter(Exercise.workout_id == workout.id).all()
+        """Helper method to get exercises by workout type from the default catalogue"""
+        return WorkoutCatalogueService.get_exercises_by_type(workout_type, db)
     
     @staticmethod
-    def _create_exercise_sets_for_date(user_id:int, exercise_id: int, sets_data: list, target_date: date, db: Session):
-        """Helper method to create exercise sets for a specific date"""
+    def _create_exercise_sets_for_date(user_id:int, exercise_id: int, sets_data: list, target_date: date, db: Session,
+                                       progressions: Optional[dict] = None):
+        """
+        Helper method to create exercise sets for a specific date. The sets are a prescription,
+        they are not folded into the progression rows until the user logs what they lifted.
+        """
         created_sets = []
         
+        if progressions is not None:
+            sets_data = ProgressionService.prescribe_sets(progressions.get(exercise_id), sets_data)
+        
         for set_data in sets_data:
             exercise_set = ExerciseSet(
                 user_id=user_id,
@@ -596,4 +707,5 @@ class WorkoutService:
                 "time": set_data['time']
             })
         
+        # Prescribed, not lifted: progression only learns from the sets the user logs
         return created_sets
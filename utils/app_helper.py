@@ -82,7 +82,6 @@ def hash_mobile_number(mobile_number):
     return hmac.new(hash_secret.encode(), str(mobile_number).encode(), hashlib.sha256).hexdigest()
 
 
-@app_logger.functionlogs(log="app")
 def create_auth_token(user):
     """Generates an access token with expiration."""
     expire = datetime.now(timezone.utc) + timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -93,7 +92,6 @@ def create_auth_token(user):
     }
     return jwt.encode(data, SECRET_KEY, algorithm="HS256")
 
-@app_logger.functionlogs(log="app")
 def create_refresh_token(user):
     """Generates a refresh token with longer expiration."""
     expire = datetime.now(timezone.utc) + timedelta(days=int(REFRESH_TOKEN_EXPIRE_DAYS))
@@ -105,7 +103,6 @@ def create_refresh_token(user):
 
     return jwt.encode(data, SECRET_KEY, algorithm="HS256")
 
-@app_logger.functionlogs(log="app")
 def decode_jwt(token: str):
     """Decodes and verifies JWT token"""
     try:
@@ -127,7 +124,6 @@ def decode_jwt(token: str):
         return False, "Wrong token. Please login gain.", {}
 
 
-@app_logger.functionlogs(log="app")
 def verify_user_from_token(token: str, db):
     """Verifies user from JWT token"""
     is_verified = False
@@ -0,0 +1,143 @@
+"""
+Opt-in per-request SQL instrumentation for catching N+1 regressions.
+
+Set DB_QUERY_INSTRUMENTATION=1 (or DEBUG=1) and main.py installs the engine listeners and
+the middleware. Every response then carries:
+
+    X-DB-Query-Count            statements executed while handling the request
+    X-DB-Time-Ms                time spent inside the DB driver
+    X-DB-Repeated-Statements    statement shapes executed DB_QUERY_REPEAT_THRESHOLD+ times
+
+Statement shapes are the SQL with literals and IN lists collapsed, so the same lazy load
+issued once per parent row shows up as one shape with a high count and is logged as a
+likely N+1.
+"""
+
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils import app_logger
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+QUERY_TIME_HEADER = "X-DB-Time-Ms"
+REPEATED_STATEMENTS_HEADER = "X-DB-Repeated-Statements"
+
+REPEAT_THRESHOLD = int(os.getenv("DB_QUERY_REPEAT_THRESHOLD", 5))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+|%s)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+|%s))*\s*\)")
+_POSTCOMPILE = re.compile(r"\(__\[POSTCOMPILE_\w+\]\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_current_stats: ContextVar[Optional["QueryStats"]] = ContextVar("_current_stats", default=None)
+_instrumented_engines = set()
+
+logger = app_logger.createLogger("app")
+
+
+def is_enabled() -> bool:
+    return any(
+        os.getenv(name, "").lower() in ("1", "true", "yes")
+        for name in ("DB_QUERY_INSTRUMENTATION", "DEBUG")
+    )
+
+
+def statement_shape(statement: str) -> str:
+    """SQL with literals and bind lists collapsed, so repeats of one query compare equal"""
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _POSTCOMPILE.sub("(?)", shape)
+    shape = _IN_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    """Statements seen while one request (or `track_queries` block) was active"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time_ms = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_time_ms += elapsed_ms
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_statements(self, threshold: int = REPEAT_THRESHOLD) -> List[Tuple[str, int]]:
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+def install(engine: Engine):
+    """Attach the timing listeners to `engine` (idempotent)"""
+    if id(engine) in _instrumented_engines:
+        return
+    _instrumented_engines.add(id(engine))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_stats.get() is not None:
+            conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current_stats.get()
+        if stats is None:
+            return
+        start_times = conn.info.get("query_start_time")
+        started = start_times.pop() if start_times else time.perf_counter()
+        stats.record(statement, (time.perf_counter() - started) * 1000)
+
+
+@contextmanager
+def track_queries():
+    """Collect QueryStats for the statements executed inside the block"""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+class QueryInstrumentationMiddleware:
+    """Pure ASGI middleware adding the query headers and logging likely N+1 patterns"""
+
+    def __init__(self, app, threshold: int = REPEAT_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.extend([
+                        (QUERY_COUNT_HEADER.lower().encode(), str(stats.count).encode()),
+                        (QUERY_TIME_HEADER.lower().encode(), f"{stats.total_time_ms:.3f}".encode()),
+                        (REPEATED_STATEMENTS_HEADER.lower().encode(),
+                         str(len(stats.repeated_statements(self.threshold))).encode()),
+                    ])
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_headers)
+
+        for shape, count in stats.repeated_statements(self.threshold):
+            logger.warning(
+                f"Possible N+1 on {scope.get('method')} {scope.get('path')}: "
+                f"{count} executions of {shape[:300]}"
+            )
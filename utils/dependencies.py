@@ -1,3 +1,5 @@
+import os
+
 from fastapi import HTTPException
 from fastapi.params import Depends
 from fastapi.security import OAuth2PasswordBearer
@@ -20,3 +22,18 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         )
 
     return user
+
+
+def admin_user_ids() -> set:
+    """Users allowed on the admin endpoints, from the comma-separated ADMIN_USER_IDS"""
+    return {int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip().isdigit()}
+
+
+async def get_current_admin_user(current_user=Depends(get_current_user)):
+    if current_user.id not in admin_user_ids():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+
+    return current_user
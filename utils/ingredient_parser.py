@@ -0,0 +1,174 @@
+"""
+Parser for the free-text ingredient lines of generated meals ("150 g chicken breast",
+"1 1/2 cups cooked rice", "2 eggs", "½ tsp salt") into a quantity, a unit, a name and,
+where the unit allows, the weight in grams.
+"""
+
+import re
+from typing import Container, NamedTuple, Optional, Tuple
+
+from utils.term_matcher import singular
+
+UNICODE_FRACTIONS = {"½": " 1/2", "⅓": " 1/3", "⅔": " 2/3", "¼": " 1/4", "¾": " 3/4", "⅛": " 1/8"}
+
+# Spelling of a unit -> canonical unit
+UNIT_ALIASES = {
+    "g": "g", "gm": "g", "gms": "g", "gram": "g", "grams": "g", "gr": "g",
+    "kg": "kg", "kgs": "kg", "kilogram": "kg", "kilograms": "kg",
+    "mg": "mg",
+    "oz": "oz", "ounce": "oz", "ounces": "oz",
+    "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "ml": "ml", "milliliter": "ml", "milliliters": "ml", "millilitre": "ml", "millilitres": "ml",
+    "l": "l", "liter": "l", "liters": "l", "litre": "l", "litres": "l",
+    "cup": "cup", "cups": "cup",
+    "tbsp": "tbsp", "tbs": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+    "tsp": "tsp", "teaspoon": "tsp", "teaspoons": "tsp",
+    "slice": "slice", "slices": "slice",
+    "scoop": "scoop", "scoops": "scoop",
+    "handful": "handful", "handfuls": "handful",
+    "pinch": "pinch", "dash": "pinch",
+    "clove": "clove", "cloves": "clove",
+    "piece": "piece", "pieces": "piece", "pc": "piece", "pcs": "piece", "whole": "piece",
+    "small": "small", "medium": "medium", "large": "large",
+}
+
+# Grams per unit of weight
+WEIGHT_GRAMS = {"g": 1.0, "kg": 1000.0, "mg": 0.001, "oz": 28.35, "lb": 453.6}
+# Millilitres per unit of volume
+VOLUME_ML = {"ml": 1.0, "l": 1000.0, "cup": 240.0, "tbsp": 15.0, "tsp": 5.0}
+# Grams per millilitre of foods far from water's density, matched on how the name ends
+DENSITIES = {
+    "oat": 0.34, "flour": 0.53, "atta": 0.53, "rice": 0.78, "quinoa": 0.77, "lentil": 0.8, "dal": 0.8,
+    "spinach": 0.13, "kale": 0.1, "lettuce": 0.2, "berry": 0.6, "blueberry": 0.6, "strawberry": 0.6,
+    "almond": 0.6, "walnut": 0.5, "nut": 0.6, "seed": 0.6, "granola": 0.4, "cereal": 0.3,
+    "sugar": 0.85, "oil": 0.92, "butter": 0.96, "ghee": 0.91, "honey": 1.42, "cheese": 0.45, "pea": 0.6,
+}
+# Grams per piece of foods counted rather than weighed
+PIECE_GRAMS = {
+    "egg": 50.0, "banana": 120.0, "apple": 180.0, "orange": 130.0, "roti": 40.0, "chapati": 40.0,
+    "paratha": 80.0, "tortilla": 45.0, "potato": 170.0, "sweet potato": 130.0, "onion": 110.0,
+    "tomato": 120.0, "carrot": 60.0, "cucumber": 200.0, "avocado": 150.0, "date": 8.0, "idli": 40.0,
+    "dosa": 100.0, "bread": 30.0,
+}
+# Fixed weights of the units that do not depend on the food
+UNIT_GRAMS = {"slice": 30.0, "scoop": 30.0, "handful": 30.0, "pinch": 0.5, "clove": 5.0}
+SIZE_FACTORS = {"small": 0.75, "medium": 1.0, "large": 1.25}
+# Foods bought by volume, matched on how the name ends
+LIQUIDS = {"milk", "water", "juice", "broth", "stock", "sauce", "vinegar", "oil", "buttermilk", "kombucha"}
+
+_NUMBER = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?"
+_QUANTITY_RE = re.compile(rf"^(?P<quantity>{_NUMBER})(?:\s*(?:-|to)\s*(?P<upper>{_NUMBER}))?\s*(?P<rest>.*)$")
+_PARENTHESES_RE = re.compile(r"\([^)]*\)")
+
+
+class ParsedIngredient(NamedTuple):
+    quantity: Optional[float]
+    unit: Optional[str]
+    name: str
+    # None where the line gives no amount or the unit cannot be weighed for this food
+    grams: Optional[float]
+
+
+def _number(text: str) -> float:
+    total = 0.0
+    for part in text.split():
+        if "/" in part:
+            numerator, denominator = part.split("/")
+            total += float(numerator) / float(denominator) if float(denominator) else 0.0
+        else:
+            total += float(part)
+    return total
+
+
+def _food_key(name: str, table: Container[str]) -> Optional[str]:
+    """The longest entry of `table` the name ends with, word-wise ("boiled eggs" -> "egg")"""
+    words = [singular(word) for word in name.split()]
+    for size in range(len(words), 0, -1):
+        key = " ".join(words[-size:])
+        if key in table:
+            return key
+    return None
+
+
+def grams_for(quantity: float, unit: Optional[str], name: str) -> Optional[float]:
+    """Weight of `quantity` `unit`s of the named food, None when the unit does not say"""
+    if unit in WEIGHT_GRAMS:
+        return quantity * WEIGHT_GRAMS[unit]
+    if unit in VOLUME_ML:
+        density_key = _food_key(name, DENSITIES)
+        return quantity * VOLUME_ML[unit] * (DENSITIES[density_key] if density_key else 1.0)
+    if unit in UNIT_GRAMS:
+        return quantity * UNIT_GRAMS[unit]
+    piece_key = _food_key(name, PIECE_GRAMS)
+    if piece_key is None:
+        return None
+    return quantity * PIECE_GRAMS[piece_key] * SIZE_FACTORS.get(unit, 1.0)
+
+
+def canonical_amount(parsed: ParsedIngredient) -> Tuple[Optional[float], Optional[str]]:
+    """
+    The amount of a parsed line in the one unit its food is listed in: pieces for counted foods,
+    ml for liquids, grams for anything else that weighs, else the line's own unit. Lines for the
+    same food then add up whichever way they were written ("1 cup milk" and "200 g milk").
+    """
+    if parsed.quantity is None:
+        return None, None
+    if parsed.grams is not None:
+        piece_key = _food_key(parsed.name, PIECE_GRAMS)
+        if piece_key:
+            # "1 large egg" is still one egg to buy
+            if parsed.unit is None or parsed.unit in SIZE_FACTORS or parsed.unit == "piece":
+                return parsed.quantity, "piece"
+            return parsed.grams / PIECE_GRAMS[piece_key], "piece"
+        if _food_key(parsed.name, LIQUIDS):
+            if parsed.unit in VOLUME_ML:
+                return parsed.quantity * VOLUME_ML[parsed.unit], "ml"
+            density_key = _food_key(parsed.name, DENSITIES)
+            return parsed.grams / (DENSITIES[density_key] if density_key else 1.0), "ml"
+        return parsed.grams, "g"
+    return parsed.quantity, parsed.unit or "piece"
+
+
+def display_amount(quantity: Optional[float], unit: Optional[str]) -> Optional[str]:
+    """A canonical amount as a shopper reads it, in kg and l from 1000 g and ml"""
+    if quantity is None:
+        return None
+    if unit in ("g", "ml") and quantity >= 1000:
+        return f"{round(quantity / 1000, 2):g} {'kg' if unit == 'g' else 'l'}"
+    if unit in ("g", "ml"):
+        return f"{round(quantity):g} {unit}"
+    if unit == "piece":
+        return f"{round(quantity, 1):g}"
+    return f"{round(quantity, 1):g} {unit}"
+
+
+def parse_ingredient(line: str) -> ParsedIngredient:
+    """
+    Split an ingredient line into quantity, unit and name. A range ("2-3 eggs") counts as its
+    middle, notes after a comma or in parentheses are dropped. Lines without an amount
+    ("salt to taste") come back with quantity and grams None.
+    """
+    text = str(line or "").lower()
+    for fraction, replacement in UNICODE_FRACTIONS.items():
+        text = text.replace(fraction, replacement)
+    text = _PARENTHESES_RE.sub(" ", text).split(",")[0]
+    text = " ".join(text.replace("-", " - ").split()).replace(" - ", "-")
+    text = re.sub(r"^(a|an)\s+", "1 ", text)
+
+    match = _QUANTITY_RE.match(text)
+    if not match:
+        return ParsedIngredient(None, None, text.strip(), None)
+
+    quantity = _number(match.group("quantity"))
+    if match.group("upper"):
+        quantity = (quantity + _number(match.group("upper"))) / 2
+
+    # "150g chicken" and "150 g chicken" alike
+    rest = match.group("rest")
+    unit_match = re.match(r"^([a-z]+)\.?\s*(.*)$", rest)
+    unit = None
+    if unit_match and unit_match.group(1) in UNIT_ALIASES:
+        unit = UNIT_ALIASES[unit_match.group(1)]
+        rest = unit_match.group(2)
+    name = re.sub(r"^of\s+", "", rest).strip()
+    return ParsedIngredient(quantity, unit, name, grams_for(quantity, unit, name))
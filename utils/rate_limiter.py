@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from utils import app_logger
+from utils.redis_helper import RedisHelper
+
+
+class RateLimitExceeded(Exception):
+    """Waiting for the rate limit would take longer than the caller allows"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """`rate` units per `period_seconds`, of which up to `burst` may be spent at once"""
+    name: str
+    rate: float
+    period_seconds: float = 60.0
+    burst: Optional[float] = None
+
+    @property
+    def emission_interval_us(self) -> float:
+        return self.period_seconds * 1_000_000 / self.rate
+
+    @property
+    def burst_size(self) -> float:
+        return self.burst if self.burst is not None else max(1.0, self.rate / 10)
+
+
+# GCRA: the key holds the theoretical arrival time (TAT) in microseconds of Redis' own clock,
+# so every worker paces against the same timeline. Returns {allowed, wait_us}.
+GCRA_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000000 + tonumber(now_parts[2])
+local emission_interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+
+local new_tat = tat + emission_interval * cost
+local allow_at = new_tat - emission_interval * burst
+if allow_at > now then
+    return {0, math.ceil(allow_at - now)}
+end
+
+redis.call('SET', KEYS[1], string.format('%.0f', new_tat), 'PX', math.ceil((new_tat - now) / 1000) + 1000)
+return {1, 0}
+"""
+
+
+class RateLimiter:
+    """
+    Distributed GCRA limiter on Redis for outbound provider calls.
+
+    Keys are per provider and per credential (hashed), so every worker sharing a credential
+    shares its quota. Callers await `acquire()` (or call `acquire_sync()`), which sleeps until
+    the call fits the limit. `acquire()` runs the script on an asyncio client bound to the running
+    loop, the sync client only serves `acquire_sync()`. When Redis is unavailable the limiter
+    fails open.
+    """
+
+    KEY_PREFIX = "rate_limit"
+    # After Redis fails, calls go through unpaced for this long before reconnecting
+    RECONNECT_INTERVAL_SECONDS = 30
+
+    def __init__(self, client=None, async_client=None):
+        self._client = client
+        self._script = None
+        self._async_client = async_client
+        self._async_script = None
+        self._async_loop = None
+        self._unavailable_until = 0.0
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _get_script(self):
+        if self._script is None:
+            if self._client is None:
+                if time.monotonic() < self._unavailable_until:
+                    return None
+                self._client = RedisHelper().client
+            if self._client is None:
+                self._unavailable_until = time.monotonic() + self.RECONNECT_INTERVAL_SECONDS
+                return None
+            self._script = self._client.register_script(GCRA_SCRIPT)
+        return self._script
+
+    def _get_async_script(self):
+        loop = asyncio.get_running_loop()
+        if self._async_script is None or self._async_loop is not loop:
+            if time.monotonic() < self._unavailable_until:
+                return None
+            # An asyncio client's connections belong to the loop that opened them
+            if self._async_client is None or self._async_loop not in (None, loop):
+                self._async_client = RedisHelper.create_async_client()
+            self._async_loop = loop
+            self._async_script = self._async_client.register_script(GCRA_SCRIPT)
+        return self._async_script
+
+    @staticmethod
+    def credential_fingerprint(credential: Optional[str]) -> str:
+        if not credential:
+            return "default"
+        return hashlib.sha256(credential.encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def build_key(cls, provider: str, credential: Optional[str], limit: RateLimit) -> str:
+        return f"{cls.KEY_PREFIX}:{provider}:{cls.credential_fingerprint(credential)}:{limit.name}"
+
+    def try_acquire(self, key: str, limit: RateLimit, cost: float = 1) -> Tuple[bool, float]:
+        """One attempt, returns (allowed, seconds until it would be allowed)"""
+        try:
+            script = self._get_script()
+            if script is None:
+                return True, 0.0
+            allowed, wait_us = script(keys=[key], args=[limit.emission_interval_us, limit.burst_size, cost])
+            return bool(allowed), int(wait_us) / 1_000_000
+        except Exception as e:
+            app_logger.exceptionlogs(f"Rate limiter unavailable for {key}, allowing call: {e}")
+            self._script = None
+            self._client = None
+            self._unavailable_until = time.monotonic() + self.RECONNECT_INTERVAL_SECONDS
+            return True, 0.0
+
+    async def _try_acquire_async(self, key: str, limit: RateLimit, cost: float = 1) -> Tuple[bool, float]:
+        """`try_acquire` on the asyncio client, so the round trip to Redis never blocks the loop"""
+        try:
+            script = self._get_async_script()
+            if script is None:
+                return True, 0.0
+            allowed, wait_us = await script(keys=[key], args=[limit.emission_interval_us, limit.burst_size, cost])
+            return bool(allowed), int(wait_us) / 1_000_000
+        except Exception as e:
+            app_logger.exceptionlogs(f"Rate limiter unavailable for {key}, allowing call: {e}")
+            self._async_script = None
+            self._async_client = None
+            self._unavailable_until = time.monotonic() + self.RECONNECT_INTERVAL_SECONDS
+            return True, 0.0
+
+    async def acquire(self, key: str, limit: RateLimit, cost: float = 1,
+                      max_wait_seconds: Optional[float] = None) -> float:
+        """Wait until the call fits the limit, returns the seconds waited"""
+        started = time.monotonic()
+        cost = min(cost, limit.burst_size)
+        slept = False
+        while True:
+            allowed, wait_seconds = await self._try_acquire_async(key, limit, cost)
+            waited = time.monotonic() - started
+            if allowed:
+                self._record(key, waited, throttled=slept)
+                return waited
+            if max_wait_seconds is not None and waited + wait_seconds > max_wait_seconds:
+                self._record(key, waited, rejected=True)
+                raise RateLimitExceeded(f"{key} needs {wait_seconds:.2f}s more, max wait {max_wait_seconds}s")
+            await asyncio.sleep(wait_seconds)
+            slept = True
+
+    def acquire_sync(self, key: str, limit: RateLimit, cost: float = 1,
+                     max_wait_seconds: Optional[float] = None) -> float:
+        """Blocking variant of `acquire` for the synchronous integrations"""
+        started = time.monotonic()
+        cost = min(cost, limit.burst_size)
+        slept = False
+        while True:
+            allowed, wait_seconds = self.try_acquire(key, limit, cost)
+            waited = time.monotonic() - started
+            if allowed:
+                self._record(key, waited, throttled=slept)
+                return waited
+            if max_wait_seconds is not None and waited + wait_seconds > max_wait_seconds:
+                self._record(key, waited, rejected=True)
+                raise RateLimitExceeded(f"{key} needs {wait_seconds:.2f}s more, max wait {max_wait_seconds}s")
+            time.sleep(wait_seconds)
+            slept = True
+
+    def _record(self, key: str, waited: float, throttled: bool = False, rejected: bool = False):
+        with self._stats_lock:
+            stats = self._stats.setdefault(key, {
+                "acquired": 0, "throttled": 0, "rejected": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0
+            })
+            if rejected:
+                stats["rejected"] += 1
+            else:
+                stats["acquired"] += 1
+                if throttled:
+                    stats["throttled"] += 1
+            stats["total_wait_seconds"] += waited
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Wait time metrics per limiter key for this process"""
+        with self._stats_lock:
+            return {
+                key: {
+                    **stats,
+                    "total_wait_seconds": round(stats["total_wait_seconds"], 3),
+                    "max_wait_seconds": round(stats["max_wait_seconds"], 3),
+                    "mean_wait_seconds": round(
+                        stats["total_wait_seconds"] / max(1, stats["acquired"] + stats["rejected"]), 4
+                    )
+                }
+                for key, stats in self._stats.items()
+            }
+
+
+rate_limiter = RateLimiter()
@@ -1,4 +1,5 @@
 import redis
+import redis.asyncio
 import os
 from utils import app_logger
 
@@ -23,6 +24,17 @@ class RedisHelper:
             app_logger.exceptionlogs(f"Redis connection failed: {e}")
             self.client = None
 
+    @staticmethod
+    def create_async_client():
+        """asyncio client with the same settings, for pub/sub inside async endpoints (caller closes it)"""
+        return redis.asyncio.Redis(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', 6379)),
+            db=int(os.getenv('REDIS_DB', 0)),
+            password=os.getenv('REDIS_PASSWORD', None),
+            decode_responses=True
+        )
+
     def set_with_ttl(self, key: str, value: str, ttl: int):
         """Set a key-value pair with TTL (time to live) in seconds"""
         try:
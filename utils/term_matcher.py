@@ -0,0 +1,101 @@
+"""
+Multi-pattern matcher (Aho-Corasick) for whole words and phrases.
+
+All patterns are found in one pass over the text, whatever their number. A match has to start
+at a word boundary and end at one, optionally after a plural "s"/"es", so "egg" finds "eggs"
+but not "eggplant". Where matches overlap the leftmost longest wins, which lets a phrase such
+as "peanut butter" carry its own labels instead of those of "butter".
+"""
+
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+PLURAL_SUFFIXES = ("es", "s")
+
+
+def singular(word: str) -> str:
+    """Crude English singular, enough to line up berries/berry and peanuts/peanut"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum()
+
+
+class TermMatcher:
+    """Patterns (lower case) mapped to the labels a match reports, compiled once and reused"""
+
+    def __init__(self, patterns: Dict[str, Iterable]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state, the (length, labels) of every pattern ending there, longest first
+        self._outputs: List[List[Tuple[int, FrozenSet]]] = [[]]
+
+        for pattern, labels in patterns.items():
+            pattern = pattern.strip().lower()
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._outputs[state].append((len(pattern), frozenset(labels)))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._outputs[next_state] = sorted(
+                    self._outputs[next_state] + self._outputs[self._fail[next_state]], key=lambda output: -output[0]
+                )
+
+    def find_all(self, text: str) -> List[Tuple[int, int, FrozenSet]]:
+        """Every whole-word match as (start, end, labels), `end` including a plural suffix"""
+        text = text.lower()
+        matches = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, labels in self._outputs[state]:
+                start = index - length + 1
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                end = self._word_end(text, index + 1)
+                if end is not None:
+                    matches.append((start, end, labels))
+        return matches
+
+    @staticmethod
+    def _word_end(text: str, end: int):
+        if end >= len(text) or not _is_word_char(text[end]):
+            return end
+        for suffix in PLURAL_SUFFIXES:
+            suffix_end = end + len(suffix)
+            if text.startswith(suffix, end) and (suffix_end >= len(text) or not _is_word_char(text[suffix_end])):
+                return suffix_end
+        return None
+
+    def find(self, text: str) -> List[Tuple[int, int, FrozenSet]]:
+        """Non-overlapping matches, the leftmost longest where they overlap"""
+        selected = []
+        covered_until = 0
+        for start, end, labels in sorted(self.find_all(text), key=lambda match: (match[0], -match[1])):
+            if start >= covered_until:
+                selected.append((start, end, labels))
+                covered_until = end
+        return selected
@@ -0,0 +1,158 @@
+"""
+Tolerant JSON extraction for LLM output.
+
+`parse` takes the raw completion and, in one pass over it, skips any prose or markdown fence
+before the first `{` / `[`, stops after the matching close, and repairs what models commonly
+get wrong: trailing commas, `//` comments, Python literals (True / False / None), raw newlines
+inside strings. If the output was cut off, the last incomplete element is dropped and the open
+containers are closed, and the top-level keys whose values were cut short are reported so the
+caller can discard or regenerate just those.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+CLOSERS = {"{": "}", "[": "]"}
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+class TolerantJSONError(ValueError):
+    """No JSON value could be recovered from the text"""
+
+
+@dataclass
+class RepairReport:
+    repaired: bool = False
+    truncated: bool = False
+    # Top-level keys whose value was cut off by the truncation
+    incomplete_keys: List[str] = field(default_factory=list)
+
+
+def _strip_trailing_comma(out: List[str]) -> bool:
+    index = len(out) - 1
+    while index >= 0 and out[index].isspace():
+        index -= 1
+    if index >= 0 and out[index] == ",":
+        del out[index:]
+        return True
+    return False
+
+
+def repair(text: str) -> Tuple[str, RepairReport]:
+    """Valid JSON text for the first JSON value in `text`, with what had to be fixed"""
+    report = RepairReport()
+    start = min((index for index in (text.find("{"), text.find("[")) if index != -1), default=-1)
+    if start == -1:
+        raise TolerantJSONError("No JSON object or array in the text")
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    string_start = 0
+    # Where the text can be cut if it ends early: (length of out, depth) after an opening
+    # bracket or before a comma, i.e. between complete elements
+    safe_cut: Tuple[int, int] = (0, 0)
+    last_key: Optional[str] = None
+    top_level_key: Optional[str] = None
+
+    index = start
+    length = len(text)
+    while index < length:
+        char = text[index]
+
+        if in_string:
+            if escaped:
+                out.append(char)
+                escaped = False
+            elif char == "\\":
+                out.append(char)
+                escaped = True
+            elif char == '"':
+                out.append(char)
+                in_string = False
+                if len(stack) == 1 and stack[0] == "{":
+                    last_key = "".join(out[string_start + 1:-1])
+            elif char in STRING_ESCAPES:
+                out.append(STRING_ESCAPES[char])
+                report.repaired = True
+            else:
+                out.append(char)
+            index += 1
+            continue
+
+        if char == '"':
+            in_string = True
+            string_start = len(out)
+            out.append(char)
+        elif char in CLOSERS:
+            if len(stack) == 1 and stack[0] == "{":
+                top_level_key = last_key
+            stack.append(char)
+            out.append(char)
+            safe_cut = (len(out), len(stack))
+        elif char in "}]":
+            if not stack:
+                break
+            if _strip_trailing_comma(out):
+                report.repaired = True
+            opener = stack.pop()
+            if CLOSERS[opener] != char:
+                report.repaired = True
+            out.append(CLOSERS[opener])
+            if not stack:
+                return "".join(out), report
+        elif char == ",":
+            safe_cut = (len(out), len(stack))
+            out.append(char)
+        elif char == "/" and text.startswith("//", index):
+            newline = text.find("\n", index)
+            index = length if newline == -1 else newline
+            report.repaired = True
+            continue
+        elif char.isalpha():
+            word_end = index
+            while word_end < length and text[word_end].isalpha():
+                word_end += 1
+            word = text[index:word_end]
+            if word in PYTHON_LITERALS:
+                out.append(PYTHON_LITERALS[word])
+                report.repaired = True
+            else:
+                out.append(word)
+            index = word_end
+            continue
+        else:
+            out.append(char)
+        index += 1
+
+    # Ran out of text with containers still open: cut back to the last complete element
+    report.truncated = True
+    report.repaired = True
+    cut_at, depth = safe_cut
+    del out[cut_at:]
+    stack = stack[:depth]
+    if depth >= 2 and stack[0] == "{" and top_level_key is not None:
+        report.incomplete_keys.append(top_level_key)
+    _strip_trailing_comma(out)
+    while stack:
+        out.append(CLOSERS[stack.pop()])
+    return "".join(out), report
+
+
+def parse(text: str) -> Tuple[Any, RepairReport]:
+    """Parse the first JSON value in `text`, repairing it when needed"""
+    if text is None:
+        raise TolerantJSONError("No text to parse")
+    try:
+        return json.loads(text), RepairReport()
+    except (json.JSONDecodeError, TypeError):
+        pass
+
+    repaired_text, report = repair(text)
+    try:
+        return json.loads(repaired_text), report
+    except json.JSONDecodeError as e:
+        raise TolerantJSONError(f"Could not repair JSON: {e}") from e